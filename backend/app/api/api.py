@@ -12,6 +12,7 @@ from app.api.endpoints.value_products import router as value_products_router
 from app.api.endpoints.functions import router as functions_router
 from app.api.endpoints.sections import router as sections_router
 from app.api.endpoints.orgchart import router as orgchart_router
+from app.api.endpoints.orgchart_role_rules import router as orgchart_role_rules_router
 
 logger = logging.getLogger(__name__)
 
@@ -27,5 +28,6 @@ api_router.include_router(value_products_router, prefix="/value_products", tags=
 api_router.include_router(functions_router, prefix="/functions", tags=["functions"])
 api_router.include_router(sections_router, prefix="/sections", tags=["sections"])
 api_router.include_router(orgchart_router, prefix="/orgchart", tags=["orgchart"])
+api_router.include_router(orgchart_role_rules_router, prefix="/orgchart/role-rules", tags=["orgchart"])
 
 logger.info("API роутеры настроены")
@@ -1,26 +1,57 @@
 from typing import List, Optional, Any
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app import crud
 from app.api import deps
+from app.api.fields import FieldsParams
+from app.api.pagination import CursorParams
 from app.db.base import get_db
 from app.schemas import division as schemas
 from app.models import user as models
+from app.schemas.batch import BatchRequest, BatchResult
+from app.services.batch import load_in_order, run_batch
 
 router = APIRouter()
 
+def _build_division_tree(divisions: List[Any]) -> List[schemas.DivisionWithRelations]:
+    """Собрать дерево из плоского списка подразделений за один проход по parent_id"""
+    nodes = {
+        division.id: schemas.DivisionWithRelations(
+            **schemas.Division.model_validate(division).model_dump(), children=[]
+        )
+        for division in divisions
+    }
+    roots = []
+    for division in divisions:
+        parent = nodes.get(division.parent_id)
+        if parent is not None:
+            parent.children.append(nodes[division.id])
+        else:
+            roots.append(nodes[division.id])
+    return roots
+
 @router.get("/", response_model=List[schemas.Division])
 async def read_divisions(
+    response: Response,
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
     organization_id: Optional[int] = Query(None, description="Фильтр по ID организации"),
+    page: CursorParams = Depends(),
+    fields: FieldsParams = Depends(),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """Получить список всех подразделений с возможностью фильтрации по организации"""
+    if fields.enabled:
+        return await fields.fetch(
+            crud.division, db, response, schema=schemas.Division, page=page,
+            skip=skip, limit=limit, organization_id=organization_id,
+        )
+    if page.enabled:
+        return await page.fetch(crud.division, db, response, limit=limit, organization_id=organization_id)
     divisions = await crud.division.get_divisions(
         db=db, skip=skip, limit=limit, organization_id=organization_id
     )
@@ -57,9 +88,58 @@ async def create_division(
                 detail="Родительское подразделение должно принадлежать той же организации",
             )
     
+    # Проверяем уникальность кода в рамках организации
+    existing_division = await crud.division.get_by_code_and_org(
+        db, code=division_in.code, organization_id=division_in.organization_id
+    )
+    if existing_division:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Подразделение с таким кодом уже существует в данной организации",
+        )
+    
     division = await crud.division.create_division(db=db, division_in=division_in)
     return division
 
+@router.post("/batch", response_model=BatchResult)
+async def batch_divisions(
+    *,
+    db: AsyncSession = Depends(get_db),
+    batch_in: BatchRequest,
+    response: Response,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Пакетное создание, обновление и удаление подразделений в одной транзакции.
+    
+    Ошибки возвращаются по элементам, остальные элементы записываются;
+    с atomic=true любая ошибка откатывает весь пакет (ответ 422)
+    """
+    result = await run_batch(
+        crud.division, db, batch_in, create_schema=schemas.DivisionCreate, update_schema=schemas.DivisionUpdate
+    )
+    if not result.committed:
+        response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    return result
+
+@router.post("/upsert", response_model=List[schemas.Division])
+async def upsert_divisions(
+    *,
+    db: AsyncSession = Depends(get_db),
+    divisions_in: List[schemas.DivisionCreate],
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Создать или обновить подразделения по коду в организации одним INSERT ... ON CONFLICT
+    """
+    try:
+        ids = await crud.division.upsert_many(db, objs_in=divisions_in)
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    await db.commit()
+    return await load_in_order(db, crud.division.model, ids)
+
 @router.get("/{division_id}", response_model=schemas.Division)
 async def read_division(
     *,
@@ -111,6 +191,13 @@ async def update_division(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Родительское подразделение должно принадлежать той же организации",
                 )
+            
+            # Проверяем, что новый родитель не входит в поддерево подразделения (цикл)
+            if await crud.division.is_descendant(db=db, ancestor_id=division_id, descendant_id=parent.id):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Нельзя перенести подразделение внутрь его собственного поддерева",
+                )
     
     # Если изменяется организация, проверяем ее существование
     if division_in.organization_id is not None and division_in.organization_id != division.organization_id:
@@ -121,6 +208,20 @@ async def update_division(
                 detail=f"Организация с ID {division_in.organization_id} не найдена",
             )
     
+    # Если меняется организация или код, проверяем уникальность кода в рамках организации
+    if (division_in.code and division_in.code != division.code) or \
+       (division_in.organization_id and division_in.organization_id != division.organization_id):
+        existing_division = await crud.division.get_by_code_and_org(
+            db,
+            code=division_in.code or division.code,
+            organization_id=division_in.organization_id or division.organization_id,
+        )
+        if existing_division and existing_division.id != division_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Подразделение с таким кодом уже существует в данной организации",
+            )
+    
     division = await crud.division.update_division(db=db, db_obj=division, obj_in=division_in)
     return division
 
@@ -168,5 +269,22 @@ async def read_organization_division_tree(
             detail=f"Организация с ID {organization_id} не найдена",
         )
     
-    division_tree = await crud.division.get_division_tree(db=db, organization_id=organization_id)
-    return division_tree 
\ No newline at end of file
+    divisions = await crud.division.get_division_tree(db=db, organization_id=organization_id)
+    return _build_division_tree(divisions)
+
+@router.get("/{division_id}/subtree", response_model=schemas.DivisionWithRelations)
+async def read_division_subtree(
+    *,
+    db: AsyncSession = Depends(get_db),
+    division_id: int,
+    max_depth: Optional[int] = Query(None, ge=0, description="Максимальная глубина поддерева"),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """Получить поддерево подразделения (одним запросом по таблице замыкания)"""
+    divisions = await crud.division.get_subtree(db=db, division_id=division_id, max_depth=max_depth)
+    if not divisions:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Подразделение не найдено",
+        )
+    return _build_division_tree(divisions)[0] 
\ No newline at end of file
@@ -1,21 +1,34 @@
 from typing import Any, List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
+from app.api.fields import FieldsParams
+from app.api.pagination import CursorParams
+from app.schemas.batch import BatchRequest, BatchResult
+from app.services.batch import load_in_order, run_batch
 
 router = APIRouter()
 
 @router.get("/", response_model=List[schemas.Function])
 async def read_functions(
+    response: Response,
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
+    page: CursorParams = Depends(),
+    fields: FieldsParams = Depends(),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
-    """Retrieve functions."""
+    """Retrieve functions (with ?cursor= - keyset pagination, next page in X-Next-Cursor; with ?fields= - only the listed fields)."""
+    if fields.enabled:
+        return await fields.fetch(
+            crud.function, db, response, schema=schemas.Function, page=page, skip=skip, limit=limit
+        )
+    if page.enabled:
+        return await page.fetch(crud.function, db, response, limit=limit)
     functions = await crud.function.get_multi(db, skip=skip, limit=limit)
     return functions
 
@@ -45,6 +58,45 @@ async def create_function(
     function = await crud.function.create(db=db, obj_in=function_in)
     return function
 
+@router.post("/batch", response_model=BatchResult)
+async def batch_functions(
+    *,
+    db: Session = Depends(deps.get_db),
+    batch_in: BatchRequest,
+    response: Response,
+    current_user: models.User = Depends(deps.get_current_superuser),
+) -> Any:
+    """
+    Пакетное создание, обновление и удаление функций в одной транзакции.
+    
+    Ошибки возвращаются по элементам, остальные элементы записываются;
+    с atomic=true любая ошибка откатывает весь пакет (ответ 422)
+    """
+    result = await run_batch(
+        crud.function, db, batch_in, create_schema=schemas.FunctionCreate, update_schema=schemas.FunctionUpdate
+    )
+    if not result.committed:
+        response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    return result
+
+@router.post("/upsert", response_model=List[schemas.Function])
+async def upsert_functions(
+    *,
+    db: Session = Depends(deps.get_db),
+    functions_in: List[schemas.FunctionCreate],
+    current_user: models.User = Depends(deps.get_current_superuser),
+) -> Any:
+    """
+    Создать или обновить функции по коду одним INSERT ... ON CONFLICT
+    """
+    try:
+        ids = await crud.function.upsert_many(db, objs_in=functions_in)
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    await db.commit()
+    return await load_in_order(db, crud.function.model, ids)
+
 @router.get("/{function_id}", response_model=schemas.Function)
 async def read_function(
     *, 
@@ -1,28 +1,64 @@
 from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.base import get_db
 from app.api.deps import get_current_active_user
+from app.api.fields import FieldsParams
+from app.api.pagination import CursorParams
 from app.crud import organization as crud_organization
 from app.models.user import User
 from app.schemas.organization import Organization, OrganizationCreate, OrganizationUpdate, OrganizationWithChildren
+from app.schemas.batch import BatchRequest, BatchResult
+from app.services.batch import load_in_order, run_batch
 
 router = APIRouter()
 
+def _build_organization_tree(rows: List[Any]) -> List[OrganizationWithChildren]:
+    """Собрать вложенное дерево из строк (организация, глубина, путь) за один проход"""
+    nodes = {}
+    roots = []
+    for organization, depth, path in rows:
+        node = OrganizationWithChildren(
+            **Organization.model_validate(organization).model_dump(), depth=depth, path=path, children=[]
+        )
+        nodes[organization.id] = node
+        # Строки упорядочены по глубине: родитель уже создан
+        parent = nodes.get(organization.parent_id) if depth > 0 else None
+        if parent is not None:
+            parent.children.append(node)
+        else:
+            roots.append(node)
+    return roots
+
 @router.get("/", response_model=List[Organization])
 async def read_organizations(
+    response: Response,
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
     org_type: Optional[str] = Query(None, description="Фильтр по типу организации"),
     parent_id: Optional[int] = Query(None, description="Фильтр по родительской организации"),
+    page: CursorParams = Depends(),
+    fields: FieldsParams = Depends(),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
     Получить список организаций с возможностью фильтрации
+    
+    С параметром cursor - курсорная пагинация (следующая страница в X-Next-Cursor),
+    с fields - только перечисленные поля
     """
+    if fields.enabled:
+        return await fields.fetch(
+            crud_organization, db, response, schema=Organization, page=page,
+            skip=skip, limit=limit, org_type=org_type, parent_id=parent_id,
+        )
+    if page.enabled:
+        return await page.fetch(
+            crud_organization, db, response, limit=limit, org_type=org_type, parent_id=parent_id
+        )
     # print("--- DEBUG: Hitting restored read_organizations endpoint ---") # Оставляем для отладки, если понадобится
     if org_type:
         organizations = await crud_organization.get_by_type(
@@ -41,12 +77,20 @@ async def read_organizations(
 @router.get("/tree", response_model=List[OrganizationWithChildren])
 async def read_organization_tree(
     db: AsyncSession = Depends(get_db),
+    root_id: Optional[int] = Query(None, description="ID организации, с которой начинается дерево"),
+    max_depth: Optional[int] = Query(None, ge=0, description="Максимальная глубина дерева"),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
-    Получить дерево организаций
+    Получить дерево организаций на всю глубину (или частичное дерево от root_id)
     """
-    return await crud_organization.get_tree(db)
+    rows = await crud_organization.get_tree(db, root_id=root_id, max_depth=max_depth)
+    if root_id is not None and not rows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Организация не найдена",
+        )
+    return _build_organization_tree(rows)
 
 @router.get("/root", response_model=List[Organization])
 async def read_root_organizations(
@@ -87,6 +131,45 @@ async def create_organization(
             
     return await crud_organization.create(db, obj_in=organization_in)
 
+@router.post("/batch", response_model=BatchResult)
+async def batch_organizations(
+    *,
+    db: AsyncSession = Depends(get_db),
+    batch_in: BatchRequest,
+    response: Response,
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Пакетное создание, обновление и удаление организаций в одной транзакции.
+    
+    Ошибки возвращаются по элементам, остальные элементы записываются;
+    с atomic=true любая ошибка откатывает весь пакет (ответ 422)
+    """
+    result = await run_batch(
+        crud_organization, db, batch_in, create_schema=OrganizationCreate, update_schema=OrganizationUpdate
+    )
+    if not result.committed:
+        response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    return result
+
+@router.post("/upsert", response_model=List[Organization])
+async def upsert_organizations(
+    *,
+    db: AsyncSession = Depends(get_db),
+    organizations_in: List[OrganizationCreate],
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Создать или обновить организации по коду одним INSERT ... ON CONFLICT
+    """
+    try:
+        ids = await crud_organization.upsert_many(db, objs_in=organizations_in)
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    await db.commit()
+    return await load_in_order(db, crud_organization.model, ids)
+
 @router.get("/{id}", response_model=Organization)
 async def read_organization(
     *,
@@ -0,0 +1,49 @@
+from typing import Any, Dict, List
+import logging
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.api import deps
+from app.schemas.orgchart_role_rule import OrgChartRoleRule, OrgChartRoleRuleCreate
+from app.services import position_roles
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/", response_model=List[OrgChartRoleRule])
+async def read_role_rules(
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Правила классификации ролей оргструктуры в порядке приоритета.
+    Пустой список - действуют правила по умолчанию
+    """
+    rule = models.OrgChartRoleRule
+    return (await db.execute(select(rule).order_by(rule.priority, rule.id))).scalars().all()
+
+@router.put("/", response_model=List[OrgChartRoleRule])
+async def replace_role_rules(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    rules_in: List[OrgChartRoleRuleCreate],
+    current_user: models.User = Depends(deps.get_current_superuser),
+) -> Any:
+    """
+    Заменить набор правил целиком и пересчитать роли всех должностей и подразделений.
+    Пустой список возвращает правила по умолчанию
+    """
+    rules = await position_roles.replace_rules(db, [rule_in.model_dump() for rule_in in rules_in])
+    logger.info(f"Правила ролей оргструктуры заменены пользователем {current_user.id}: {len(rules)} шт.")
+    return rules
+
+@router.post("/reclassify", response_model=Dict[str, int])
+async def reclassify_roles(
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_superuser),
+) -> Any:
+    """Пересчитать роли по текущим правилам (например, после правки таблицы правил напрямую в БД)"""
+    return {"reclassified": await position_roles.reclassify_all(db)}
@@ -1,29 +1,53 @@
 from typing import Any, List, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select
 
 from app.db.base import get_db
 from app.api.deps import get_current_active_user_or_api_key, get_current_active_user
+from app.api.fields import FieldsParams
+from app.api.pagination import CursorParams
 from app import crud, models, schemas
-from app.schemas.position import Position, PositionCreate, PositionUpdate
+from app.schemas.position import Position, PositionCreate, PositionFunctionsUpdate, PositionUpdate
 from app.models.functional_assignment import FunctionalAssignment
+from app.schemas.batch import BatchRequest, BatchResult
+from app.services import functional_assignments
+from app.services.batch import load_in_order, run_batch
 
 router = APIRouter()
 
+def _include_functions(include: Optional[str]) -> bool:
+    """Запрошены ли данные функций (?include=functions)"""
+    return "functions" in [part.strip() for part in (include or "").split(",")]
+
 @router.get("/", response_model=List[Position])
 async def read_positions(
+    response: Response,
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
     section_id: Optional[int] = Query(None, description="Фильтр по отделу"),
+    include: Optional[str] = Query(None, description="functions - добавить краткие данные функций"),
+    page: CursorParams = Depends(),
+    fields: FieldsParams = Depends(),
     current_user_or_api_key: Union[models.User, str] = Depends(get_current_active_user_or_api_key),
 ) -> Any:
     """
     Получить список должностей с возможностью фильтрации
+    
+    С параметром cursor - курсорная пагинация (следующая страница в X-Next-Cursor),
+    с fields - только перечисленные поля (без function_ids),
+    с include=functions - названия и коды функций каждой должности
     """
-    if section_id:
+    if fields.enabled:
+        return await fields.fetch(
+            crud.position, db, response, schema=Position, page=page,
+            skip=skip, limit=limit, section_id=section_id or None,
+        )
+    if page.enabled:
+        positions = await page.fetch(crud.position, db, response, limit=limit, section_id=section_id or None)
+    elif section_id:
         positions = await crud.position.get_by_section(
             db, section_id=section_id, skip=skip, limit=limit
         )
@@ -32,14 +56,8 @@ async def read_positions(
             db, skip=skip, limit=limit
         )
     
-    # Добавляем информацию о связанных функциях
-    for position in positions:
-        # Получаем все функциональные назначения для должности
-        query = select(FunctionalAssignment.function_id).where(FunctionalAssignment.position_id == position.id)
-        result = await db.execute(query)
-        # Создаем список ID функций
-        position.function_ids = [function_id for function_id, in result]
-        
+    # Функции всех должностей страницы - одним запросом
+    await crud.position.attach_functions(db, positions, include_functions=_include_functions(include))
     return positions
 
 @router.post("/", response_model=Position)
@@ -76,45 +94,76 @@ async def create_position(
             )
     
     # Сохраняем ID функций перед созданием должности
-    function_ids = position_in.function_ids
+    function_ids = position_in.function_ids or []
     
-    # Создаем должность без function_ids (будут обрабатываться отдельно)
-    position = await crud.position.create(db, obj_in=position_data)
+    # Все функции проверяем одним запросом до создания должности
+    missing = await functional_assignments.find_missing_functions(db, function_ids)
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(functional_assignments.MissingFunctionsError(missing)),
+        )
     
-    # Создаем функциональные назначения для новой должности
+    # Создаем должность без function_ids (будут обрабатываться отдельно);
+    # должность и ее функциональные назначения фиксируются одним коммитом
+    position = await crud.position.create(db, obj_in=position_data, commit=False)
     if function_ids:
-        for function_id in function_ids:
-            # Проверяем существование функции
-            function = await crud.function.get(db, id=function_id)
-            if not function:
-                # Откатываем транзакцию и выходим с ошибкой
-                await db.rollback()
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Функция с ID {function_id} не найдена",
-                )
-            
-            # Создаем функциональное назначение
-            assignment = FunctionalAssignment(
-                position_id=position.id,
-                function_id=function_id,
-                is_primary=False  # По умолчанию не основная функция
-            )
-            db.add(assignment)
-        
-        # Сохраняем изменения
-        await db.commit()
-        
-        # Добавляем ID функций в ответ
-        position.function_ids = function_ids
+        await functional_assignments.sync_position_functions(db, {position.id: function_ids})
+    await db.commit()
+    await db.refresh(position)
     
+    await crud.position.attach_functions(db, [position])
     return position
 
+@router.post("/batch", response_model=BatchResult)
+async def batch_positions(
+    *,
+    db: AsyncSession = Depends(get_db),
+    batch_in: BatchRequest,
+    response: Response,
+    current_user_or_api_key: Union[models.User, str] = Depends(get_current_active_user_or_api_key),
+) -> Any:
+    """
+    Пакетное создание, обновление и удаление должностей в одной транзакции. Каждая должность может содержать function_ids.
+    
+    Ошибки возвращаются по элементам, остальные элементы записываются;
+    с atomic=true любая ошибка откатывает весь пакет (ответ 422)
+    """
+    result = await run_batch(
+        crud.position, db, batch_in, create_schema=PositionCreate, update_schema=PositionUpdate
+    )
+    if not result.committed:
+        response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    return result
+
+@router.post("/upsert", response_model=List[Position])
+async def upsert_positions(
+    *,
+    db: AsyncSession = Depends(get_db),
+    positions_in: List[PositionCreate],
+    current_user_or_api_key: Union[models.User, str] = Depends(get_current_active_user_or_api_key),
+) -> Any:
+    """
+    Создать или обновить должности по коду в подразделении одним INSERT ... ON CONFLICT
+    
+    function_ids не обрабатываются - назначения меняются через PUT /{id}
+    """
+    try:
+        ids = await crud.position.upsert_many(db, objs_in=positions_in)
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    await db.commit()
+    positions = await load_in_order(db, crud.position.model, ids)
+    await crud.position.attach_functions(db, positions)
+    return positions
+
 @router.get("/{id}", response_model=Position)
 async def read_position(
     *,
     db: AsyncSession = Depends(get_db),
     id: int,
+    include: Optional[str] = Query(None, description="functions - добавить краткие данные функций"),
     current_user_or_api_key: Union[models.User, str] = Depends(get_current_active_user_or_api_key),
 ) -> Any:
     """
@@ -127,12 +176,7 @@ async def read_position(
             detail="Должность не найдена",
         )
     
-    # Получаем все функциональные назначения для должности
-    query = select(FunctionalAssignment.function_id).where(FunctionalAssignment.position_id == position.id)
-    result = await db.execute(query)
-    # Создаем список ID функций
-    position.function_ids = [function_id for function_id, in result]
-    
+    await crud.position.attach_functions(db, [position], include_functions=_include_functions(include))
     return position
 
 @router.put("/{id}", response_model=Position)
@@ -183,53 +227,46 @@ async def update_position(
     function_ids = position_in.function_ids
     
     # Если передан список функций, обновляем функциональные назначения
+    # (коммитятся вместе с полями должности)
     if function_ids is not None:
-        # Получаем текущие функциональные назначения
-        query = select(FunctionalAssignment.function_id).where(FunctionalAssignment.position_id == id)
-        result = await db.execute(query)
-        current_function_ids = [function_id for function_id, in result]
-        
-        # Определяем, какие функции нужно добавить, а какие удалить
-        functions_to_add = [f_id for f_id in function_ids if f_id not in current_function_ids]
-        functions_to_remove = [f_id for f_id in current_function_ids if f_id not in function_ids]
-        
-        # Удаляем ненужные функциональные назначения
-        if functions_to_remove:
-            delete_stmt = delete(FunctionalAssignment).where(
-                FunctionalAssignment.position_id == id,
-                FunctionalAssignment.function_id.in_(functions_to_remove)
-            )
-            await db.execute(delete_stmt)
-        
-        # Добавляем новые функциональные назначения
-        for function_id in functions_to_add:
-            # Проверяем существование функции
-            function = await crud.function.get(db, id=function_id)
-            if not function:
-                await db.rollback()
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Функция с ID {function_id} не найдена",
-                )
-            
-            # Создаем функциональное назначение
-            assignment = FunctionalAssignment(
-                position_id=id,
-                function_id=function_id,
-                is_primary=False  # По умолчанию не основная функция
-            )
-            db.add(assignment)
-        
-        await db.commit()
+        try:
+            await functional_assignments.sync_position_functions(db, {id: function_ids})
+        except functional_assignments.MissingFunctionsError as e:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     
     # Обновляем должность без function_ids
     position = await crud.position.update(db, db_obj=position, obj_in=position_data)
     
-    # Получаем обновленный список функций для ответа
-    query = select(FunctionalAssignment.function_id).where(FunctionalAssignment.position_id == id)
-    result = await db.execute(query)
-    position.function_ids = [function_id for function_id, in result]
+    await crud.position.attach_functions(db, [position])
+    return position
+
+@router.put("/{id}/functions", response_model=Position)
+async def update_position_functions(
+    *,
+    db: AsyncSession = Depends(get_db),
+    id: int,
+    functions_in: PositionFunctionsUpdate,
+    current_user_or_api_key: Union[models.User, str] = Depends(get_current_active_user_or_api_key),
+) -> Any:
+    """
+    Заменить набор функций должности
+    
+    Все отсутствующие функции возвращаются одной ошибкой 404; назначения
+    меняются одним DELETE и одним INSERT по разнице с текущими
+    """
+    position = await crud.position.get(db, id=id)
+    if not position:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Должность не найдена",
+        )
+    try:
+        await functional_assignments.sync_position_functions(db, {id: functions_in.function_ids})
+    except functional_assignments.MissingFunctionsError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    await db.commit()
     
+    await crud.position.attach_functions(db, [position])
     return position
 
 @router.delete("/{id}", response_model=Position)
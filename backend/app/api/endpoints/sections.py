@@ -1,28 +1,45 @@
 from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.base import get_db
 from app.api.deps import get_current_active_user
+from app.api.fields import FieldsParams
+from app.api.pagination import CursorParams
 from app.crud import section as crud_section
 from app.crud import division as crud_division
 from app.models.user import User
 from app.schemas.section import Section, SectionCreate, SectionUpdate
+from app.schemas.batch import BatchRequest, BatchResult
+from app.services.batch import load_in_order, run_batch
 
 router = APIRouter()
 
 @router.get("/", response_model=List[Section])
 async def read_sections(
+    response: Response,
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
     division_id: Optional[int] = Query(None, description="Фильтр по подразделению"),
+    page: CursorParams = Depends(),
+    fields: FieldsParams = Depends(),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
     Получить список отделов с возможностью фильтрации
+    
+    С параметром cursor - курсорная пагинация (следующая страница в X-Next-Cursor),
+    с fields - только перечисленные поля
     """
+    if fields.enabled:
+        return await fields.fetch(
+            crud_section, db, response, schema=Section, page=page,
+            skip=skip, limit=limit, division_id=division_id or None,
+        )
+    if page.enabled:
+        return await page.fetch(crud_section, db, response, limit=limit, division_id=division_id)
     if division_id:
         sections = await crud_section.get_by_division(
             db, division_id=division_id, skip=skip, limit=limit
@@ -71,6 +88,45 @@ async def create_section(
             
     return await crud_section.create(db, obj_in=section_in)
 
+@router.post("/batch", response_model=BatchResult)
+async def batch_sections(
+    *,
+    db: AsyncSession = Depends(get_db),
+    batch_in: BatchRequest,
+    response: Response,
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Пакетное создание, обновление и удаление отделов в одной транзакции.
+    
+    Ошибки возвращаются по элементам, остальные элементы записываются;
+    с atomic=true любая ошибка откатывает весь пакет (ответ 422)
+    """
+    result = await run_batch(
+        crud_section, db, batch_in, create_schema=SectionCreate, update_schema=SectionUpdate
+    )
+    if not result.committed:
+        response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    return result
+
+@router.post("/upsert", response_model=List[Section])
+async def upsert_sections(
+    *,
+    db: AsyncSession = Depends(get_db),
+    sections_in: List[SectionCreate],
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Создать или обновить отделы по коду в подразделении одним INSERT ... ON CONFLICT
+    """
+    try:
+        ids = await crud_section.upsert_many(db, objs_in=sections_in)
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    await db.commit()
+    return await load_in_order(db, crud_section.model, ids)
+
 @router.get("/{id}", response_model=Section)
 async def read_section(
     *,
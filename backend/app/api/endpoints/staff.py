@@ -1,20 +1,99 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, UploadFile, File, Form
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 import logging
 import json
 from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from datetime import datetime  # Добавляем импорт datetime
 from sqlalchemy import select, update, delete
 
 from app import crud, models, schemas
 from app.api import deps
+from app.api.fields import FieldsParams
+from app.api.pagination import CursorParams
 from app.core.file_utils import save_staff_photo, save_staff_document
+from app.schemas.staff_import import StaffImportResult
+from app.services import staff_export, staff_import
 
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
+
+def _organization_name(staff: models.Staff) -> str:
+    """
+    Организация сотрудника: указанная напрямую, иначе организация основной
+    должности (через отдел и подразделение либо через подразделение)
+    """
+    if staff.organization is not None:
+        return staff.organization.name
+    for sp in staff.staff_positions:
+        position = sp.position
+        if not sp.is_primary or position is None:
+            continue
+        division = position.section.division if position.section is not None else position.division
+        if division is not None and division.organization is not None:
+            return division.organization.name
+    return "Не указана"
+
+
+def _staff_detail(staff: models.Staff) -> Dict[str, Any]:
+    """Данные карточки сотрудника, загруженного через crud.staff.get_detail"""
+    return {
+        "id": staff.id,
+        "first_name": staff.first_name,
+        "last_name": staff.last_name,
+        "middle_name": staff.middle_name,
+        "email": staff.email,
+        "phone": staff.phone,
+        "hire_date": staff.hire_date,
+        "photo_path": staff.photo_path,
+        "document_paths": staff.document_paths,
+        "is_active": staff.is_active,
+        "user_id": staff.user_id,
+        "organization_id": staff.organization_id,
+        "created_at": staff.created_at,
+        "updated_at": staff.updated_at,
+        "organization_name": _organization_name(staff),
+        "positions": [
+            {
+                "id": sp.id,
+                "staff_id": sp.staff_id,
+                "position_id": sp.position_id,
+                "is_primary": sp.is_primary,
+                "position_name": sp.position.name if sp.position is not None else None,
+            }
+            for sp in staff.staff_positions
+        ],
+        "user": schemas.User.model_validate(staff.user) if staff.user is not None else None,
+    }
+
+
+def _staff_list_item(staff: models.Staff) -> Dict[str, Any]:
+    """Строка списка сотрудников, загруженного через crud.staff.get_list"""
+    primary = next((sp for sp in staff.staff_positions if sp.is_primary and sp.position is not None), None)
+    return {
+        "id": staff.id,
+        "first_name": staff.first_name,
+        "last_name": staff.last_name,
+        "middle_name": staff.middle_name,
+        "email": staff.email,
+        "phone": staff.phone,
+        "hire_date": staff.hire_date,
+        "photo_path": staff.photo_path,
+        "document_paths": staff.document_paths,
+        "is_active": staff.is_active,
+        "user_id": staff.user_id,
+        "organization_id": staff.organization_id,
+        "created_at": staff.created_at,
+        "updated_at": staff.updated_at,
+        "primary_position_name": primary.position.name if primary is not None else None,
+        "position_ids": sorted(sp.position_id for sp in staff.staff_positions),
+        "organization_name": _organization_name(staff),
+    }
+
+
 @router.post("/", response_model=schemas.StaffCreateResponse)
 async def create_staff(
     *,
@@ -52,10 +131,15 @@ async def create_staff(
         
         # Обработка позиций если они указаны
         if staff_in.positions and len(staff_in.positions) > 0:
-            # Для каждой должности в запросе
+            # Проверяем существование всех должностей одним запросом
+            positions = {
+                position.id: position
+                for position in await crud.position.get_many(
+                    db, [position_data.position_id for position_data in staff_in.positions]
+                )
+            }
             for position_data in staff_in.positions:
-                # Проверяем существование должности
-                position = await crud.position.get(db=db, id=position_data.position_id)
+                position = positions.get(position_data.position_id)
                 if not position:
                     await db.rollback()
                     logger.error(f"Должность с ID {position_data.position_id} не найдена")
@@ -113,63 +197,11 @@ async def create_staff(
         
         # Коммитим транзакцию
         await db.commit()
-        await db.refresh(staff)
-        
-        # Создаем результат для возврата
-        response_dict = {
-            "id": staff.id,
-            "first_name": staff.first_name,
-            "last_name": staff.last_name,
-            "middle_name": staff.middle_name,
-            "email": staff.email,
-            "phone": staff.phone,
-            "hire_date": staff.hire_date,
-            "photo_path": staff.photo_path,
-            "document_paths": staff.document_paths,
-            "is_active": staff.is_active,
-            "user_id": staff.user_id,
-            "organization_id": staff.organization_id,
-            "created_at": staff.created_at,
-            "updated_at": staff.updated_at,
-            "activation_code": activation_code,
-            "organization_name": None,
-            "positions": []
-        }
-        
-        # Добавляем название организации, если есть
-        if staff.organization_id:
-            org_query = select(models.Organization).filter(models.Organization.id == staff.organization_id)
-            org_result = await db.execute(org_query)
-            organization = org_result.scalars().first()
-            if organization:
-                response_dict["organization_name"] = organization.name
-        
-        # Загружаем информацию о должностях
-        sp_query = select(models.StaffPosition).filter(models.StaffPosition.staff_id == staff.id)
-        sp_result = await db.execute(sp_query)
-        staff_positions = sp_result.scalars().all()
-        
-        positions_list = []
-        for sp in staff_positions:
-            position_data = {
-                "id": sp.id,
-                "staff_id": sp.staff_id,
-                "position_id": sp.position_id,
-                "is_primary": sp.is_primary,
-                "position_name": None
-            }
-            
-            # Получаем информацию о должности
-            pos_query = select(models.Position).filter(models.Position.id == sp.position_id)
-            pos_result = await db.execute(pos_query)
-            position = pos_result.scalars().first()
-            
-            if position:
-                position_data["position_name"] = position.name
-            
-            positions_list.append(position_data)
         
-        response_dict["positions"] = positions_list
+        # Карточка созданного сотрудника одним набором запросов
+        staff = await crud.staff.get_detail(db, id=staff.id)
+        response_dict = _staff_detail(staff)
+        response_dict["activation_code"] = activation_code
         
         logger.info(f"Сотрудник успешно создан, ID: {staff.id}")
         return schemas.StaffCreateResponse(**response_dict)
@@ -300,62 +332,147 @@ async def delete_staff_document(
     
     return updated_staff
 
-@router.get("/", response_model=List[schemas.Staff])
+@router.get("/", response_model=List[schemas.StaffListItem])
 async def get_staffs(
+    response: Response,
     db: AsyncSession = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
+    organization_id: Optional[int] = None,
+    position_id: Optional[int] = None,
+    section_id: Optional[int] = None,
+    is_active: Optional[bool] = None,
+    page: CursorParams = Depends(),
+    fields: FieldsParams = Depends(),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    Получить список сотрудников.
+    Получить список сотрудников с основной должностью, ID должностей и организацией.
+    
+    Фильтры: organization_id, position_id и section_id (по назначениям), is_active.
+    С параметром cursor - курсорная пагинация (следующая страница в X-Next-Cursor),
+    с fields - только перечисленные поля (без связанных объектов).
     """
+    filters = {
+        "organization_id": organization_id,
+        "position_id": position_id,
+        "section_id": section_id,
+        "is_active": is_active,
+    }
     try:
-        staffs = await crud.staff.get_multi(db, skip=skip, limit=limit)
-        # Добавляем объекты обратно в сессию, чтобы избежать ошибок с отсоединенными объектами
-        for staff in staffs:
-            db.add(staff)
-            
-        # Расширенная диагностика для отладки
-        print(f"Retrieved {len(staffs)} staff records")
-        
-        # Заменяем лениво загружаемые отношения простыми объектами
-        result = []
-        for staff in staffs:
-            staff_dict = {
-                "id": staff.id,
-                "first_name": staff.first_name,
-                "last_name": staff.last_name,
-                "email": staff.email,
-                "phone": staff.phone,
-                "hire_date": staff.hire_date,
-                "photo_path": staff.photo_path,
-                "is_active": staff.is_active,
-                "created_at": staff.created_at,
-                "updated_at": staff.updated_at,
-                # Безопасный доступ к связанным объектам
-                "division_id": getattr(staff, "division_id", None),
-                "position_id": getattr(staff, "position_id", None)
-            }
-            
-            # Добавляем простые версии связанных объектов, если они есть
-            if hasattr(staff, "division") and staff.division is not None:
-                staff_dict["division"] = {"id": staff.division.id, "name": staff.division.name}
-            else:
-                staff_dict["division"] = None
-                
-            if hasattr(staff, "position") and staff.position is not None:
-                staff_dict["position"] = {"id": staff.position.id, "name": staff.position.name}
-            else:
-                staff_dict["position"] = None
-                
-            result.append(schemas.Staff(**staff_dict))
-            
+        if fields.enabled:
+            return await fields.fetch(
+                crud.staff, db, response, schema=schemas.StaffListItem,
+                page=page, skip=skip, limit=limit, **filters
+            )
+        if page.enabled:
+            staffs = await page.fetch(crud.staff, db, response, limit=limit, **filters)
+        else:
+            staffs = await crud.staff.get_list(db, skip=skip, limit=limit, **filters)
+        return [_staff_list_item(staff) for staff in staffs]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка при получении списка сотрудников: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve staff: {str(e)[:100]}"
+        )
+
+@router.get("/search", response_model=List[schemas.StaffListItem])
+async def search_staff(
+    db: AsyncSession = Depends(deps.get_db),
+    q: str = Query(..., min_length=1, description="ФИО, email или телефон; допускаются опечатки и е вместо ё"),
+    skip: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Поиск сотрудников по ФИО, email и телефону.
+    Результаты упорядочены по релевантности, строки - как в списке сотрудников
+    """
+    try:
+        staffs = await crud.staff.search(db, search_term=q, skip=skip, limit=limit)
+        return [_staff_list_item(staff) for staff in staffs]
+    except Exception as e:
+        logger.error(f"Ошибка при поиске сотрудников: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search staff: {str(e)[:100]}"
+        )
+
+@router.get("/export")
+async def export_staff(
+    db: AsyncSession = Depends(deps.get_db),
+    export_format: str = Query("csv", alias="format", pattern="^(csv|xlsx|ndjson)$"),
+    organization_id: Optional[int] = None,
+    position_id: Optional[int] = None,
+    section_id: Optional[int] = None,
+    is_active: Optional[bool] = None,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Выгрузка справочника сотрудников (format=csv|xlsx|ndjson) с организацией,
+    основной должностью и списком должностей. Фильтры - как в списке сотрудников.
+    Данные передаются потоком по мере чтения из БД
+    """
+    batches = staff_export.iter_staff_batches(
+        db, organization_id=organization_id, position_id=position_id,
+        section_id=section_id, is_active=is_active,
+    )
+    if export_format == "csv":
+        content = staff_export.csv_chunks(batches)
+    elif export_format == "ndjson":
+        content = staff_export.ndjson_chunks(batches)
+    else:
+        try:
+            content = staff_export.file_chunks(await staff_export.write_xlsx(batches))
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return StreamingResponse(
+        content,
+        media_type=staff_export.EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="staff.{export_format}"'},
+    )
+
+@router.post("/import", response_model=StaffImportResult)
+async def import_staff(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    file: UploadFile = File(...),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Массовый импорт сотрудников из CSV (UTF-8, разделитель ';' или ',') или XLSX.
+    
+    Колонки (заголовок в первой строке): last_name/Фамилия, first_name/Имя и
+    необязательные middle_name/Отчество, email, phone/Телефон, hire_date/Дата приема,
+    organization/Организация (ID или код), position/Должность (ID или код; становится
+    основной), is_active/Активен. Ошибочные строки пропускаются и возвращаются в errors
+    """
+    filename = (file.filename or "").lower()
+    if filename.endswith(".csv"):
+        rows = staff_import.iter_csv_rows(file.file)
+    elif filename.endswith(".xlsx"):
+        rows = staff_import.iter_xlsx_rows(file.file)
+    else:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Поддерживаются файлы .csv и .xlsx")
+    
+    try:
+        result = await staff_import.import_staff(db, rows)
+        await db.commit()
         return result
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
-        print(f"Error in get_staffs: {str(e)}")
-        # В случае ошибки возвращаем пустой список
-        return []
+        await db.rollback()
+        logger.error(f"Ошибка при импорте сотрудников: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to import staff: {str(e)[:100]}"
+        )
 
 @router.get("/{staff_id}", response_model=schemas.Staff)
 async def read_staff(
@@ -366,117 +483,14 @@ async def read_staff(
 ) -> Any:
     """Получение информации о сотруднике по ID"""
     try:
-        # Получаем сотрудника без ленивой загрузки
-        query = select(models.Staff).filter(models.Staff.id == staff_id)
-        result = await db.execute(query)
-        staff = result.scalars().first()
+        # Сотрудник со всеми связанными данными за постоянное число запросов
+        staff = await crud.staff.get_detail(db, id=staff_id)
         
         if not staff:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Staff not found")
-            
-        # Создаем базовый словарь с полями из таблицы staff
-        staff_dict = {
-            "id": staff.id,
-            "first_name": staff.first_name,
-            "last_name": staff.last_name,
-            "middle_name": staff.middle_name,
-            "email": staff.email,
-            "phone": staff.phone,
-            "hire_date": staff.hire_date,
-            "photo_path": staff.photo_path,
-            "document_paths": staff.document_paths,
-            "is_active": staff.is_active,
-            "user_id": staff.user_id,
-            "organization_id": staff.organization_id, # Добавим organization_id
-            "created_at": staff.created_at,
-            "updated_at": staff.updated_at,
-            "organization_name": None, # Начнем с None
-            "positions": [], # Инициализируем список должностей
-            "user": None # Инициализируем пользователя
-        }
-        
-        # 1. Получаем организацию напрямую, если есть organization_id
-        if staff.organization_id:
-            org_query = select(models.Organization).filter(models.Organization.id == staff.organization_id)
-            org_result = await db.execute(org_query)
-            organization = org_result.scalars().first()
-            if organization:
-                staff_dict["organization_name"] = organization.name
-        
-        # 2. Получаем назначения должностей и пытаемся определить организацию через основную должность, если она не найдена напрямую
-        sp_query = select(models.StaffPosition).filter(models.StaffPosition.staff_id == staff_id)
-        sp_result = await db.execute(sp_query)
-        staff_positions = sp_result.scalars().all()
-        
-        positions_list = []
-        primary_position_found = False
-        
-        for sp in staff_positions:
-            position_name = None
-            # Получаем информацию о должности через отдельный запрос
-            pos_query = select(models.Position).filter(models.Position.id == sp.position_id)
-            pos_result = await db.execute(pos_query)
-            position = pos_result.scalars().first()
-            
-            if position:
-                position_name = position.name
-                # Пытаемся определить организацию через основную должность, если она еще не найдена
-                if not staff_dict["organization_name"] and sp.is_primary and position.section_id:
-                    primary_position_found = True # Отметим, что нашли основную должность
-                    # ... (остальная цепочка запросов section -> division -> organization)
-                    section_query = select(models.Section).filter(models.Section.id == position.section_id)
-                    section_result = await db.execute(section_query)
-                    section = section_result.scalars().first()
-                    
-                    if section and section.division_id:
-                        division_query = select(models.Division).filter(models.Division.id == section.division_id)
-                        division_result = await db.execute(division_query)
-                        division = division_result.scalars().first()
-                        
-                        if division and division.organization_id:
-                            org_query_nested = select(models.Organization).filter(models.Organization.id == division.organization_id)
-                            org_result_nested = await db.execute(org_query_nested)
-                            organization_nested = org_result_nested.scalars().first()
-                            
-                            if organization_nested:
-                                staff_dict["organization_name"] = organization_nested.name
-
-            # Формируем словарь для схемы StaffPosition
-            sp_dict = {
-                "id": sp.id,
-                "staff_id": sp.staff_id,
-                "position_id": sp.position_id,
-                "is_primary": sp.is_primary,
-                "position_name": position_name 
-            }
-            positions_list.append(sp_dict)
-            
-        # Если организация так и не найдена, ставим заглушку
-        if not staff_dict["organization_name"]:
-             staff_dict["organization_name"] = "Не указана"
-
-        # Добавляем сформированный список должностей
-        staff_dict["positions"] = positions_list
-        
-        # 3. Получаем пользователя, если он есть
-        if staff.user_id:
-            user_query = select(models.User).filter(models.User.id == staff.user_id)
-            user_result = await db.execute(user_query)
-            user = user_result.scalars().first()
-            
-            if user:
-                # Формируем словарь для схемы User (убедись, что она есть в schemas.staff)
-                staff_dict["user"] = {
-                    "id": user.id,
-                    "email": user.email,
-                    "full_name": user.full_name,
-                    "is_active": user.is_active
-                    # Добавь другие поля из схемы User, если нужно
-                }
 
         logger.info(f"Успешно получен сотрудник с должностями, ID: {staff.id}")
-        # Возвращаем данные, соответствующие схеме Staff
-        return schemas.Staff(**staff_dict)
+        return schemas.Staff(**_staff_detail(staff))
         
     except HTTPException:
         raise
@@ -642,12 +656,16 @@ async def update_staff(
                 logger.info(f"Удалены старые назначения должностей: {ids_to_delete}")
 
             # Добавляем/Обновляем должности из входящего списка
+            positions = {
+                position.id: position
+                for position in await crud.position.get_many(db, list(incoming_position_ids))
+            }
             for position_data in staff_in.positions:
                 position_id = position_data.position_id
                 is_primary = position_data.is_primary
                 
                 # Проверяем существование самой должности
-                position = await crud.position.get(db=db, id=position_id)
+                position = positions.get(position_id)
                 if not position:
                     logger.error(f"Должность с ID {position_id} не найдена при обновлении")
                     # Возможно, стоит откатить транзакцию или пропустить эту должность
@@ -703,11 +721,10 @@ async def update_staff(
         
         db.add(staff) # Добавляем обновленный staff и новые/измененные StaffPosition/StaffOrganization в сессию
         await db.commit()
-        await db.refresh(staff) # Обновляем объект staff из БД
         
-        # Получаем обновленную информацию о сотруднике для ответа (используем read_staff или похожую логику)
-        # Используем существующую логику read_staff, чтобы ответ был консистентным
-        return await read_staff(db=db, staff_id=staff_id)
+        # Ответ собирается так же, как в read_staff
+        staff = await crud.staff.get_detail(db, id=staff_id)
+        return schemas.Staff(**_staff_detail(staff))
         
     except HTTPException:
         raise
@@ -1,43 +1,61 @@
 from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.base import get_db
 from app.api.deps import get_current_active_user
+from app.api.fields import FieldsParams
+from app.api.pagination import CursorParams
 from app.crud import value_product as crud_value_product
 from app.crud import organization as crud_organization
 from app.models.user import User
-from app.schemas.value_product import ValueProduct, ValueProductCreate, ValueProductUpdate, ValueProductWithChildren
+from app.schemas.value_product import ValueProduct, ValueProductCreate, ValueProductUpdate, ValueProductWithChildren, ValueProductTree
+from app.services.value_product_tree import value_product_tree_cache
+from app.schemas.batch import BatchRequest, BatchResult
+from app.services.batch import run_batch
 
 router = APIRouter()
 
 @router.get("/", response_model=List[ValueProduct])
 async def read_value_products(
+    response: Response,
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
     organization_id: Optional[int] = Query(None, description="Фильтр по организации"),
     parent_id: Optional[int] = Query(None, description="Фильтр по родительскому ЦКП"),
+    value_product_status: Optional[str] = Query(None, alias="status", description="Фильтр по статусу ЦКП"),
+    page: CursorParams = Depends(),
+    fields: FieldsParams = Depends(),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
     Получить список ЦКП с возможностью фильтрации
+    
+    Фильтры можно комбинировать; общее количество подходящих ЦКП
+    возвращается в заголовке X-Total-Count. С параметром cursor - курсорная
+    пагинация (следующая страница в X-Next-Cursor), с fields - только
+    перечисленные поля
     """
-    if organization_id:
-        value_products = await crud_value_product.value_product.get_by_organization(
-            db, organization_id=organization_id, skip=skip, limit=limit
+    filters = {"organization_id": organization_id, "parent_id": parent_id, "status": value_product_status}
+    if fields.enabled:
+        total = await crud_value_product.value_product.count_filtered(db, **filters)
+        response.headers["X-Total-Count"] = str(total)
+        return await fields.fetch(
+            crud_value_product.value_product, db, response, schema=ValueProduct, page=page,
+            skip=skip, limit=limit, **filters,
         )
-    elif parent_id is not None:
-        # Временно используем стандартный фильтр, в будущем можно добавить метод в CRUD
-        value_products = await crud_value_product.value_product.get_multi(
-            db, skip=skip, limit=limit
+    if page.enabled:
+        value_products = await page.fetch(
+            crud_value_product.value_product, db, response, limit=limit, **filters
         )
-        value_products = [vp for vp in value_products if vp.parent_id == parent_id]
     else:
-        value_products = await crud_value_product.value_product.get_multi(
-            db, skip=skip, limit=limit
+        value_products = await crud_value_product.value_product.get_multi_filtered(
+            db, skip=skip, limit=limit, **filters
         )
+    total = await crud_value_product.value_product.count_filtered(db, **filters)
+    response.headers["X-Total-Count"] = str(total)
     return value_products
 
 @router.get("/root", response_model=List[ValueProduct])
@@ -56,6 +74,26 @@ async def read_root_value_products(
         )
     return await crud_value_product.value_product.get_root_value_products(db, organization_id=organization_id)
 
+@router.get("/tree", response_model=List[ValueProductTree])
+async def read_value_product_tree(
+    db: AsyncSession = Depends(get_db),
+    organization_id: int = Query(..., description="ID организации"),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Получить дерево ЦКП организации с агрегированным выполнением поддеревьев
+    
+    Дерево строится одним запросом и кэшируется до следующего изменения ЦКП
+    """
+    organization = await crud_organization.get(db, id=organization_id)
+    if not organization:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Организация не найдена",
+        )
+    payload = await value_product_tree_cache.get(db, organization_id)
+    return Response(content=payload, media_type="application/json")
+
 @router.post("/", response_model=ValueProduct)
 async def create_value_product(
     *,
@@ -67,7 +105,7 @@ async def create_value_product(
     Создать новый ЦКП
     """
     # Проверяем существование организации
-    organization = await crud_organization.organization.get(db, id=value_product_in.organization_id)
+    organization = await crud_organization.get(db, id=value_product_in.organization_id)
     if not organization:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -95,6 +133,27 @@ async def create_value_product(
             
     return await crud_value_product.value_product.create(db, obj_in=value_product_in)
 
+@router.post("/batch", response_model=BatchResult)
+async def batch_value_products(
+    *,
+    db: AsyncSession = Depends(get_db),
+    batch_in: BatchRequest,
+    response: Response,
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Пакетное создание, обновление и удаление ЦКП в одной транзакции.
+    
+    Ошибки возвращаются по элементам, остальные элементы записываются;
+    с atomic=true любая ошибка откатывает весь пакет (ответ 422)
+    """
+    result = await run_batch(
+        crud_value_product.value_product, db, batch_in, create_schema=ValueProductCreate, update_schema=ValueProductUpdate
+    )
+    if not result.committed:
+        response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    return result
+
 @router.get("/{id}", response_model=ValueProduct)
 async def read_value_product(
     *,
@@ -0,0 +1,74 @@
+"""
+Частичная выборка полей списков (sparse fieldsets).
+
+Параметр ?fields=id,name,code превращается в колоночный select() без
+построения ORM-объектов: для выпадающих списков и справочников бота из БД
+читаются и сериализуются только нужные колонки. id возвращается всегда.
+Доступны поля схемы ответа, хранящиеся в колонках модели; связанные
+и вычисляемые поля (function_ids, division и т.п.) в этом режиме не выдаются.
+Совместим с курсорной пагинацией (?cursor=).
+"""
+from typing import Any, List, Optional, Type
+
+import orjson
+from fastapi import HTTPException, Query, Response, status
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.pagination import NEXT_CURSOR_HEADER, CursorParams
+from app.crud.base import CRUDBase
+
+class FieldsParams:
+    """Параметр частичной выборки ?fields= (используется через Depends())"""
+    
+    def __init__(
+        self,
+        fields: Optional[str] = Query(
+            None, description="Поля через запятую (например, id,name,code); id возвращается всегда"
+        ),
+    ):
+        self.fields: List[str] = [field.strip() for field in (fields or "").split(",") if field.strip()]
+    
+    @property
+    def enabled(self) -> bool:
+        """Запрошена частичная выборка"""
+        return bool(self.fields)
+    
+    async def fetch(
+        self,
+        crud: CRUDBase,
+        db: AsyncSession,
+        response: Response,
+        *,
+        schema: Type[BaseModel],
+        page: CursorParams,
+        skip: int,
+        limit: int,
+        **filters: Any,
+    ) -> Response:
+        """
+        Получить строки с выбранными полями и отдать их готовым JSON
+        (минуя валидацию response_model); заголовки response сохраняются
+        """
+        unknown = [field for field in self.fields if field not in schema.model_fields]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Неизвестные поля: {', '.join(unknown)}",
+            )
+        try:
+            if page.enabled:
+                rows, next_cursor = await crud.get_page(
+                    db, cursor=page.cursor, limit=limit, fields=self.fields, **filters
+                )
+                if next_cursor is not None:
+                    response.headers[NEXT_CURSOR_HEADER] = next_cursor
+            else:
+                rows = await crud.get_multi_fields(db, fields=self.fields, skip=skip, limit=limit, **filters)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return Response(
+            content=orjson.dumps(rows, default=str),
+            media_type="application/json",
+            headers=dict(response.headers),
+        )
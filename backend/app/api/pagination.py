@@ -0,0 +1,44 @@
+"""
+Курсорная (keyset) пагинация списков.
+
+Режим включается параметром ?cursor=: пустое значение - первая страница,
+далее клиент передает значение заголовка X-Next-Cursor предыдущего ответа.
+Без параметра cursor списки работают как раньше (skip/limit).
+"""
+from typing import Any, List, Optional
+
+from fastapi import HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+
+# Заголовок с курсором следующей страницы (отсутствует на последней странице)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class CursorParams:
+    """Параметр курсорной пагинации ?cursor= (используется через Depends())"""
+    
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(
+            None, description="Курсор страницы из X-Next-Cursor; пустое значение - первая страница"
+        ),
+    ):
+        self.cursor = cursor
+    
+    @property
+    def enabled(self) -> bool:
+        """Запрошен курсорный режим"""
+        return self.cursor is not None
+    
+    async def fetch(
+        self, crud: CRUDBase, db: AsyncSession, response: Response, *, limit: int, **filters: Any
+    ) -> List[Any]:
+        """Получить страницу и записать курсор следующей в заголовок ответа"""
+        try:
+            objs, next_cursor = await crud.get_page(db, cursor=self.cursor, limit=limit, **filters)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if next_cursor is not None:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return objs
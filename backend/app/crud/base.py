@@ -1,9 +1,15 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import Any, Dict, FrozenSet, Generic, List, Optional, Sequence, Tuple, Type, TypeVar, Union
+import base64
+import binascii
+
+import orjson
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy import select, update, delete
+from sqlalchemy import delete, func, insert, inspect, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.crud import identity_cache
 from app.db.base import Base
 
 # Типы для дженериков
@@ -11,11 +17,35 @@ ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+# Строк в одном INSERT ... ON CONFLICT (держит число параметров в пределах лимита драйвера)
+UPSERT_CHUNK_SIZE = 1000
+
+def encode_cursor(sort_value: Any, id: int) -> str:
+    """Непрозрачный курсор из ключа сортировки и ID последней записи страницы"""
+    return base64.urlsafe_b64encode(orjson.dumps([sort_value, id])).rstrip(b"=").decode()
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """Разобрать курсор; ValueError - курсор поврежден"""
+    try:
+        sort_value, id = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, orjson.JSONDecodeError, TypeError, ValueError):
+        raise ValueError(f"Некорректный курсор: {cursor}")
+    if not isinstance(id, int):
+        raise ValueError(f"Некорректный курсор: {cursor}")
+    return sort_value, id
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """
     Базовый класс CRUD операций с универсальными методами для работы с моделями
     """
     
+    # Колонка сортировки в курсорном режиме (вместе с id); должна быть индексирована
+    # и иметь JSON-совместимые значения
+    cursor_sort_key: str = "id"
+    
+    # Естественный ключ для upsert - колонки уникального ограничения модели
+    natural_key: Tuple[str, ...] = ()
+    
     def __init__(self, model: Type[ModelType]):
         """
         Инициализация с моделью
@@ -25,11 +55,15 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     async def get(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
         """
         Получить объект по ID
+        Повторные чтения того же ID в запросе берутся из кэша сессии (см. identity_cache)
         """
         try:
-            query = select(self.model).filter(self.model.id == id)
-            result = await db.execute(query)
-            obj = result.scalars().first()
+            found, obj = identity_cache.lookup(db, self.model, id)
+            if not found:
+                query = select(self.model).filter(self.model.id == id)
+                result = await db.execute(query)
+                obj = result.scalars().first()
+                identity_cache.store(db, self.model, id, obj)
             # Если объект найден, добавляем его в текущую сессию, чтобы он не стал отсоединенным
             if obj is not None:
                 db.add(obj)
@@ -38,6 +72,28 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             print(f"Error in get method: {str(e)}")
             return None
     
+    async def get_many(self, db: AsyncSession, ids: Sequence[Any]) -> List[ModelType]:
+        """
+        Получить объекты по списку ID: закэшированные в сессии берутся из кэша,
+        остальные читаются одним запросом WHERE id IN (...)
+        Порядок соответствует ids, отсутствующие в БД ID пропускаются
+        """
+        objs: Dict[Any, Optional[ModelType]] = {}
+        misses = []
+        for id in dict.fromkeys(ids):
+            found, obj = identity_cache.lookup(db, self.model, id)
+            if found:
+                objs[id] = obj
+            else:
+                misses.append(id)
+        if misses:
+            result = await db.execute(select(self.model).filter(self.model.id.in_(misses)))
+            loaded = {obj.id: obj for obj in result.scalars().all()}
+            for id in misses:
+                objs[id] = loaded.get(id)
+                identity_cache.store(db, self.model, id, objs[id])
+        return [objs[id] for id in ids if objs[id] is not None]
+    
     async def get_multi(
         self, db: AsyncSession, *, skip: int = 0, limit: int = 100
     ) -> List[ModelType]:
@@ -56,6 +112,95 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             print(f"Error in get_multi method: {str(e)}")
             return []
     
+    def _field_columns(self, fields: Sequence[str]) -> List[Any]:
+        """Колонки модели по именам полей; ValueError - поле не является колонкой"""
+        column_names = inspect(self.model).column_attrs.keys()
+        unknown = [field for field in fields if field not in column_names]
+        if unknown:
+            raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+        return [getattr(self.model, field) for field in dict.fromkeys(fields)]
+    
+    def _list_options(self) -> Sequence[Any]:
+        """Опции загрузки связанных объектов для списков (get_page без fields)"""
+        return ()
+    
+    def _filtered(self, query: Any, filters: Dict[str, Any]) -> Any:
+        """Фильтры на равенство по колонкам модели (None - фильтр не применяется)"""
+        for field, value in filters.items():
+            if value is not None:
+                query = query.filter(getattr(self.model, field) == value)
+        return query
+    
+    async def get_multi_fields(
+        self, db: AsyncSession, *, fields: Sequence[str], skip: int = 0, limit: int = 100, **filters: Any
+    ) -> List[Dict[str, Any]]:
+        """
+        Получить только указанные колонки объектов (sparse fieldset)
+        
+        Выполняется колоночный select без построения ORM-объектов; id возвращается всегда.
+        filters - фильтры на равенство (None - фильтр не применяется)
+        """
+        columns = self._field_columns(["id", *fields])
+        query = self._filtered(select(*columns), filters)
+        result = await db.execute(query.order_by(self.model.id).offset(skip).limit(limit))
+        return [dict(row) for row in result.mappings()]
+    
+    async def get_page(
+        self,
+        db: AsyncSession,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+        **filters: Any,
+    ) -> Tuple[List[Any], Optional[str]]:
+        """
+        Получить страницу объектов в курсорном режиме (keyset-пагинация)
+        
+        Вместо OFFSET выбираются записи после (ключ сортировки, id) из курсора,
+        поэтому стоимость страницы не зависит от ее глубины. filters - фильтры
+        на равенство по колонкам модели (None - фильтр не применяется).
+        С fields вместо объектов возвращаются словари с этими колонками и id.
+        Возвращает записи и курсор следующей страницы (None - страниц больше нет)
+        """
+        sort_column = getattr(self.model, self.cursor_sort_key)
+        id_column = self.model.id
+        limit = max(limit, 1)
+        
+        if fields:
+            query = select(*self._field_columns(["id", *fields, self.cursor_sort_key]))
+        else:
+            query = select(self.model).options(*self._list_options())
+        query = self._filtered(query, filters)
+        if cursor:
+            sort_value, last_id = decode_cursor(cursor)
+            if sort_column is id_column:
+                query = query.filter(id_column > last_id)
+            else:
+                query = query.filter(tuple_(sort_column, id_column) > tuple_(sort_value, last_id))
+        if sort_column is id_column:
+            query = query.order_by(id_column)
+        else:
+            query = query.order_by(sort_column, id_column)
+        
+        result = await db.execute(query.limit(limit + 1))
+        if fields:
+            objs = [dict(row) for row in result.mappings()]
+        else:
+            objs = result.unique().scalars().all()
+        next_cursor = None
+        if len(objs) > limit:
+            objs = objs[:limit]
+            last = objs[-1]
+            if fields:
+                next_cursor = encode_cursor(last[self.cursor_sort_key], last["id"])
+            else:
+                next_cursor = encode_cursor(getattr(last, self.cursor_sort_key), last.id)
+        if fields and self.cursor_sort_key not in ("id", *fields):
+            for obj in objs:
+                obj.pop(self.cursor_sort_key, None)
+        return objs, next_cursor
+    
     async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
         """
         Создать новый объект
@@ -96,4 +241,171 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         obj = await self.get(db, id)
         await db.delete(obj)
         await db.commit()
-        return obj 
\ No newline at end of file
+        return obj
+    
+    def _batch_values(self, obj_in: Union[BaseModel, Dict[str, Any]], exclude_unset: bool = False) -> Dict[str, Any]:
+        """
+        Значения объекта пакетной записи (схема или словарь).
+        exclude_unset - у схемы только явно переданные поля, без значений по умолчанию
+        """
+        if isinstance(obj_in, BaseModel):
+            return obj_in.model_dump(exclude_unset=exclude_unset)
+        return dict(obj_in)
+    
+    def _column_values(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Значения только для колонок модели (прочие поля схемы отбрасываются)"""
+        columns = inspect(self.model).column_attrs.keys()
+        return {field: value for field, value in data.items() if field in columns}
+    
+    async def create_many(
+        self, db: AsyncSession, *, objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]]
+    ) -> List[int]:
+        """
+        Создать несколько объектов одним многострочным INSERT ... RETURNING
+        
+        Коммит не выполняется - пакет пишется в транзакции вызывающего кода.
+        Возвращает ID созданных объектов в порядке objs_in
+        """
+        if not objs_in:
+            return []
+        data = [self._batch_values(obj_in) for obj_in in objs_in]
+        rows = [self._column_values(values) for values in data]
+        await self._before_create_many(db, rows)
+        result = await db.execute(
+            insert(self.model).returning(self.model.id, sort_by_parameter_order=True), rows
+        )
+        ids = list(result.scalars().all())
+        await self._after_create_many(db, ids, data)
+        return ids
+    
+    async def update_many(self, db: AsyncSession, *, objs_in: Sequence[Dict[str, Any]]) -> List[int]:
+        """
+        Обновить несколько объектов: objs_in - словари с id и изменяемыми полями
+        
+        Существующие ID выбираются одним запросом, изменения пишутся одним
+        UPDATE по первичному ключу с набором параметров (executemany).
+        Коммит не выполняется. Возвращает ID обновленных объектов;
+        отсутствующие в БД ID пропускаются
+        """
+        if not objs_in:
+            return []
+        requested_ids = [obj_in["id"] for obj_in in objs_in]
+        result = await db.execute(select(self.model.id).where(self.model.id.in_(requested_ids)))
+        existing_ids = set(result.scalars().all())
+        
+        data = [dict(obj_in) for obj_in in objs_in if obj_in["id"] in existing_ids]
+        rows = [self._column_values(values) for values in data]
+        await self._before_update_many(db, rows)
+        changed_rows = [row for row in rows if len(row) > 1]
+        if changed_rows:
+            await db.execute(update(self.model), changed_rows)
+        await self._after_update_many(db, rows, data)
+        return [row["id"] for row in rows]
+    
+    async def delete_many(self, db: AsyncSession, *, ids: Sequence[int]) -> List[int]:
+        """
+        Удалить несколько объектов одним DELETE ... WHERE id IN (...) RETURNING id
+        
+        Коммит не выполняется. Возвращает ID удаленных объектов
+        """
+        if not ids:
+            return []
+        ids = list(ids)
+        await self._before_delete_many(db, ids)
+        result = await db.execute(
+            delete(self.model).where(self.model.id.in_(ids)).returning(self.model.id)
+        )
+        return list(result.scalars().all())
+    
+    async def upsert(
+        self, db: AsyncSession, *, obj_in: Union[CreateSchemaType, Dict[str, Any]]
+    ) -> ModelType:
+        """
+        Создать объект или обновить существующий с тем же естественным ключом
+        одним INSERT ... ON CONFLICT DO UPDATE
+        """
+        (id,) = await self.upsert_many(db, objs_in=[obj_in])
+        await db.commit()
+        result = await db.execute(
+            select(self.model).filter(self.model.id == id).execution_options(populate_existing=True)
+        )
+        return result.scalars().one()
+    
+    async def upsert_many(
+        self, db: AsyncSession, *, objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]]
+    ) -> List[int]:
+        """
+        Синхронизировать набор объектов по естественному ключу (natural_key):
+        отсутствующие создаются, существующие обновляются переданными полями
+        (не переданные поля сохраняют записанные значения).
+        Пишется многострочным INSERT ... ON CONFLICT DO UPDATE по UPSERT_CHUNK_SIZE строк;
+        строки с разным набором полей пишутся разными запросами
+        
+        Коммит не выполняется. Возвращает ID в порядке objs_in; при повторе ключа
+        в наборе побеждает последнее значение. ValueError - ключ заполнен не полностью
+        (NULL в ключе не совпадает ни с одной строкой)
+        """
+        if not self.natural_key:
+            raise NotImplementedError(f"Для {self.model.__name__} не задан естественный ключ")
+        if not objs_in:
+            return []
+        
+        rows_by_key: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+        keys: List[Tuple[Any, ...]] = []
+        for obj_in in objs_in:
+            row = self._column_values(self._batch_values(obj_in, exclude_unset=True))
+            row.pop("id", None)
+            key = tuple(row.get(field) for field in self.natural_key)
+            if None in key:
+                raise ValueError(f"Не заполнен ключ {', '.join(self.natural_key)}")
+            keys.append(key)
+            rows_by_key.pop(key, None)
+            rows_by_key[key] = row
+        rows = list(rows_by_key.values())
+        await self._before_create_many(db, rows)
+        
+        # Многострочный VALUES требует одинаковых колонок, а SET - только переданные поля
+        groups: Dict[FrozenSet[str], List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(frozenset(row), []).append(row)
+        
+        dialect_insert = sqlite.insert if db.get_bind().dialect.name == "sqlite" else postgresql.insert
+        key_columns = [getattr(self.model, field) for field in self.natural_key]
+        ids: Dict[Tuple[Any, ...], int] = {}
+        for columns, group in groups.items():
+            for start in range(0, len(group), UPSERT_CHUNK_SIZE):
+                statement = dialect_insert(self.model).values(group[start:start + UPSERT_CHUNK_SIZE])
+                updated = {
+                    column.name: statement.excluded[column.name]
+                    for column in self.model.__table__.columns
+                    if column.name in columns and column.name not in self.natural_key
+                }
+                if "updated_at" in self.model.__table__.columns:
+                    updated["updated_at"] = func.now()
+                if not updated:
+                    # Обновлять нечего, но ID существующей строки нужен в RETURNING
+                    updated = {self.natural_key[0]: statement.excluded[self.natural_key[0]]}
+                statement = statement.on_conflict_do_update(
+                    index_elements=list(self.natural_key), set_=updated
+                ).returning(self.model.id, *key_columns)
+                result = await db.execute(statement)
+                for id, *key in result:
+                    ids[tuple(key)] = id
+        return [ids[key] for key in keys]
+    
+    async def _before_create_many(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        """Дополнить строки пакетной вставки вычисляемыми полями"""
+    
+    async def _after_create_many(self, db: AsyncSession, ids: List[int], data: List[Dict[str, Any]]) -> None:
+        """Записать связанные данные созданных объектов (data - исходные значения)"""
+    
+    async def _before_update_many(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        """Дополнить строки пакетного обновления вычисляемыми полями"""
+    
+    async def _after_update_many(
+        self, db: AsyncSession, rows: List[Dict[str, Any]], data: List[Dict[str, Any]]
+    ) -> None:
+        """Обновить связанные данные измененных объектов (data - исходные значения)"""
+    
+    async def _before_delete_many(self, db: AsyncSession, ids: List[int]) -> None:
+        """Удалить зависимые данные перед пакетным удалением"""
@@ -1,14 +1,17 @@
-from typing import List, Optional, Union, Dict, Any
+from typing import List, Optional, Sequence, Union, Dict, Any
 from sqlalchemy.orm import Session
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select
+from sqlalchemy import delete, insert, literal_column, select, tuple_, union_all, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 import time
 import logging
 
 from app.crud.base import CRUDBase
 from app.models.division import Division
+from app.models.division_closure import DivisionClosure
 from app.schemas.division import DivisionCreate, DivisionUpdate
+from app.services import position_roles
 
 # Получаем логгер
 logger = logging.getLogger(__name__)
@@ -16,6 +19,8 @@ logger = logging.getLogger(__name__)
 class CRUDDivision(CRUDBase[Division, DivisionCreate, DivisionUpdate]):
     """CRUD для работы с подразделениями"""
     
+    natural_key = ("code", "organization_id")
+    
     async def get_by_code_and_org(
         self, db: AsyncSession, *, code: str, organization_id: int
     ) -> Optional[Division]:
@@ -102,7 +107,10 @@ class CRUDDivision(CRUDBase[Division, DivisionCreate, DivisionUpdate]):
         start_time = time.time()
         obj_in_data = jsonable_encoder(division_in)
         db_division = self.model(**obj_in_data)
+        await position_roles.apply_division_roles(db, db_division)
         db.add(db_division)
+        await db.flush()
+        await self._link_closure(db, [db_division.id])
         await db.commit()
         await db.refresh(db_division)
         create_time = time.time() - start_time
@@ -124,11 +132,16 @@ class CRUDDivision(CRUDBase[Division, DivisionCreate, DivisionUpdate]):
         else:
             update_data = obj_in.model_dump(exclude_unset=True)
             
+        old_parent_id = db_obj.parent_id
         for field in obj_data:
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
-                
+        
+        await position_roles.apply_division_roles(db, db_obj)
         db.add(db_obj)
+        if db_obj.parent_id != old_parent_id:
+            await db.flush()
+            await self._move_closure(db, db_obj.id)
         await db.commit()
         await db.refresh(db_obj)
         update_time = time.time() - start_time
@@ -140,6 +153,9 @@ class CRUDDivision(CRUDBase[Division, DivisionCreate, DivisionUpdate]):
         start_time = time.time()
         division = await self.get_division(db, division_id)
         if division:
+            # Дочерние подразделения (если есть) становятся корневыми
+            await self._unlink_subtree(db, division_id)
+            await db.execute(delete(DivisionClosure).where(DivisionClosure.ancestor_id == division_id))
             await db.delete(division)
             await db.commit()
         delete_time = time.time() - start_time
@@ -148,19 +164,215 @@ class CRUDDivision(CRUDBase[Division, DivisionCreate, DivisionUpdate]):
 
     async def get_division_tree(self, db: AsyncSession, organization_id: int) -> List[Division]:
         """
-        Получить дерево подразделений для организации
-        Возвращает список корневых подразделений с вложенными дочерними
+        Получить все подразделения организации одним запросом
+        Дерево собирается вызывающим кодом по parent_id за один проход
         """
         start_time = time.time()
         query = select(self.model).filter(
-            self.model.organization_id == organization_id,
-            self.model.parent_id.is_(None)
+            self.model.organization_id == organization_id
+        ).order_by(self.model.id)
+        result = await db.execute(query)
+        divisions = result.scalars().all()
+        query_time = time.time() - start_time
+        logger.info(f"get_division_tree получил {len(divisions)} записей за {query_time:.4f}s")
+        return divisions
+
+    async def get_descendants(
+        self, db: AsyncSession, division_id: int, max_depth: Optional[int] = None
+    ) -> List[Division]:
+        """
+        Получить всех потомков подразделения (без него самого) одним запросом
+        Порядок - по удаленности от подразделения, родители раньше детей
+        """
+        start_time = time.time()
+        query = (
+            select(self.model)
+            .join(DivisionClosure, DivisionClosure.descendant_id == self.model.id)
+            .filter(DivisionClosure.ancestor_id == division_id, DivisionClosure.depth > 0)
+            .order_by(DivisionClosure.depth, self.model.id)
         )
+        if max_depth is not None:
+            query = query.filter(DivisionClosure.depth <= max_depth)
         result = await db.execute(query)
         divisions = result.scalars().all()
         query_time = time.time() - start_time
-        logger.info(f"get_division_tree получил {len(divisions)} корневых записей за {query_time:.4f}s")
+        logger.info(f"get_descendants ID={division_id} получил {len(divisions)} записей за {query_time:.4f}s")
         return divisions
 
+    async def get_ancestors(self, db: AsyncSession, division_id: int) -> List[Division]:
+        """
+        Получить всех предков подразделения одним запросом
+        Порядок - от корневого подразделения к непосредственному родителю
+        """
+        start_time = time.time()
+        query = (
+            select(self.model)
+            .join(DivisionClosure, DivisionClosure.ancestor_id == self.model.id)
+            .filter(DivisionClosure.descendant_id == division_id, DivisionClosure.depth > 0)
+            .order_by(DivisionClosure.depth.desc())
+        )
+        result = await db.execute(query)
+        divisions = result.scalars().all()
+        query_time = time.time() - start_time
+        logger.info(f"get_ancestors ID={division_id} получил {len(divisions)} записей за {query_time:.4f}s")
+        return divisions
+
+    async def get_subtree(
+        self, db: AsyncSession, division_id: int, max_depth: Optional[int] = None
+    ) -> List[Division]:
+        """
+        Получить поддерево подразделения одним запросом: само подразделение и его потомков
+        Родители идут раньше детей, поэтому дерево собирается по parent_id за один проход
+        """
+        start_time = time.time()
+        query = (
+            select(self.model)
+            .join(DivisionClosure, DivisionClosure.descendant_id == self.model.id)
+            .filter(DivisionClosure.ancestor_id == division_id)
+            .order_by(DivisionClosure.depth, self.model.id)
+        )
+        if max_depth is not None:
+            query = query.filter(DivisionClosure.depth <= max_depth)
+        result = await db.execute(query)
+        divisions = result.scalars().all()
+        query_time = time.time() - start_time
+        logger.info(f"get_subtree ID={division_id} получил {len(divisions)} записей за {query_time:.4f}s")
+        return divisions
+
+    async def is_descendant(self, db: AsyncSession, ancestor_id: int, descendant_id: int) -> bool:
+        """
+        Проверить, входит ли descendant_id в поддерево ancestor_id (включая его самого)
+        Один поиск по первичному ключу замыкания - используется для проверки циклов
+        """
+        query = select(DivisionClosure.depth).filter(
+            DivisionClosure.ancestor_id == ancestor_id,
+            DivisionClosure.descendant_id == descendant_id,
+        )
+        result = await db.execute(query)
+        return result.first() is not None
+
+    async def update_many(self, db: AsyncSession, *, objs_in: Sequence[Dict[str, Any]]) -> List[int]:
+        """
+        Пакетное обновление подразделений с переносом поддеревьев в замыкании
+        ValueError - подразделение переносится внутрь своего поддерева
+        """
+        new_parents = {obj_in["id"]: obj_in["parent_id"] for obj_in in objs_in if "parent_id" in obj_in}
+        old_parents: Dict[int, Optional[int]] = {}
+        if new_parents:
+            result = await db.execute(
+                select(self.model.id, self.model.parent_id).where(self.model.id.in_(list(new_parents)))
+            )
+            old_parents = dict(result.all())
+        
+        ids = await super().update_many(db, objs_in=objs_in)
+        await self._move_changed(db, old_parents)
+        return ids
+    
+    async def upsert_many(
+        self, db: AsyncSession, *, objs_in: Sequence[Union[DivisionCreate, Dict[str, Any]]]
+    ) -> List[int]:
+        """
+        Upsert подразделений по коду в организации с поддержкой замыкания:
+        новые подразделения связываются с предками, перенесенные - перемещаются
+        """
+        values = [self._batch_values(obj_in, exclude_unset=True) for obj_in in objs_in]
+        keys = {(obj_values.get("code"), obj_values.get("organization_id")) for obj_values in values}
+        result = await db.execute(
+            select(self.model.id, self.model.parent_id)
+            .where(tuple_(self.model.code, self.model.organization_id).in_(list(keys)))
+        )
+        old_parents: Dict[int, Optional[int]] = dict(result.all())
+        
+        ids = await super().upsert_many(db, objs_in=values)
+        new_ids = [division_id for division_id in dict.fromkeys(ids) if division_id not in old_parents]
+        if new_ids:
+            await self._link_closure(db, new_ids)
+        await self._move_changed(db, old_parents)
+        return ids
+    
+    async def _move_changed(self, db: AsyncSession, old_parents: Dict[int, Optional[int]]) -> None:
+        """
+        Перенести в замыкании подразделения, у которых parent_id изменился (уже записан).
+        Переносы проверяются на циклы по очереди, с учетом уже выполненных
+        """
+        if not old_parents:
+            return
+        result = await db.execute(
+            select(self.model.id, self.model.parent_id).where(self.model.id.in_(list(old_parents)))
+        )
+        for division_id, parent_id in result.all():
+            if parent_id == old_parents[division_id]:
+                continue
+            if parent_id is not None and await self.is_descendant(db, division_id, parent_id):
+                raise ValueError("Нельзя перенести подразделение внутрь его собственного поддерева")
+            await self._move_closure(db, division_id)
+    
+    async def _before_create_many(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        await position_roles.apply_division_roles_many(db, rows)
+    
+    async def _after_create_many(self, db: AsyncSession, ids: List[int], data: List[Dict[str, Any]]) -> None:
+        await self._link_closure(db, ids)
+    
+    async def _before_update_many(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        role_rows = [row for row in rows if "name" in row]
+        if role_rows:
+            await position_roles.apply_division_roles_many(db, role_rows)
+    
+    async def _before_delete_many(self, db: AsyncSession, ids: List[int]) -> None:
+        # Как при удалении одного подразделения: дочерние подразделения становятся корневыми
+        for division_id in ids:
+            await self._unlink_subtree(db, division_id)
+        await db.execute(delete(DivisionClosure).where(DivisionClosure.ancestor_id.in_(ids)))
+        await db.execute(update(self.model).where(self.model.parent_id.in_(ids)).values(parent_id=None))
+    
+    async def _link_closure(self, db: AsyncSession, division_ids: List[int]) -> None:
+        """Строки замыкания новых подразделений: ссылка на себя и на всех предков родителя"""
+        parent_closure = aliased(DivisionClosure)
+        rows = union_all(
+            select(self.model.id, self.model.id, literal_column("0")).filter(self.model.id.in_(division_ids)),
+            select(parent_closure.ancestor_id, self.model.id, parent_closure.depth + 1)
+            .join(parent_closure, parent_closure.descendant_id == self.model.parent_id)
+            .filter(self.model.id.in_(division_ids)),
+        )
+        await db.execute(
+            insert(DivisionClosure).from_select(["ancestor_id", "descendant_id", "depth"], rows)
+        )
+
+    async def _unlink_subtree(self, db: AsyncSession, division_id: int) -> None:
+        """Удалить связи поддерева подразделения с его прежними предками"""
+        subtree = select(DivisionClosure.descendant_id).filter(DivisionClosure.ancestor_id == division_id)
+        ancestors = select(DivisionClosure.ancestor_id).filter(
+            DivisionClosure.descendant_id == division_id, DivisionClosure.depth > 0
+        )
+        await db.execute(
+            delete(DivisionClosure).where(
+                DivisionClosure.descendant_id.in_(subtree),
+                DivisionClosure.ancestor_id.in_(ancestors),
+            )
+        )
+
+    async def _move_closure(self, db: AsyncSession, division_id: int) -> None:
+        """
+        Перенести поддерево подразделения к новому родителю (parent_id уже записан):
+        связи с прежними предками удаляются, с новыми - добавляются одним INSERT ... SELECT
+        """
+        await self._unlink_subtree(db, division_id)
+        parent_closure = aliased(DivisionClosure)
+        subtree_closure = aliased(DivisionClosure)
+        rows = (
+            select(
+                parent_closure.ancestor_id,
+                subtree_closure.descendant_id,
+                parent_closure.depth + subtree_closure.depth + 1,
+            )
+            .select_from(self.model)
+            .join(parent_closure, parent_closure.descendant_id == self.model.parent_id)
+            .join(subtree_closure, subtree_closure.ancestor_id == self.model.id)
+            .filter(self.model.id == division_id)
+        )
+        await db.execute(
+            insert(DivisionClosure).from_select(["ancestor_id", "descendant_id", "depth"], rows)
+        )
+
 # Создаем экземпляр для работы с division
 division = CRUDDivision(Division) 
\ No newline at end of file
@@ -10,6 +10,8 @@ from app.schemas.function import FunctionCreate, FunctionUpdate
 class CRUDFunction(CRUDBase[Function, FunctionCreate, FunctionUpdate]):
     """CRUD для работы с функциями"""
     
+    natural_key = ("code",)
+    
     async def get_by_code(
         self, db: AsyncSession, *, code: str
     ) -> Optional[Function]:
@@ -0,0 +1,78 @@
+"""
+Кэш объектов по ID в пределах сессии БД (то есть одного запроса).
+
+CRUDBase.get и get_many сначала смотрят в кэш, промахи читаются из БД
+(get_many - одним IN-запросом) и запоминаются вместе с отсутствием объекта.
+Кэш хранится в session.info и сбрасывается событиями сессии при записи:
+flush сбрасывает записи вставленных, измененных и удаленных объектов, массовые
+INSERT/UPDATE/DELETE - все записи своей модели, откат - весь кэш. Объекты
+с истекшими атрибутами (после коммита или отката) считаются промахом.
+"""
+from typing import Any, Dict, Optional, Tuple, Type
+
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session
+
+# Ключ кэша в session.info: (модель, id) -> объект или None (объекта нет в БД)
+SESSION_CACHE_KEY = "crud_identity_cache"
+
+CacheKey = Tuple[Type[Any], Any]
+
+
+def _usable(obj: Any) -> bool:
+    """Объект привязан к сессии и загружен полностью (чтение не пойдет в БД)"""
+    state = inspect(obj)
+    return state.persistent and not state.expired_attributes
+
+
+def lookup(db: AsyncSession, model: Type[Any], id: Any) -> Tuple[bool, Optional[Any]]:
+    """(найдено в кэше, объект); None с True - объекта нет в БД"""
+    cache: Optional[Dict[CacheKey, Any]] = db.info.get(SESSION_CACHE_KEY)
+    if not cache or (model, id) not in cache:
+        return False, None
+    obj = cache[(model, id)]
+    if obj is not None and not _usable(obj):
+        del cache[(model, id)]
+        return False, None
+    return True, obj
+
+
+def store(db: AsyncSession, model: Type[Any], id: Any, obj: Optional[Any]) -> None:
+    """Запомнить результат чтения по ID (в том числе отсутствие объекта)"""
+    db.info.setdefault(SESSION_CACHE_KEY, {})[(model, id)] = obj
+
+
+def _after_flush(session: Session, flush_context: Any) -> None:
+    cache: Optional[Dict[CacheKey, Any]] = session.info.get(SESSION_CACHE_KEY)
+    if not cache:
+        return
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        state = inspect(obj)
+        # У только что вставленных объектов identity появляется после этого события
+        identity = state.identity or state.mapper.primary_key_from_instance(obj)
+        cache.pop((type(obj), identity[0]), None)
+
+
+def _do_orm_execute(state: ORMExecuteState) -> None:
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    cache: Optional[Dict[CacheKey, Any]] = state.session.info.get(SESSION_CACHE_KEY)
+    if not cache:
+        return
+    mapper = state.bind_mapper
+    if mapper is None:
+        # Запрос к таблице без модели - не знаем, что изменилось
+        cache.clear()
+        return
+    for key in [key for key in cache if key[0] is mapper.class_]:
+        del cache[key]
+
+
+def _after_soft_rollback(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(SESSION_CACHE_KEY, None)
+
+
+event.listen(Session, "after_flush", _after_flush)
+event.listen(Session, "do_orm_execute", _do_orm_execute)
+event.listen(Session, "after_soft_rollback", _after_soft_rollback)
@@ -1,15 +1,20 @@
-from typing import List, Optional
-from sqlalchemy import select
+from typing import List, Optional, Tuple
+from sqlalchemy import Text, cast, literal_column, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased, selectinload
 
 from app.crud.base import CRUDBase
 from app.models.organization import Organization
 from app.schemas.organization import OrganizationCreate, OrganizationUpdate
 
+# Предельная глубина дерева организаций (защита от циклов в parent_id)
+ORGANIZATION_TREE_MAX_DEPTH = 64
+
 class CRUDOrganization(CRUDBase[Organization, OrganizationCreate, OrganizationUpdate]):
     """CRUD операции для организаций"""
     
+    natural_key = ("code",)
+    
     async def get_by_code(self, db: AsyncSession, *, code: str) -> Optional[Organization]:
         """Получить организацию по коду"""
         query = select(Organization).filter(Organization.code == code)
@@ -50,11 +55,47 @@ class CRUDOrganization(CRUDBase[Organization, OrganizationCreate, OrganizationUp
         result = await db.execute(query)
         return result.scalars().all()
     
-    async def get_tree(self, db: AsyncSession) -> List[Organization]:
-        """Получить дерево организаций"""
-        query = select(Organization).options(selectinload(Organization.children)).filter(Organization.parent_id == None)
+    async def get_tree(
+        self, db: AsyncSession, *, root_id: Optional[int] = None, max_depth: Optional[int] = None
+    ) -> List[Tuple[Organization, int, str]]:
+        """
+        Получить дерево организаций одним рекурсивным запросом (WITH RECURSIVE)
+        
+        Возвращает тройки (организация, глубина, путь из ID через '/') от корневых
+        организаций (или от root_id) на любую глубину, не глубже max_depth.
+        Родители идут раньше детей, поэтому дерево собирается за один проход
+        """
+        depth_limit = ORGANIZATION_TREE_MAX_DEPTH if max_depth is None else min(max_depth, ORGANIZATION_TREE_MAX_DEPTH)
+        
+        roots = select(
+            Organization.id,
+            literal_column("0").label("depth"),
+            cast(Organization.id, Text).label("path"),
+        )
+        if root_id is not None:
+            roots = roots.filter(Organization.id == root_id)
+        else:
+            roots = roots.filter(Organization.parent_id == None)
+        tree = roots.cte("organization_tree", recursive=True)
+        
+        child = aliased(Organization)
+        tree = tree.union_all(
+            select(
+                child.id,
+                tree.c.depth + 1,
+                tree.c.path + "/" + cast(child.id, Text),
+            )
+            .join(tree, child.parent_id == tree.c.id)
+            .filter(tree.c.depth < depth_limit)
+        )
+        
+        query = (
+            select(Organization, tree.c.depth, tree.c.path)
+            .join(tree, Organization.id == tree.c.id)
+            .order_by(tree.c.depth, Organization.name, Organization.id)
+        )
         result = await db.execute(query)
-        return result.scalars().all()
+        return result.all()
 
 # Создание синглтона для использования в приложении
 organization = CRUDOrganization(Organization) 
\ No newline at end of file
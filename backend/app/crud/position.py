@@ -1,15 +1,133 @@
-from typing import List, Optional, Union
+from typing import Any, Dict, List, Optional, Sequence, Union
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select, or_
+from sqlalchemy import delete, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.crud.base import CRUDBase
+from app.models.function import Function
+from app.models.functional_assignment import FunctionalAssignment
 from app.models.position import Position
 from app.schemas.position import PositionCreate, PositionUpdate
+from app.services import functional_assignments, position_roles
 
 class CRUDPosition(CRUDBase[Position, PositionCreate, PositionUpdate]):
     """CRUD для работы с должностями"""
     
+    natural_key = ("code", "division_id")
+    
+    async def create(
+        self, db: AsyncSession, *, obj_in: Union[PositionCreate, Dict[str, Any]], commit: bool = True
+    ) -> Position:
+        """
+        Создать должность и вычислить ее роль в оргструктуре.
+        При commit=False запись только сбрасывается в БД (ID уже известен),
+        коммит выполняет вызывающий код
+        """
+        obj_in_data = jsonable_encoder(obj_in)
+        db_obj = self.model(**obj_in_data)
+        await position_roles.apply_position_roles(db, db_obj)
+        db.add(db_obj)
+        if commit:
+            await db.commit()
+            await db.refresh(db_obj)
+        else:
+            await db.flush()
+        return db_obj
+    
+    async def update(
+        self, db: AsyncSession, *, db_obj: Position, obj_in: Union[PositionUpdate, Dict[str, Any]]
+    ) -> Position:
+        """
+        Обновить должность и пересчитать ее роль в оргструктуре
+        """
+        obj_data = jsonable_encoder(db_obj)
+        
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+            
+        for field in obj_data:
+            if field in update_data:
+                setattr(db_obj, field, update_data[field])
+        
+        await position_roles.apply_position_roles(db, db_obj)
+        db.add(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
+        return db_obj
+    
+    async def _before_create_many(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        await position_roles.apply_position_roles_many(db, rows)
+    
+    async def _after_create_many(self, db: AsyncSession, ids: List[int], data: List[Dict[str, Any]]) -> None:
+        await functional_assignments.sync_position_functions(
+            db, {id: values.get("function_ids") or [] for id, values in zip(ids, data)}
+        )
+    
+    async def _before_update_many(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        # Роль зависит от названия и атрибута - недостающее берем из БД одним запросом
+        role_rows = [row for row in rows if "name" in row or "attribute" in row]
+        if not role_rows:
+            return
+        result = await db.execute(
+            select(self.model.id, self.model.name, self.model.attribute)
+            .where(self.model.id.in_([row["id"] for row in role_rows]))
+        )
+        current = {id: {"name": name, "attribute": attribute} for id, name, attribute in result}
+        values = [{**current[row["id"]], **row} for row in role_rows]
+        await position_roles.apply_position_roles_many(db, values)
+        for row, row_values in zip(role_rows, values):
+            row.update(
+                is_top_manager=row_values["is_top_manager"],
+                is_ceo=row_values["is_ceo"],
+                director_category=row_values["director_category"],
+            )
+    
+    async def _after_update_many(
+        self, db: AsyncSession, rows: List[Dict[str, Any]], data: List[Dict[str, Any]]
+    ) -> None:
+        await functional_assignments.sync_position_functions(
+            db, {values["id"]: values["function_ids"] for values in data if values.get("function_ids") is not None}
+        )
+    
+    async def _before_delete_many(self, db: AsyncSession, ids: List[int]) -> None:
+        await db.execute(delete(FunctionalAssignment).where(FunctionalAssignment.position_id.in_(ids)))
+    
+    async def attach_functions(
+        self, db: AsyncSession, positions: Sequence[Position], *, include_functions: bool = False
+    ) -> None:
+        """
+        Заполнить function_ids (и functions - краткие данные функций) у должностей
+        одним запросом на все должности, а не по запросу на каждую
+        """
+        if not positions:
+            return
+        position_ids = [position.id for position in positions]
+        if include_functions:
+            query = (
+                select(FunctionalAssignment.position_id, Function.id, Function.name, Function.code)
+                .join(Function, Function.id == FunctionalAssignment.function_id)
+            )
+        else:
+            query = select(FunctionalAssignment.position_id, FunctionalAssignment.function_id)
+        query = query.where(FunctionalAssignment.position_id.in_(position_ids)).order_by(
+            FunctionalAssignment.position_id, FunctionalAssignment.function_id
+        )
+        result = await db.execute(query)
+        
+        functions: Dict[int, List[Dict[str, Any]]] = {}
+        for position_id, function_id, *details in result:
+            function = {"id": function_id}
+            if include_functions:
+                function.update(name=details[0], code=details[1])
+            functions.setdefault(position_id, []).append(function)
+        for position in positions:
+            position_functions = functions.get(position.id, [])
+            position.function_ids = [function["id"] for function in position_functions]
+            if include_functions:
+                position.functions = position_functions
+    
     async def get_by_code_and_division(
         self, db: AsyncSession, *, code: str, division_id: int
     ) -> Optional[Position]:
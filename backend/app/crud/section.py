@@ -10,6 +10,8 @@ from app.schemas.section import SectionCreate, SectionUpdate
 class CRUDSection(CRUDBase[Section, SectionCreate, SectionUpdate]):
     """CRUD для работы с отделами"""
     
+    natural_key = ("code", "division_id")
+    
     async def get_by_code_and_division(
         self, db: AsyncSession, *, code: str, division_id: int
     ) -> Optional[Section]:
@@ -1,12 +1,33 @@
 from typing import List, Optional, Dict, Any
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select, or_
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, func, literal, literal_column, select, or_
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+from sqlalchemy.orm import aliased, joinedload
 
 from app.crud.base import CRUDBase
+from app.models.division import Division
+from app.models.organization import Organization
+from app.models.position import Position
+from app.models.section import Section
 from app.models.staff import Staff
+from app.models.staff_position import StaffPosition
 from app.schemas.staff import StaffCreate, StaffUpdate
 
+# Поисковый документ сотрудника: ФИО, email и телефон в нижнем регистре, ё заменена на е.
+# Выражения совпадают с индексами миграции d9b3f6a2c417 (GIN pg_trgm и GIN tsvector),
+# поэтому записаны SQL-текстом без параметров - иначе PostgreSQL не сопоставит их с индексами
+STAFF_SEARCH_DOCUMENT = (
+    "translate(lower(coalesce(staff.last_name, '') || ' ' || coalesce(staff.first_name, '') || ' ' "
+    "|| coalesce(staff.middle_name, '') || ' ' || coalesce(staff.email, '') || ' ' "
+    "|| coalesce(staff.phone, '')), 'ё', 'е')"
+)
+STAFF_SEARCH_VECTOR = f"to_tsvector('russian'::regconfig, {STAFF_SEARCH_DOCUMENT})"
+
+
+def normalize_search_term(search_term: str) -> str:
+    """Поисковая строка в форме документа: нижний регистр, ё -> е, одиночные пробелы"""
+    return " ".join(search_term.lower().replace("ё", "е").split())
+
 class CRUDStaff(CRUDBase[Staff, StaffCreate, StaffUpdate]):
     """CRUD для работы с сотрудниками"""
     
@@ -29,21 +50,154 @@ class CRUDStaff(CRUDBase[Staff, StaffCreate, StaffUpdate]):
         query = select(self.model).filter(self.model.user_id == user_id)
         result = await db.execute(query)
         return result.scalars().first()
-        
+
+    def _card_options(self) -> List[Any]:
+        """
+        Опции загрузки карточки: организация и должности с отделом,
+        подразделением и организацией - одним запросом с JOIN
+        """
+        position_path = joinedload(Staff.staff_positions).joinedload(StaffPosition.position)
+        return [
+            joinedload(Staff.organization),
+            position_path.joinedload(Position.section)
+            .joinedload(Section.division).joinedload(Division.organization),
+            position_path.joinedload(Position.division).joinedload(Division.organization),
+        ]
+
+    def _list_options(self) -> List[Any]:
+        return self._card_options()
+
+    def _filtered(self, query: Any, filters: Dict[str, Any]) -> Any:
+        """
+        Фильтры списка: колонки сотрудника, а также position_id и section_id
+        по назначениям на должности (EXISTS по staff_position)
+        """
+        filters = dict(filters)
+        position_id = filters.pop("position_id", None)
+        section_id = filters.pop("section_id", None)
+        query = super()._filtered(query, filters)
+        if position_id is not None:
+            query = query.filter(Staff.staff_positions.any(StaffPosition.position_id == position_id))
+        if section_id is not None:
+            query = query.filter(
+                Staff.staff_positions.any(StaffPosition.position.has(Position.section_id == section_id))
+            )
+        return query
+
+    async def get_detail(self, db: AsyncSession, *, id: int) -> Optional[Staff]:
+        """
+        Получить сотрудника для карточки: организация, пользователь и должности
+        с отделом, подразделением и организацией загружаются одним запросом
+        """
+        query = (
+            select(self.model)
+            .where(self.model.id == id)
+            .options(*self._card_options(), joinedload(Staff.user))
+            # Назначения могли измениться в этой же сессии запросами в обход коллекции
+            .execution_options(populate_existing=True)
+        )
+        result = await db.execute(query)
+        return result.unique().scalars().first()
+
+    async def get_list(
+        self, db: AsyncSession, *, skip: int = 0, limit: int = 100, **filters: Any
+    ) -> List[Staff]:
+        """
+        Получить страницу сотрудников с должностями и организацией одним запросом.
+        filters - organization_id, position_id, section_id, is_active (None - не применяется)
+        """
+        query = self._filtered(select(self.model).options(*self._list_options()), filters)
+        result = await db.execute(query.order_by(self.model.id).offset(skip).limit(limit))
+        return result.unique().scalars().all()
+
     async def search(
-        self, db: AsyncSession, *, search_term: str, skip: int = 0, limit: int = 100
+        self, db: AsyncSession, *, search_term: str, skip: int = 0, limit: int = 20
     ) -> List[Staff]:
         """
-        Поиск сотрудников по имени или фамилии
+        Поиск сотрудников по ФИО, email и телефону, лучшие совпадения первыми
+
+        В PostgreSQL совпадение - полнотекстовое (русская морфология) либо по триграммам
+        (опечатки, части слов); ранг - максимум из word_similarity и ts_rank.
+        Оба условия обслуживаются GIN-индексами. В остальных СУБД - ILIKE по каждому введенному слову.
+        Сотрудники загружаются с должностями и организацией, как в get_list
         """
-        search_pattern = f"%{search_term}%"
-        query = select(self.model).filter(
-            or_(
-                self.model.first_name.ilike(search_pattern),
-                self.model.last_name.ilike(search_pattern)
+        term = normalize_search_term(search_term)
+        if not term:
+            return []
+
+        if db.get_bind().dialect.name == "postgresql":
+            document = literal_column(f"({STAFF_SEARCH_DOCUMENT})")
+            vector = literal_column(f"({STAFF_SEARCH_VECTOR})")
+            tsquery = func.plainto_tsquery(literal_column("'russian'::regconfig"), term)
+            rank = func.greatest(func.word_similarity(term, document), func.ts_rank(vector, tsquery))
+            matched = (
+                select(self.model.id, rank.label("rank"))
+                .where(or_(vector.bool_op("@@")(tsquery), literal(term).bool_op("<%")(document)))
+                .order_by(rank.desc(), self.model.id)
+            )
+        else:
+            columns = (
+                self.model.last_name, self.model.first_name, self.model.middle_name,
+                self.model.email, self.model.phone,
             )
-        ).offset(skip).limit(limit)
+            rank = literal(0)
+            matched = (
+                select(self.model.id, rank.label("rank"))
+                # Слова как введены: lower() в SQLite не работает с кириллицей
+                .where(and_(*(
+                    or_(*(column.ilike(f"%{word}%") for column in columns)) for word in search_term.split()
+                )))
+                .order_by(self.model.last_name, self.model.first_name, self.model.id)
+            )
+        matched = matched.offset(skip).limit(limit).subquery()
+
+        # Страница совпадений выбирается подзапросом, связанные объекты - JOIN в том же запросе
+        query = (
+            select(self.model)
+            .join(matched, matched.c.id == self.model.id)
+            .options(*self._list_options())
+            .order_by(matched.c.rank.desc(), self.model.last_name, self.model.first_name, self.model.id)
+        )
         result = await db.execute(query)
-        return result.scalars().all()
+        return result.unique().scalars().all()
+
+    async def stream_with_positions(
+        self, db: AsyncSession, *, yield_per: int = 1000, **filters: Any
+    ) -> AsyncResult:
+        """
+        Построчно читать сотрудников с назначениями через серверный курсор.
+
+        Одна строка на назначение (у сотрудника без должностей - одна строка с NULL):
+        колонки сотрудника (с organization_id), organization_name, is_primary, position_id,
+        position_name и position_organization_name (организация должности через отдел
+        или подразделение).
+        Строки упорядочены по сотруднику, основная должность первой.
+        filters - как в get_list
+        """
+        position_division = aliased(Division)
+        position_organization = aliased(Organization)
+        query = (
+            select(
+                Staff.id, Staff.last_name, Staff.first_name, Staff.middle_name, Staff.email,
+                Staff.phone, Staff.hire_date, Staff.is_active, Staff.organization_id,
+                Organization.name.label("organization_name"),
+                StaffPosition.is_primary,
+                StaffPosition.position_id,
+                Position.name.label("position_name"),
+                position_organization.name.label("position_organization_name"),
+            )
+            .outerjoin(Organization, Organization.id == Staff.organization_id)
+            .outerjoin(StaffPosition, StaffPosition.staff_id == Staff.id)
+            .outerjoin(Position, Position.id == StaffPosition.position_id)
+            .outerjoin(Section, Section.id == Position.section_id)
+            .outerjoin(
+                position_division,
+                position_division.id == func.coalesce(Section.division_id, Position.division_id),
+            )
+            .outerjoin(position_organization, position_organization.id == position_division.organization_id)
+            .order_by(Staff.id, StaffPosition.is_primary.desc(), StaffPosition.id)
+        )
+        query = self._filtered(query, filters)
+        return await db.stream(query.execution_options(yield_per=yield_per))
 
 staff = CRUDStaff(Staff) 
\ No newline at end of file
@@ -1,5 +1,6 @@
 from typing import List, Optional
-from sqlalchemy import select
+from sqlalchemy import func, select
+from sqlalchemy.sql import Select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.crud.base import CRUDBase
@@ -34,6 +35,72 @@ class CRUDValueProduct(CRUDBase[ValueProduct, ValueProductCreate, ValueProductUp
         result = await db.execute(query)
         return result.scalars().all()
         
+    def _filtered_query(
+        self,
+        query: Select,
+        *,
+        organization_id: Optional[int] = None,
+        parent_id: Optional[int] = None,
+        status: Optional[str] = None,
+    ) -> Select:
+        """Добавить к запросу фильтры ЦКП (None - фильтр не применяется)"""
+        if organization_id is not None:
+            query = query.filter(self.model.organization_id == organization_id)
+        if parent_id is not None:
+            query = query.filter(self.model.parent_id == parent_id)
+        if status is not None:
+            query = query.filter(self.model.status == status)
+        return query
+        
+    async def get_multi_filtered(
+        self,
+        db: AsyncSession,
+        *,
+        organization_id: Optional[int] = None,
+        parent_id: Optional[int] = None,
+        status: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> List[ValueProduct]:
+        """
+        Получить страницу ЦКП с фильтрами по организации, родителю и статусу
+        (фильтрация в SQL по индексу (organization_id, parent_id))
+        """
+        query = self._filtered_query(
+            select(self.model), organization_id=organization_id, parent_id=parent_id, status=status
+        ).order_by(self.model.id).offset(skip).limit(limit)
+        result = await db.execute(query)
+        return result.scalars().all()
+        
+    async def count_filtered(
+        self,
+        db: AsyncSession,
+        *,
+        organization_id: Optional[int] = None,
+        parent_id: Optional[int] = None,
+        status: Optional[str] = None,
+    ) -> int:
+        """
+        Количество ЦКП, подходящих под фильтры get_multi_filtered
+        """
+        query = self._filtered_query(
+            select(func.count(self.model.id)), organization_id=organization_id, parent_id=parent_id, status=status
+        )
+        result = await db.execute(query)
+        return result.scalar_one()
+        
+    async def get_all_by_organization(
+        self, db: AsyncSession, *, organization_id: int
+    ) -> List[ValueProduct]:
+        """
+        Получить все ЦКП организации одним запросом (для построения дерева)
+        """
+        query = select(self.model).filter(
+            self.model.organization_id == organization_id
+        ).order_by(self.model.id)
+        result = await db.execute(query)
+        return result.scalars().all()
+        
     async def get_root_value_products(
         self, db: AsyncSession, *, organization_id: int
     ) -> List[ValueProduct]:
@@ -1,6 +1,7 @@
 from app.models.user import User
 from app.models.organization import Organization
 from app.models.division import Division
+from app.models.division_closure import DivisionClosure
 from app.models.section import Section
 from app.models.position import Position
 from app.models.staff import Staff
@@ -9,12 +10,14 @@ from app.models.staff_organization import StaffOrganization
 from app.models.function import Function
 from app.models.functional_assignment import FunctionalAssignment
 from app.models.functional_relation import FunctionalRelation
+from app.models.orgchart_role_rule import OrgChartRoleRule
 
 # Для удобного импорта
 __all__ = [
     "User",
     "Organization",
     "Division",
+    "DivisionClosure",
     "Section",
     "Position",
     "Staff",
@@ -23,4 +26,5 @@ __all__ = [
     "Function",
     "FunctionalAssignment",
     "FunctionalRelation",
+    "OrgChartRoleRule",
 ] 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, func, Enum
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, func, Enum, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 import datetime
@@ -35,6 +35,10 @@ class Division(Base):
     # Отношение с должностями (positions)
     positions = relationship("Position", back_populates="division")
     
+    # Направления директоров, к которым относится подразделение (через запятую),
+    # вычисляются по правилам orgchart_role_rule при записи
+    director_categories = Column(String(255), nullable=True)
+    
     # Статус активности
     is_active = Column(Boolean, default=True)
     
@@ -42,5 +46,10 @@ class Division(Base):
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     
+    __table_args__ = (
+        # Уникальный код в пределах организации (естественный ключ для upsert)
+        UniqueConstraint('code', 'organization_id', name='uix_division_code_organization'),
+    )
+    
     def __repr__(self):
         return f"<Division id={self.id} name={self.name} code={self.code}>" 
\ No newline at end of file
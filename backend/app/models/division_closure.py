@@ -0,0 +1,24 @@
+from sqlalchemy import Column, ForeignKey, Index, Integer
+
+from app.db.base import Base
+
+class DivisionClosure(Base):
+    """
+    Замыкание иерархии подразделений.
+    
+    Для каждого подразделения хранится строка на каждого его предка (и на само
+    подразделение с depth=0), поэтому потомки, предки и поддерево любой глубины
+    выбираются одним запросом по индексу. Поддерживается в CRUDDivision при
+    создании, переносе и удалении подразделения.
+    """
+    
+    __tablename__ = "division_closure"
+    
+    ancestor_id = Column(Integer, ForeignKey("division.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("division.id", ondelete="CASCADE"), primary_key=True)
+    depth = Column(Integer, nullable=False)  # Расстояние от предка до потомка
+    
+    __table_args__ = (
+        # Поиск предков: первичный ключ покрывает только поиск потомков
+        Index("ix_division_closure_descendant_id", "descendant_id", "ancestor_id"),
+    )
@@ -0,0 +1,26 @@
+from sqlalchemy import Boolean, Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+
+from app.db.base import Base, BaseModel
+
+class OrgChartRoleRule(Base, BaseModel):
+    """
+    Правило классификации ролей для оргструктуры.
+    
+    Правило срабатывает, если в поле сущности (name или attribute) встречаются
+    все ключевые слова. Для должностей роли TOP_MANAGER и CEO задают флаги
+    руководителя, остальные роли - направление директора (FINANCE, HR и т.д.).
+    Для подразделений роль - направление, к которому относится департамент.
+    """
+    
+    __tablename__ = "orgchart_role_rule"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    target = Column(String(20), nullable=False)  # 'POSITION' или 'DIVISION'
+    field = Column(String(20), nullable=False)  # 'name' или 'attribute'
+    keywords = Column(String(255), nullable=False)  # Ключевые слова через запятую, должны встретиться все
+    role = Column(String(50), nullable=False)  # 'TOP_MANAGER', 'CEO' или код направления
+    priority = Column(Integer, default=100, nullable=False)  # Меньше - проверяется раньше
+    is_active = Column(Boolean, default=True, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -15,6 +15,10 @@ class Position(Base, BaseModel):
     attribute = Column(String(50), nullable=True)  # Уровень должности (Директор, Руководитель и т.д.)
     description = Column(Text, nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
+    # Роль в оргструктуре, вычисляется по правилам orgchart_role_rule при записи
+    is_top_manager = Column(Boolean, default=False, nullable=False)
+    is_ceo = Column(Boolean, default=False, nullable=False)
+    director_category = Column(String(50), nullable=True)  # Направление директора (FINANCE, HR и т.д.)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     
@@ -39,4 +43,6 @@ class Position(Base, BaseModel):
     __table_args__ = (
         # Уникальный код в пределах подразделения
         UniqueConstraint('code', 'division_id', name='uix_position_code_division'),
+        # Фильтр списка сотрудников по отделу
+        Index('ix_position_section_id', 'section_id'),
     ) 
\ No newline at end of file
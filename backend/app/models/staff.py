@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, Date, ForeignKey, JSON
+from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, Date, ForeignKey, JSON, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from typing import Optional
@@ -31,6 +31,12 @@ class Staff(Base, BaseModel):
     # Эти отношения определены через строки, чтобы избежать циклических импортов
     staff_positions = relationship("StaffPosition", back_populates="staff", foreign_keys="[StaffPosition.staff_id]", uselist=True)
     
+    __table_args__ = (
+        # Фильтры списка сотрудников: по организации и активности
+        Index('ix_staff_organization_id_is_active', 'organization_id', 'is_active'),
+        Index('ix_staff_is_active_id', 'is_active', 'id'),
+    )
+    
     def full_name(self) -> str:
         """Возвращает полное имя сотрудника"""
         if self.middle_name:
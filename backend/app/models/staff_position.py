@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, Date, ForeignKey, UniqueConstraint
+from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, Date, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -25,4 +25,6 @@ class StaffPosition(Base, BaseModel):
     __table_args__ = (
         # Уникальное сочетание сотрудника и должности
         UniqueConstraint('staff_id', 'position_id', name='uix_staff_position'),
+        # Фильтр списка сотрудников по должности
+        Index('ix_staff_position_position_id_staff_id', 'position_id', 'staff_id'),
     ) 
\ No newline at end of file
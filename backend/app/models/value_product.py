@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, Text, Float, DateTime, ForeignKey, JSON, UniqueConstraint
+from sqlalchemy import Boolean, Column, Integer, String, Text, Float, DateTime, ForeignKey, JSON, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -43,4 +43,8 @@ class ValueProduct(Base, BaseModel):
     __table_args__ = (
         # Уникальный код в пределах организации
         UniqueConstraint('code', 'organization_id', name='uix_value_product_code_organization'),
+        # Фильтры списка и дерева ЦКП: по организации и родителю
+        Index('ix_value_product_organization_id_parent_id', 'organization_id', 'parent_id'),
+        # Дочерние ЦКП без фильтра по организации
+        Index('ix_value_product_parent_id', 'parent_id'),
     ) 
\ No newline at end of file
@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, Any, List
+
+class BatchRequest(BaseModel):
+    """Схема пакетной операции: создание, обновление и удаление в одной транзакции"""
+    create: List[Dict[str, Any]] = []
+    # Каждый элемент - поля обновления и обязательный id
+    update: List[Dict[str, Any]] = []
+    delete: List[int] = []
+    # Все или ничего: при любой ошибке изменения пакета откатываются
+    atomic: bool = False
+
+class BatchItemError(BaseModel):
+    """Ошибка отдельного элемента пакета"""
+    op: str
+    index: int
+    id: Optional[int] = None
+    detail: Any
+
+class BatchResult(BaseModel):
+    """Результат пакетной операции"""
+    created_ids: List[int] = []
+    updated_ids: List[int] = []
+    deleted_ids: List[int] = []
+    errors: List[BatchItemError] = []
+    # False - изменения откатились (atomic и есть ошибки)
+    committed: bool = True
@@ -48,6 +48,7 @@ class DivisionUpdate(BaseModel):
 class Division(DivisionBase):
     """Схема для возврата подразделения"""
     id: int
+    director_categories: Optional[str] = Field(None, description="Направления директоров (вычисляются при записи)")
     created_at: datetime
     updated_at: datetime
     
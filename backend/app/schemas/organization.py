@@ -39,6 +39,8 @@ class Organization(OrganizationInDBBase):
     
 class OrganizationWithChildren(Organization):
     """Схема с вложенными дочерними организациями"""
+    depth: int = Field(0, description="Глубина от корня дерева")
+    path: Optional[str] = Field(None, description="Путь из ID от корня дерева через '/', например '1/4/9'")
     children: List["OrganizationWithChildren"] = []
     
 OrganizationWithChildren.model_rebuild()  # Для корректной рекурсивной типизации 
@@ -0,0 +1,24 @@
+from typing import Literal
+from pydantic import BaseModel, ConfigDict, Field
+from datetime import datetime
+
+# Базовая схема правила классификации ролей оргструктуры
+class OrgChartRoleRuleBase(BaseModel):
+    target: Literal["POSITION", "DIVISION"]
+    field: Literal["name", "attribute"]
+    keywords: str = Field(..., min_length=1, max_length=255, description="Ключевые слова через запятую, должны встретиться все")
+    role: str = Field(..., min_length=1, max_length=50, description="TOP_MANAGER, CEO или код направления")
+    priority: int = 100
+    is_active: bool = True
+
+# Схема для создания (набор правил заменяется целиком)
+class OrgChartRoleRuleCreate(OrgChartRoleRuleBase):
+    pass
+
+# Схема для возврата через API
+class OrgChartRoleRule(OrgChartRoleRuleBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
@@ -27,15 +27,31 @@ class PositionUpdate(BaseModel):
     is_active: Optional[bool] = None
     function_ids: Optional[List[int]] = None
     
+class PositionFunctionsUpdate(BaseModel):
+    """Схема замены набора функций должности"""
+    function_ids: List[int]
+    
 class PositionInDBBase(PositionBase):
     """Базовая схема для должности в БД"""
     id: int
+    # Роль в оргструктуре (вычисляется при записи)
+    is_top_manager: bool = False
+    is_ceo: bool = False
+    director_category: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     
     class Config:
         from_attributes = True
         
+class PositionFunction(BaseModel):
+    """Краткие данные функции должности (?include=functions)"""
+    id: int
+    name: str
+    code: str
+        
 class Position(PositionInDBBase):
     """Схема для возврата должности через API"""
-    function_ids: List[int] = [] 
\ No newline at end of file
+    function_ids: List[int] = []
+    # Заполняется только по запросу ?include=functions
+    functions: Optional[List[PositionFunction]] = None 
\ No newline at end of file
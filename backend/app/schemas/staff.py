@@ -73,6 +73,12 @@ class Staff(StaffInDBBase):
     user: Optional[User] = None  # Связанный пользователь
     organization_name: Optional[str] = None  # Название организации
 
+class StaffListItem(StaffInDBBase):
+    """Схема сотрудника в списке: основная должность, ID всех должностей и организация"""
+    primary_position_name: Optional[str] = None
+    position_ids: List[int] = []
+    organization_name: Optional[str] = None
+
 # Новая схема для ответа при создании сотрудника с пользователем
 class StaffCreateResponse(Staff):
     activation_code: Optional[str] = None 
\ No newline at end of file
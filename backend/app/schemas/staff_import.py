@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import List
+
+class StaffImportRowError(BaseModel):
+    """Ошибка строки файла импорта (row - номер строки в файле, заголовок - строка 1)"""
+    row: int
+    detail: str
+
+class StaffImportResult(BaseModel):
+    """Результат импорта сотрудников"""
+    total_rows: int = 0
+    imported: int = 0
+    # ID созданных сотрудников в порядке строк файла
+    created_ids: List[int] = []
+    errors: List[StaffImportRowError] = []
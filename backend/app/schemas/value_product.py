@@ -47,4 +47,12 @@ class ValueProductWithChildren(ValueProduct):
     """Схема с вложенными дочерними ЦКП"""
     children: List["ValueProductWithChildren"] = []
     
-ValueProductWithChildren.model_rebuild()  # Для корректной рекурсивной типизации 
\ No newline at end of file
+ValueProductWithChildren.model_rebuild()  # Для корректной рекурсивной типизации
+
+class ValueProductTree(ValueProduct):
+    """Узел дерева ЦКП с агрегированным выполнением"""
+    own_completion: Optional[float] = Field(None, description="Выполнение по собственным метрикам (0..1)")
+    completion: Optional[float] = Field(None, description="Выполнение поддерева, взвешенное весами детей (0..1)")
+    children: List["ValueProductTree"] = []
+    
+ValueProductTree.model_rebuild()  # Для корректной рекурсивной типизации 
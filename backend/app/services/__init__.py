@@ -0,0 +1,3 @@
+"""
+Сервисы бизнес-логики, не привязанные к конкретным эндпоинтам
+"""
@@ -0,0 +1,144 @@
+"""
+Пакетные операции над сущностями (POST /{entity}/batch).
+
+Создание, обновление и удаление выполняются в одной транзакции, каждая группа -
+одним запросом CRUD (create_many/update_many/delete_many) внутри точки сохранения.
+Если групповой запрос падает (нарушение ограничения, ошибка данных), группа
+повторяется поэлементно, каждый элемент в своей точке сохранения: так ошибочные
+элементы попадают в отчет, а остальные записываются.
+
+В режиме atomic любая ошибка откатывает весь пакет.
+"""
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Tuple, Type
+import logging
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+from app.schemas.batch import BatchItemError, BatchRequest, BatchResult
+
+logger = logging.getLogger(__name__)
+
+OP_CREATE = "create"
+OP_UPDATE = "update"
+OP_DELETE = "delete"
+
+NOT_FOUND_DETAIL = "Объект не найден"
+
+
+def _error_detail(error: Exception) -> Any:
+    """Текст ошибки для отчета: ошибки валидации - списком, ошибки БД - сообщением драйвера"""
+    if isinstance(error, ValidationError):
+        return error.errors(include_url=False, include_context=False)
+    if isinstance(error, DBAPIError) and error.orig is not None:
+        return str(error.orig)
+    return str(error)
+
+
+async def _apply(
+    db: AsyncSession,
+    op: str,
+    items: Sequence[Tuple[int, Optional[int], Any]],
+    write: Callable[[List[Any]], Awaitable[List[int]]],
+    result: BatchResult,
+) -> List[int]:
+    """
+    Выполнить группу одним запросом; при ошибке - поэлементно.
+    items - (индекс в запросе, id объекта, значения для write)
+    """
+    if not items:
+        return []
+    try:
+        async with db.begin_nested():
+            return await write([values for _, _, values in items])
+    except (SQLAlchemyError, ValueError) as e:
+        logger.info(f"Пакетная операция {op} ({len(items)} шт.) не прошла целиком, выполняем поэлементно: {str(e)}")
+
+    ids: List[int] = []
+    for index, id, values in items:
+        try:
+            async with db.begin_nested():
+                ids.extend(await write([values]))
+        except (SQLAlchemyError, ValueError) as e:
+            result.errors.append(BatchItemError(op=op, index=index, id=id, detail=_error_detail(e)))
+    return ids
+
+
+async def run_batch(
+    crud: CRUDBase,
+    db: AsyncSession,
+    batch_in: BatchRequest,
+    *,
+    create_schema: Type[BaseModel],
+    update_schema: Type[BaseModel],
+) -> BatchResult:
+    """Выполнить пакет и зафиксировать его (или откатить в режиме atomic при ошибках)"""
+    result = BatchResult()
+
+    creates = []
+    for index, item in enumerate(batch_in.create):
+        try:
+            creates.append((index, None, create_schema.model_validate(item)))
+        except ValidationError as e:
+            result.errors.append(BatchItemError(op=OP_CREATE, index=index, detail=_error_detail(e)))
+
+    updates = []
+    for index, item in enumerate(batch_in.update):
+        item = dict(item)
+        id = item.pop("id", None)
+        if not isinstance(id, int):
+            result.errors.append(BatchItemError(op=OP_UPDATE, index=index, detail="Не указан id"))
+            continue
+        try:
+            values = update_schema.model_validate(item).model_dump(exclude_unset=True)
+        except ValidationError as e:
+            result.errors.append(BatchItemError(op=OP_UPDATE, index=index, id=id, detail=_error_detail(e)))
+            continue
+        updates.append((index, id, {"id": id, **values}))
+
+    deletes = [(index, id, id) for index, id in enumerate(batch_in.delete)]
+
+    if not (batch_in.atomic and result.errors):
+        result.created_ids = await _apply(
+            db, OP_CREATE, creates, lambda objs_in: crud.create_many(db, objs_in=objs_in), result
+        )
+        result.updated_ids = await _apply(
+            db, OP_UPDATE, updates, lambda objs_in: crud.update_many(db, objs_in=objs_in), result
+        )
+        result.deleted_ids = await _apply(
+            db, OP_DELETE, deletes, lambda ids: crud.delete_many(db, ids=ids), result
+        )
+
+        # Отсутствующие объекты - тоже ошибки элементов
+        for op, items, done in ((OP_UPDATE, updates, result.updated_ids), (OP_DELETE, deletes, result.deleted_ids)):
+            done_ids = set(done)
+            failed = {error.index for error in result.errors if error.op == op}
+            for index, id, _ in items:
+                if id not in done_ids and index not in failed:
+                    result.errors.append(BatchItemError(op=op, index=index, id=id, detail=NOT_FOUND_DETAIL))
+
+    if batch_in.atomic and result.errors:
+        await db.rollback()
+        result.created_ids, result.updated_ids, result.deleted_ids = [], [], []
+        result.committed = False
+    else:
+        await db.commit()
+
+    result.errors.sort(key=lambda error: ([OP_CREATE, OP_UPDATE, OP_DELETE].index(error.op), error.index))
+    logger.info(
+        f"Пакет {crud.model.__name__}: создано={len(result.created_ids)}, обновлено={len(result.updated_ids)}, "
+        f"удалено={len(result.deleted_ids)}, ошибок={len(result.errors)}, зафиксирован={result.committed}"
+    )
+    return result
+
+
+async def load_in_order(db: AsyncSession, model: Any, ids: Sequence[int]) -> List[Any]:
+    """Объекты по ID одним запросом, в порядке ids (для ответов пакетных эндпоинтов)"""
+    result = await db.execute(
+        select(model).where(model.id.in_(list(ids))).execution_options(populate_existing=True)
+    )
+    objs = {obj.id: obj for obj in result.scalars().all()}
+    return [objs[id] for id in ids if id in objs]
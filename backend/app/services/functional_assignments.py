@@ -0,0 +1,80 @@
+"""
+Синхронизация функциональных назначений должностей.
+
+Используется эндпоинтами должностей и пакетными операциями CRUD: существование
+всех запрошенных функций проверяется одним IN-запросом (отсутствующие ID
+сообщаются все сразу), затем назначения приводятся к заданным спискам
+одним DELETE и одним INSERT по разнице с текущим состоянием.
+"""
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+import logging
+
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.function import Function
+from app.models.functional_assignment import FunctionalAssignment
+
+logger = logging.getLogger(__name__)
+
+
+class MissingFunctionsError(ValueError):
+    """Запрошены несуществующие функции"""
+
+    def __init__(self, function_ids: Sequence[int]):
+        self.function_ids = list(function_ids)
+        super().__init__(f"Функции с ID {', '.join(map(str, self.function_ids))} не найдены")
+
+
+async def find_missing_functions(db: AsyncSession, function_ids: Iterable[int]) -> List[int]:
+    """ID функций, которых нет в БД (один запрос на весь набор)"""
+    requested = sorted(set(function_ids))
+    if not requested:
+        return []
+    result = await db.execute(select(Function.id).where(Function.id.in_(requested)))
+    existing = set(result.scalars().all())
+    return [function_id for function_id in requested if function_id not in existing]
+
+
+async def sync_position_functions(db: AsyncSession, function_ids: Dict[int, Sequence[int]]) -> None:
+    """
+    Привести назначения должностей к спискам функций {position_id: [function_id, ...]}
+    Без коммита; MissingFunctionsError - часть функций не существует (ничего не меняется)
+    """
+    if not function_ids:
+        return
+    missing = await find_missing_functions(
+        db, (function_id for ids in function_ids.values() for function_id in ids)
+    )
+    if missing:
+        raise MissingFunctionsError(missing)
+
+    result = await db.execute(
+        select(FunctionalAssignment.position_id, FunctionalAssignment.function_id)
+        .where(FunctionalAssignment.position_id.in_(list(function_ids)))
+    )
+    current: Set[Tuple[int, int]] = set(result.all())
+    wanted = {
+        (position_id, function_id)
+        for position_id, ids in function_ids.items()
+        for function_id in ids
+    }
+    to_remove = current - wanted
+    to_add = wanted - current
+    if to_remove:
+        await db.execute(
+            delete(FunctionalAssignment).where(
+                tuple_(FunctionalAssignment.position_id, FunctionalAssignment.function_id).in_(sorted(to_remove))
+            )
+        )
+    if to_add:
+        await db.execute(
+            insert(FunctionalAssignment),
+            [
+                {"position_id": position_id, "function_id": function_id, "is_primary": False}
+                for position_id, function_id in sorted(to_add)
+            ],
+        )
+    logger.info(
+        f"Назначения функций {len(function_ids)} должностей: добавлено={len(to_add)}, удалено={len(to_remove)}"
+    )
@@ -0,0 +1,627 @@
+"""
+Движок построения оргструктуры.
+
+Все данные (организации, подразделения, отделы, должности и назначения
+сотрудников) загружаются фиксированным числом запросов, после чего дерево
+собирается в памяти по словарям, проиндексированным по ID. Количество
+запросов к БД не зависит от размера структуры.
+"""
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import logging
+
+from sqlalchemy import distinct, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.models.division import DivisionType
+from app.services import position_roles
+
+logger = logging.getLogger(__name__)
+
+
+class OrgChartSnapshot:
+    """Снимок оргструктуры с индексами для построения дерева в памяти"""
+
+    def __init__(
+        self,
+        organizations: List[models.Organization],
+        divisions: List[models.Division],
+        sections: List[models.Section],
+        positions: List[models.Position],
+        staff_assignments: List[Tuple[models.StaffPosition, models.Staff]],
+    ):
+        self.organizations: Dict[int, models.Organization] = {org.id: org for org in organizations}
+        self.divisions: Dict[int, models.Division] = {div.id: div for div in divisions}
+        self.sections: Dict[int, models.Section] = {sec.id: sec for sec in sections}
+        self.positions: Dict[int, models.Position] = {pos.id: pos for pos in positions}
+
+        # Корневые организации (без родителя)
+        self.root_organizations: List[models.Organization] = [
+            org for org in organizations if org.parent_id is None
+        ]
+
+        # Корневые подразделения организации и дочерние подразделения
+        self.root_divisions_by_org: Dict[int, List[models.Division]] = defaultdict(list)
+        self.division_children: Dict[int, List[models.Division]] = defaultdict(list)
+        for div in divisions:
+            if div.parent_id is None:
+                self.root_divisions_by_org[div.organization_id].append(div)
+            else:
+                self.division_children[div.parent_id].append(div)
+
+        # Отделы подразделения
+        self.sections_by_division: Dict[int, List[models.Section]] = defaultdict(list)
+        for sec in sections:
+            self.sections_by_division[sec.division_id].append(sec)
+
+        # Должности подразделения и отдела
+        self.positions_by_division: Dict[int, List[models.Position]] = defaultdict(list)
+        self.positions_by_section: Dict[int, List[models.Position]] = defaultdict(list)
+        for pos in positions:
+            if pos.division_id is not None:
+                self.positions_by_division[pos.division_id].append(pos)
+            if pos.section_id is not None:
+                self.positions_by_section[pos.section_id].append(pos)
+
+        # Первый назначенный на должность сотрудник
+        self.staff_by_position: Dict[int, models.Staff] = {}
+        for staff_position, staff in staff_assignments:
+            self.staff_by_position.setdefault(staff_position.position_id, staff)
+
+        # Сводные показатели узлов, вычисляются при первом обращении
+        self._metrics: Optional[Dict[Tuple[str, int], Dict[str, int]]] = None
+
+    def metrics(self, kind: str, entity_id: int) -> Dict[str, int]:
+        """Сводные показатели поддерева организации, подразделения или отдела"""
+        if self._metrics is None:
+            self._metrics = compute_metrics(self)
+        return self._metrics.get((kind, entity_id)) or _empty_metrics()
+
+
+async def load_snapshot(db: AsyncSession, org_type: Optional[str] = None) -> OrgChartSnapshot:
+    """
+    Загрузить оргструктуру пятью запросами: организации, подразделения,
+    отделы, должности и назначения сотрудников вместе с самими сотрудниками.
+    Если указан org_type, загружается только структура организаций этого типа
+    """
+    org_query = select(models.Organization).order_by(models.Organization.id)
+    div_query = select(models.Division).order_by(models.Division.id)
+    sec_query = select(models.Section).order_by(models.Section.id)
+    pos_query = select(models.Position).order_by(models.Position.id)
+    staff_query = (
+        select(models.StaffPosition, models.Staff)
+        .join(models.Staff, models.StaffPosition.staff_id == models.Staff.id)
+        .order_by(models.StaffPosition.id)
+    )
+
+    if org_type is not None:
+        # Фильтры - подзапросы, поэтому число запросов остается прежним
+        org_ids = select(models.Organization.id).where(models.Organization.org_type == org_type)
+        div_ids = select(models.Division.id).where(models.Division.organization_id.in_(org_ids))
+        sec_ids = select(models.Section.id).where(models.Section.division_id.in_(div_ids))
+        pos_ids = select(models.Position.id).where(
+            or_(models.Position.division_id.in_(div_ids), models.Position.section_id.in_(sec_ids))
+        )
+        org_query = org_query.where(models.Organization.org_type == org_type)
+        div_query = div_query.where(models.Division.id.in_(div_ids))
+        sec_query = sec_query.where(models.Section.id.in_(sec_ids))
+        pos_query = pos_query.where(models.Position.id.in_(pos_ids))
+        staff_query = staff_query.where(models.StaffPosition.position_id.in_(pos_ids))
+
+    organizations = (await db.execute(org_query)).scalars().all()
+    divisions = (await db.execute(div_query)).scalars().all()
+    sections = (await db.execute(sec_query)).scalars().all()
+    positions = (await db.execute(pos_query)).scalars().all()
+    staff_assignments = (await db.execute(staff_query)).all()
+
+    logger.info(
+        f"Загружен снимок оргструктуры: организаций={len(organizations)}, "
+        f"подразделений={len(divisions)}, отделов={len(sections)}, должностей={len(positions)}"
+    )
+    return OrgChartSnapshot(organizations, divisions, sections, positions, staff_assignments)
+
+
+def build_position_node(snapshot: OrgChartSnapshot, position: models.Position) -> Dict[str, Any]:
+    """Построение узла должности"""
+    position_node = {
+        "id": f"pos-{position.id}",
+        "name": position.name,
+        "code": position.code,
+        "type": "position",
+        "level": position.attribute,
+        "position_level": None,
+        "organization_id": None,
+        "is_vacant": True  # По умолчанию вакантна, меняется если найден сотрудник
+    }
+
+    staff = snapshot.staff_by_position.get(position.id)
+    if staff:
+        position_node["staffId"] = staff.id
+        position_node["staffName"] = staff.full_name()
+        position_node["is_vacant"] = False
+
+    return position_node
+
+
+# Префиксы ID узлов дерева и соответствующие типы сущностей
+NODE_PREFIXES = {
+    "org": "organization",
+    "div": "division",
+    "sec": "section",
+    "pos": "position",
+}
+
+
+def parse_node_id(node_id: str) -> Tuple[str, int]:
+    """
+    Разобрать ID узла вида 'div-12' на тип сущности и числовой ID.
+    Вызывает ValueError для некорректного ID
+    """
+    prefix, _, raw_id = node_id.partition("-")
+    if prefix not in NODE_PREFIXES or not raw_id.isdigit():
+        raise ValueError(f"Некорректный ID узла: {node_id}")
+    return NODE_PREFIXES[prefix], int(raw_id)
+
+
+def find_node(snapshot: OrgChartSnapshot, kind: str, entity_id: int) -> Optional[Any]:
+    """Найти сущность узла в снимке по типу и ID"""
+    index = {
+        "organization": snapshot.organizations,
+        "division": snapshot.divisions,
+        "section": snapshot.sections,
+        "position": snapshot.positions,
+    }[kind]
+    return index.get(entity_id)
+
+
+def node_children(snapshot: OrgChartSnapshot, kind: str, obj: Any) -> List[Tuple[str, Any]]:
+    """Дочерние узлы структурного дерева: организация -> подразделения -> должности и отделы"""
+    if kind == "organization":
+        return [("division", div) for div in snapshot.root_divisions_by_org.get(obj.id, [])]
+    if kind == "division":
+        return (
+            [("division", div) for div in snapshot.division_children.get(obj.id, [])]
+            + [("position", pos) for pos in snapshot.positions_by_division.get(obj.id, [])]
+            # Отделы показываем только если в них есть должности
+            + [
+                ("section", sec) for sec in snapshot.sections_by_division.get(obj.id, [])
+                if snapshot.positions_by_section.get(sec.id)
+            ]
+        )
+    if kind == "section":
+        return [("position", pos) for pos in snapshot.positions_by_section.get(obj.id, [])]
+    return []
+
+
+def _empty_metrics() -> Dict[str, int]:
+    return {"total_positions": 0, "filled_positions": 0, "vacancies": 0, "children_count": 0, "depth": 0}
+
+
+def compute_metrics(snapshot: OrgChartSnapshot) -> Dict[Tuple[str, int], Dict[str, int]]:
+    """
+    Сводные показатели всех структурных узлов за один обратный (post-order) обход:
+    total_positions, filled_positions, vacancies - должности поддерева (каждая
+    учитывается один раз, даже если показана и в подразделении, и в отделе),
+    children_count - число прямых дочерних узлов, depth - число уровней под узлом
+    """
+    # Должность относится к своему отделу и к одному подразделению
+    own_counts: Dict[Tuple[str, int], List[int]] = defaultdict(lambda: [0, 0])
+    for position in snapshot.positions.values():
+        filled = 1 if position.id in snapshot.staff_by_position else 0
+        division_id = position.division_id
+        if division_id is None and position.section_id in snapshot.sections:
+            division_id = snapshot.sections[position.section_id].division_id
+        for owner in (("division", division_id), ("section", position.section_id)):
+            if owner[1] is not None:
+                counts = own_counts[owner]
+                counts[0] += 1
+                counts[1] += filled
+
+    # Порядок обхода: родитель раньше детей; обратный порядок дает post-order
+    order: List[Tuple[str, Any]] = []
+    stack: List[Tuple[str, Any]] = [("organization", org) for org in snapshot.organizations.values()]
+    while stack:
+        kind, obj = stack.pop()
+        order.append((kind, obj))
+        stack.extend(
+            (child_kind, child) for child_kind, child in node_children(snapshot, kind, obj)
+            if child_kind != "position"
+        )
+
+    metrics: Dict[Tuple[str, int], Dict[str, int]] = {}
+    for kind, obj in reversed(order):
+        children = node_children(snapshot, kind, obj)
+        total, filled = own_counts.get((kind, obj.id), (0, 0))
+        depth = 0
+        for child_kind, child in children:
+            if child_kind == "position":
+                depth = max(depth, 1)
+                continue
+            child_metrics = metrics[(child_kind, child.id)]
+            depth = max(depth, child_metrics["depth"] + 1)
+            # Отделы уже учтены в должностях своего подразделения
+            if child_kind != "section":
+                total += child_metrics["total_positions"]
+                filled += child_metrics["filled_positions"]
+        metrics[(kind, obj.id)] = {
+            "total_positions": total,
+            "filled_positions": filled,
+            "vacancies": total - filled,
+            "children_count": len(children),
+            "depth": depth,
+        }
+    return metrics
+
+
+def _node_header(snapshot: OrgChartSnapshot, kind: str, obj: Any) -> Dict[str, Any]:
+    """Поля узла без дочерних элементов"""
+    if kind == "position":
+        return build_position_node(snapshot, obj)
+    if kind == "organization":
+        return {
+            "id": f"org-{obj.id}",
+            "name": obj.name,
+            "code": obj.code,
+            "type": "department",
+            "org_type": obj.org_type,
+            "metrics": snapshot.metrics(kind, obj.id),
+        }
+    return {
+        "id": f"{'div' if kind == 'division' else 'sec'}-{obj.id}",
+        "name": obj.name,
+        "code": obj.code,
+        "type": kind,
+        "metrics": snapshot.metrics(kind, obj.id),
+    }
+
+
+def build_node(
+    snapshot: OrgChartSnapshot, kind: str, obj: Any, depth: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Построение узла структурного дерева.
+
+    depth ограничивает число раскрытых уровней под узлом (None - без ограничения).
+    У свернутых узлов вместо children передается child_count.
+    """
+    node = _node_header(snapshot, kind, obj)
+    if kind == "position":
+        return node
+
+    children = node_children(snapshot, kind, obj)
+    if depth is not None and depth <= 0:
+        node["child_count"] = len(children)
+        return node
+
+    child_depth = None if depth is None else depth - 1
+    node["children"] = [
+        build_node(snapshot, child_kind, child, child_depth) for child_kind, child in children
+    ]
+    return node
+
+
+def build_subtree(snapshot: OrgChartSnapshot, node_id: str, depth: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Построить поддерево узла по его ID; None, если узел не найден"""
+    kind, entity_id = parse_node_id(node_id)
+    obj = find_node(snapshot, kind, entity_id)
+    if obj is None:
+        return None
+    return build_node(snapshot, kind, obj, depth)
+
+
+def iter_node_records(
+    snapshot: OrgChartSnapshot, kind: str, obj: Any, depth: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Обход структурного дерева в прямом порядке без построения вложенного словаря.
+    Каждый узел отдается плоской записью с parent_id
+    """
+    stack = [(kind, obj, depth, None)]
+    while stack:
+        kind, obj, depth, parent_id = stack.pop()
+        record = _node_header(snapshot, kind, obj)
+        record["parent_id"] = parent_id
+        if kind == "position":
+            yield record
+            continue
+
+        children = node_children(snapshot, kind, obj)
+        if depth is not None and depth <= 0:
+            record["child_count"] = len(children)
+            yield record
+            continue
+
+        yield record
+        child_depth = None if depth is None else depth - 1
+        for child_kind, child in reversed(children):
+            stack.append((child_kind, child, child_depth, record["id"]))
+
+
+def iter_tree_records(root: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Обход готового дерева в прямом порядке; узлы отдаются плоскими записями с parent_id"""
+    stack = [(root, None)]
+    while stack:
+        node, parent_id = stack.pop()
+        record = {key: value for key, value in node.items() if key != "children"}
+        record["parent_id"] = parent_id
+        yield record
+        for child in reversed(node.get("children") or []):
+            stack.append((child, node["id"]))
+
+
+def build_organization_node(snapshot: OrgChartSnapshot, org: models.Organization) -> Dict[str, Any]:
+    """Построение узла организации со всеми подразделениями"""
+    return build_node(snapshot, "organization", org)
+
+
+def build_department_node(snapshot: OrgChartSnapshot, dept: models.Division) -> Dict[str, Any]:
+    """
+    Построение узла департамента для ветки директора в бизнес-структуре.
+    Показатели metrics описывают всю структуру департамента, включая дочерние подразделения
+    """
+    dept_node = {
+        "id": f"div-{dept.id}",
+        "name": dept.name,
+        "type": "division",
+        "metrics": snapshot.metrics("division", dept.id),
+        "children": []
+    }
+
+    # Отделы департамента (только с должностями)
+    for section in snapshot.sections_by_division.get(dept.id, []):
+        section_node = {
+            "id": f"sec-{section.id}",
+            "name": section.name,
+            "type": "section",
+            "metrics": snapshot.metrics("section", section.id),
+            "children": [
+                build_position_node(snapshot, position)
+                for position in snapshot.positions_by_section.get(section.id, [])
+            ]
+        }
+        if section_node["children"]:
+            dept_node["children"].append(section_node)
+
+    # Должности департамента
+    for position in snapshot.positions_by_division.get(dept.id, []):
+        dept_node["children"].append(build_position_node(snapshot, position))
+
+    return dept_node
+
+
+def _match_departments(
+    director_position: models.Position,
+    root_departments: List[models.Division],
+    is_last_director: bool,
+) -> List[models.Division]:
+    """
+    Подобрать департаменты директору по сохраненным направлениям
+    (см. app.services.position_roles)
+    """
+    category = director_position.director_category
+    if category is None:
+        # Направление не определено: последнему директору отдаем первый департамент
+        return root_departments[:1] if is_last_director else []
+    return [
+        dept for dept in root_departments
+        if category in position_roles.split_categories(dept.director_categories)
+    ]
+
+
+def build_business_chart(snapshot: OrgChartSnapshot) -> Dict[str, Any]:
+    """
+    Построение бизнес-структуры по загруженному снимку:
+    Совет Учредителей -> Гендиректор -> Директора -> Департаменты -> Отделы -> Должности.
+    Если руководящих должностей нет, возвращается структура организаций.
+    """
+    board = {
+        "id": "board-1",
+        "name": "Совет Учредителей",
+        "type": "board",
+        "children": []
+    }
+    business_structure = [board]
+
+    # 1. Находим руководство среди активных должностей
+    ceo_position = None  # Генеральный директор
+    directors = []       # Остальные директора
+
+    for position in snapshot.positions.values():
+        if not position.is_active:
+            continue
+
+        # Роль вычислена при записи должности
+        if not position.is_top_manager:
+            continue
+
+        position_node = build_position_node(snapshot, position)
+        position_node["position_level"] = 1
+
+        if position.is_ceo and not ceo_position:
+            ceo_position = position
+            board["children"].append(position_node)
+        else:
+            directors.append((position, position_node))
+
+    # Если не нашли генерального директора, берем первого директора как условного главного
+    if not ceo_position and directors:
+        first_position, first_node = directors.pop(0)
+        board["children"].append(first_node)
+        ceo_position = first_position
+
+    if ceo_position:
+        ceo_node = board["children"][0] if board["children"] else None
+
+        if ceo_node and directors:
+            ceo_node.setdefault("children", [])
+            for _, director_node in directors:
+                ceo_node["children"].append(director_node)
+
+        # 2. Привязываем корневые активные департаменты к директорам
+        root_departments = [
+            div for div in snapshot.divisions.values()
+            if div.is_active and not div.parent_id and div.type == DivisionType.DEPARTMENT
+        ]
+
+        if ceo_node and "children" in ceo_node:
+            for i, (director_position, director_node) in enumerate(directors):
+                director_node.setdefault("children", [])
+                matching_departments = _match_departments(
+                    director_position, root_departments, is_last_director=(i == len(directors) - 1)
+                )
+                for dept in matching_departments:
+                    director_node["children"].append(build_department_node(snapshot, dept))
+
+    # 3. Если не нашли ни одного руководителя - используем структуру организаций
+    if not board["children"]:
+        logger.warning("Не найдено ни одной руководящей позиции, использую обычную структуру организаций")
+        business_structure = [
+            build_organization_node(snapshot, org) for org in snapshot.root_organizations
+        ]
+
+    return {
+        "id": "root",
+        "name": "Бизнес-структура",
+        "title": "Корпоративная бизнес-структура",
+        "type": "department",
+        "children": business_structure
+    }
+
+
+# Типы организаций для юридической и территориальной структуры
+LEGAL_ENTITY_ORG_TYPE = "LEGAL_ENTITY"
+LOCATION_ORG_TYPE = "LOCATION"
+
+
+async def _load_staff_counts(db: AsyncSession, org_type: str) -> Dict[int, int]:
+    """Количество сотрудников организаций заданного типа одним GROUP BY запросом"""
+    rows = (
+        await db.execute(
+            select(models.StaffOrganization.organization_id, func.count(distinct(models.StaffOrganization.staff_id)))
+            .join(models.Organization, models.StaffOrganization.organization_id == models.Organization.id)
+            .where(models.Organization.org_type == org_type)
+            .group_by(models.StaffOrganization.organization_id)
+        )
+    ).all()
+    return {organization_id: staff_count for organization_id, staff_count in rows}
+
+
+async def load_legal_chart(db: AsyncSession) -> Dict[str, Any]:
+    """
+    Построение структуры по юридическим лицам:
+    юрлицо -> сотрудники (по связям StaffOrganization) с их основной должностью.
+    Строится четырьмя запросами независимо от количества юрлиц и сотрудников
+    """
+    legal_entities = (
+        await db.execute(
+            select(models.Organization)
+            .where(models.Organization.org_type == LEGAL_ENTITY_ORG_TYPE)
+            .order_by(models.Organization.id)
+        )
+    ).scalars().all()
+    staff_counts = await _load_staff_counts(db, LEGAL_ENTITY_ORG_TYPE)
+
+    legal_staff = (
+        select(models.StaffOrganization.staff_id)
+        .join(models.Organization, models.StaffOrganization.organization_id == models.Organization.id)
+        .where(models.Organization.org_type == LEGAL_ENTITY_ORG_TYPE)
+    )
+    memberships = (
+        await db.execute(
+            select(models.StaffOrganization, models.Staff)
+            .join(models.Staff, models.StaffOrganization.staff_id == models.Staff.id)
+            .join(models.Organization, models.StaffOrganization.organization_id == models.Organization.id)
+            .where(models.Organization.org_type == LEGAL_ENTITY_ORG_TYPE)
+            .order_by(
+                models.StaffOrganization.organization_id,
+                models.StaffOrganization.is_primary.desc(),
+                models.Staff.last_name,
+                models.Staff.first_name,
+            )
+        )
+    ).all()
+
+    # Основная (или первая) должность каждого сотрудника
+    position_rows = (
+        await db.execute(
+            select(models.StaffPosition.staff_id, models.Position.id, models.Position.name)
+            .join(models.Position, models.StaffPosition.position_id == models.Position.id)
+            .where(models.StaffPosition.staff_id.in_(legal_staff))
+            .order_by(
+                models.StaffPosition.staff_id,
+                models.StaffPosition.is_primary.desc(),
+                models.StaffPosition.id,
+            )
+        )
+    ).all()
+    position_by_staff: Dict[int, Tuple[int, str]] = {}
+    for staff_id, position_id, position_name in position_rows:
+        position_by_staff.setdefault(staff_id, (position_id, position_name))
+
+    staff_by_organization: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for membership, staff in memberships:
+        position_id, position_name = position_by_staff.get(staff.id, (None, "Сотрудник"))
+        staff_by_organization[membership.organization_id].append({
+            "id": f"staff-{membership.organization_id}-{staff.id}",
+            "name": position_name,
+            "type": "position",
+            "position_id": position_id,
+            "staffId": staff.id,
+            "staffName": staff.full_name(),
+            "is_primary": membership.is_primary,
+            "is_vacant": False,
+        })
+
+    children = []
+    for entity in legal_entities:
+        children.append({
+            "id": f"org-{entity.id}",
+            "name": entity.name,
+            "code": entity.code,
+            "type": "department",
+            "org_type": entity.org_type,
+            "staff_count": staff_counts.get(entity.id, 0),
+            "children": staff_by_organization.get(entity.id, []),
+        })
+
+    logger.info(f"Построена юридическая структура: юрлиц={len(legal_entities)}, связей={len(memberships)}")
+    return {
+        "id": "root",
+        "name": "Юридическая структура",
+        "title": "Структура по юридическим лицам",
+        "type": "department",
+        "children": children
+    }
+
+
+async def load_location_chart(db: AsyncSession) -> Dict[str, Any]:
+    """
+    Построение территориальной структуры:
+    локация -> подразделения -> отделы -> должности.
+    Загружается снимок только по локациям и количество сотрудников одним GROUP BY
+    """
+    snapshot = await load_snapshot(db, org_type=LOCATION_ORG_TYPE)
+    staff_counts = await _load_staff_counts(db, LOCATION_ORG_TYPE)
+
+    children = []
+    for location in snapshot.organizations.values():
+        location_node = build_organization_node(snapshot, location)
+        location_node["staff_count"] = staff_counts.get(location.id, 0)
+        children.append(location_node)
+
+    return {
+        "id": "root",
+        "name": "Территориальная структура",
+        "title": "Структура по локациям",
+        "type": "department",
+        "children": children
+    }
+
+
+def find_top_level_node(chart: Dict[str, Any], node_id: str) -> Optional[Dict[str, Any]]:
+    """Найти узел первого уровня (юрлицо или локацию) в построенной структуре"""
+    for node in chart.get("children", []):
+        if node["id"] == node_id:
+            return node
+    return None
@@ -0,0 +1,273 @@
+"""
+Кэш снимков оргструктуры.
+
+Построенные деревья хранятся в виде готовых JSON-байтов и привязаны к версии
+структуры. Каждая запись в организации, подразделения, отделы, должности и
+сотрудников увеличивает версию; пересборка откладывается на время
+ORGCHART_REBUILD_DEBOUNCE_SECONDS и выполняется в фоне, поэтому серия изменений
+приводит к одной пересборке, а читатели до ее завершения получают прежний снимок.
+Синхронно строится только самый первый снимок (холодный старт).
+
+Бизнес-, юридическая и территориальная структуры кэшируются одинаково.
+Версия увеличивается автоматически после каждого коммита, изменившего
+оргструктуру (см. app.services.orgchart_changes); операции над узлами
+сохраняются в журнале для дельта-синхронизации клиентов.
+Версия и журнал живут только в памяти процесса, поэтому версия дополняется
+эпохой - случайным идентификатором, выбираемым при запуске. Эпоха входит в ETag
+и в курсор синхронизации: после перезапуска номера версий начинаются заново,
+но старые ETag и курсоры уже не совпадут с новыми.
+Помимо готовых деревьев кэшируется и сам снимок структуры (ключ "snapshot"),
+по которому без обращения к БД строятся поддеревья отдельных узлов.
+"""
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import time
+import uuid
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.base import async_session_maker
+from app.services import orgchart as orgchart_service
+from app.services import orgchart_changes
+
+logger = logging.getLogger(__name__)
+
+# Задержка (в секундах) перед фоновой пересборкой после последнего изменения
+ORGCHART_REBUILD_DEBOUNCE_SECONDS = float(os.getenv("ORGCHART_REBUILD_DEBOUNCE_SECONDS", "2.0"))
+
+# Количество версий, для которых хранится журнал изменений
+ORGCHART_CHANGE_LOG_SIZE = int(os.getenv("ORGCHART_CHANGE_LOG_SIZE", "1000"))
+
+# Количество NDJSON-записей, отправляемых одним фрагментом потока
+NDJSON_BATCH_SIZE = 500
+
+# Максимум производных данных (раскладок), хранимых при одном снимке
+DERIVED_CACHE_SIZE = 64
+
+# Функция построения дерева (или снимка) по сессии БД
+ChartBuilder = Callable[[AsyncSession], Awaitable[Any]]
+
+
+def dump_json(data: Any) -> bytes:
+    """Сериализация дерева в JSON-байты"""
+    return orjson.dumps(data, default=str)
+
+
+def iter_ndjson(records: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """Потоковая сериализация записей в NDJSON фрагментами по NDJSON_BATCH_SIZE строк"""
+    batch = []
+    for record in records:
+        batch.append(orjson.dumps(record, default=str))
+        if len(batch) >= NDJSON_BATCH_SIZE:
+            yield b"\n".join(batch) + b"\n"
+            batch = []
+    if batch:
+        yield b"\n".join(batch) + b"\n"
+
+
+class OrgChartCacheEntry:
+    """Построенные данные и их JSON для определенной версии структуры"""
+
+    def __init__(self, key: str, epoch: str, version: int, data: Any, payload: Optional[bytes]):
+        self.key = key
+        self.epoch = epoch
+        self.version = version
+        self.data = data
+        self.payload = payload
+        self._derived: Dict[Hashable, Any] = {}
+
+    @property
+    def etag(self) -> str:
+        return self.make_etag(self.key)
+
+    def make_etag(self, *parts: Any) -> str:
+        """ETag производного ответа: части ключа, эпоха и версия снимка"""
+        return '"' + "-".join(str(part) for part in (*parts, self.epoch, self.version)) + '"'
+
+    def derived(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Производные данные снимка (например, раскладка дерева).
+        Вычисляются один раз и живут, пока снимок не заменен более новой версией
+        """
+        if key not in self._derived:
+            if len(self._derived) >= DERIVED_CACHE_SIZE:
+                # Вытесняем самую старую запись
+                self._derived.pop(next(iter(self._derived)))
+            self._derived[key] = factory()
+        return self._derived[key]
+
+
+class OrgChartCache:
+    """Версионированный кэш деревьев оргструктуры с фоновой пересборкой"""
+
+    def __init__(
+        self,
+        session_maker: Callable[[], AsyncSession],
+        debounce_seconds: float,
+        change_log_size: int = ORGCHART_CHANGE_LOG_SIZE,
+    ):
+        self._session_maker = session_maker
+        self._debounce_seconds = debounce_seconds
+        self._builders: Dict[str, ChartBuilder] = {}
+        self._serialized: Dict[str, bool] = {}
+        self._entries: Dict[str, OrgChartCacheEntry] = {}
+        self._build_locks: Dict[str, asyncio.Lock] = {}
+        # Эпоха отличает версии этого процесса от версий, выданных до перезапуска
+        self._epoch = uuid.uuid4().hex[:12]
+        self._version = 0
+        self._last_bump = 0.0
+        self._rebuild_task: Optional[asyncio.Task] = None
+        # Журнал изменений: (версия, операции над узлами)
+        self._changes: Deque[Tuple[int, List[Dict[str, Any]]]] = deque(maxlen=change_log_size)
+
+    @property
+    def version(self) -> int:
+        """Текущая версия структуры"""
+        return self._version
+
+    @property
+    def epoch(self) -> str:
+        """Эпоха версий (меняется при каждом запуске процесса)"""
+        return self._epoch
+
+    def register(self, key: str, builder: ChartBuilder, serialize: bool = True) -> None:
+        """
+        Зарегистрировать построитель под ключом представления.
+        При serialize=False результат хранится только как объект, без JSON
+        """
+        self._builders[key] = builder
+        self._serialized[key] = serialize
+
+    async def get(self, key: str) -> OrgChartCacheEntry:
+        """
+        Получить снимок дерева. Если снимок устарел, он возвращается сразу,
+        а пересборка выполняется в фоне
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.version != self._version:
+                self._schedule_rebuild()
+            return entry
+
+        # Холодный старт: строим один раз, параллельные запросы ждут тот же результат
+        lock = self._build_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = await self._build(key)
+        return entry
+
+    def bump_version(self, changes: Optional[List[Dict[str, Any]]] = None) -> int:
+        """
+        Отметить изменение структуры и запланировать отложенную пересборку.
+        changes - операции над узлами для журнала; без них клиентам
+        потребуется полная перезагрузка
+        """
+        self._version += 1
+        self._last_bump = time.monotonic()
+        self._changes.append((self._version, changes or [dict(orgchart_changes.RELOAD_CHANGE)]))
+        logger.info(f"Версия оргструктуры увеличена до {self._version}")
+        if self._entries:
+            self._schedule_rebuild()
+        return self._version
+
+    def changes_since(self, version: int, epoch: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Операции над узлами после версии version в порядке применения.
+        epoch - эпоха, в которой клиент получил version (если известна).
+        None - журнал не покрывает этот диапазон или версия из другой эпохи,
+        нужна полная перезагрузка
+        """
+        if epoch is not None and epoch != self._epoch:
+            return None
+        if version > self._version:
+            return None
+        if version == self._version:
+            return []
+        if not self._changes or self._changes[0][0] > version + 1:
+            return None
+
+        result = []
+        for change_version, changes in self._changes:
+            if change_version <= version:
+                continue
+            for change in changes:
+                if change["op"] == "reload":
+                    return None
+                result.append({"version": change_version, **change})
+        return result
+
+    async def _build(self, key: str) -> OrgChartCacheEntry:
+        version = self._version
+        start_time = time.time()
+        async with self._session_maker() as db:
+            data = await self._builders[key](db)
+        payload = dump_json(data) if self._serialized[key] else None
+        entry = OrgChartCacheEntry(key, self._epoch, version, data, payload)
+
+        # Не затираем более свежий снимок, построенный параллельно
+        current = self._entries.get(key)
+        if current is None or current.version <= version:
+            self._entries[key] = entry
+
+        logger.info(
+            f"Снимок оргструктуры '{key}' версии {version} построен за {time.time() - start_time:.4f}s "
+            f"({len(payload) if payload is not None else 0} байт)"
+        )
+        return entry
+
+    def _schedule_rebuild(self) -> None:
+        if self._rebuild_task is not None and not self._rebuild_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Вне цикла событий - снимок будет пересобран при следующем чтении
+            return
+        self._rebuild_task = loop.create_task(self._rebuild_loop())
+
+    async def _rebuild_loop(self) -> None:
+        while True:
+            # Ждем, пока поток изменений затихнет
+            delay = self._last_bump + self._debounce_seconds - time.monotonic()
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = self._last_bump + self._debounce_seconds - time.monotonic()
+
+            version = self._version
+            stale_keys = [key for key, entry in self._entries.items() if entry.version != version]
+            if not stale_keys:
+                return
+
+            for key in stale_keys:
+                try:
+                    await self._build(key)
+                except Exception as e:
+                    logger.error(f"Ошибка фоновой пересборки снимка '{key}': {str(e)}", exc_info=True)
+                    return
+
+            # Если за время пересборки версия не менялась - работа закончена
+            if self._version == version:
+                return
+
+
+async def _build_business_chart(db: AsyncSession) -> Dict[str, Any]:
+    snapshot = await orgchart_service.load_snapshot(db)
+    return orgchart_service.build_business_chart(snapshot)
+
+
+orgchart_cache = OrgChartCache(
+    session_maker=async_session_maker,
+    debounce_seconds=ORGCHART_REBUILD_DEBOUNCE_SECONDS,
+)
+orgchart_cache.register("business", _build_business_chart)
+orgchart_cache.register("legal", orgchart_service.load_legal_chart)
+orgchart_cache.register("location", orgchart_service.load_location_chart)
+orgchart_cache.register("snapshot", orgchart_service.load_snapshot, serialize=False)
+
+# Каждый коммит с изменениями оргструктуры увеличивает версию и пишет журнал
+orgchart_changes.track_changes(orgchart_cache.bump_version)
@@ -0,0 +1,281 @@
+"""
+Журнал изменений оргструктуры для дельта-синхронизации.
+
+Изменения собираются событиями сессии SQLAlchemy, поэтому их записывают все
+пути записи (CRUD, эндпоинты, пакетные операции) без явных вызовов. Изменения
+одной транзакции копятся в session.info и после успешного коммита внешней
+транзакции передаются обработчику (кэш оргструктуры), который увеличивает версию
+на единицу; при откате они отбрасываются. Освобождение точки сохранения
+(begin_nested) ничего не публикует, а ее откат отбрасывает только изменения,
+накопленные после ее начала.
+
+Каждое изменение - операция над узлом дерева в схеме ID диаграммы:
+  insert - новый узел (node, parent_id)
+  update - изменены поля узла (node; None - узел нужно перезапросить целиком)
+  move   - узел перенесен (node, parent_id, old_parent_id)
+  delete - узел удален
+  reload - изменение, которое нельзя выразить операциями над узлами
+           (например, смена руководящей роли перестраивает бизнес-структуру)
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+import logging
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, SessionTransaction, ORMExecuteState
+
+from app import models
+from app.models.division import DivisionType
+
+logger = logging.getLogger(__name__)
+
+# Ключ накопленных изменений транзакции в session.info
+SESSION_CHANGES_KEY = "orgchart_changes"
+
+# Ключ позиций в списке изменений, с которых начались открытые точки сохранения
+SESSION_SAVEPOINTS_KEY = "orgchart_changes_savepoints"
+
+RELOAD_CHANGE: Dict[str, Any] = {"op": "reload", "node_id": None}
+
+# Структурные сущности и поля, определяющие родителя узла
+STRUCTURE_PARENT_FIELDS = {
+    models.Organization: ("parent_id",),
+    models.Division: ("parent_id", "organization_id"),
+    models.Section: ("division_id",),
+    models.Position: ("division_id", "section_id"),
+}
+
+# Поля, изменение которых перестраивает бизнес-структуру
+ROLE_FIELDS = {
+    models.Position: ("is_top_manager", "is_ceo", "director_category"),
+    models.Division: ("director_categories", "type"),
+}
+
+# Поля сотрудника, показываемые в узле должности
+STAFF_NODE_FIELDS = ("first_name", "last_name", "middle_name")
+
+
+def _value(obj: Any, field: str) -> Any:
+    """Загруженное значение поля без обращения к БД (объект может быть уже удален)"""
+    return inspect(obj).dict.get(field)
+
+
+def node_id_of(obj: Any) -> str:
+    """ID узла диаграммы для структурной сущности"""
+    entity_id = _value(obj, "id")
+    if isinstance(obj, models.Organization):
+        return f"org-{entity_id}"
+    if isinstance(obj, models.Division):
+        return f"div-{entity_id}"
+    if isinstance(obj, models.Section):
+        return f"sec-{entity_id}"
+    return f"pos-{entity_id}"
+
+
+def parent_node_id(model: Any, values: Dict[str, Any]) -> Optional[str]:
+    """ID родительского узла по значениям полей родителя"""
+    if model is models.Organization:
+        return f"org-{values['parent_id']}" if values["parent_id"] else None
+    if model is models.Division:
+        if values["parent_id"]:
+            return f"div-{values['parent_id']}"
+        return f"org-{values['organization_id']}"
+    if model is models.Section:
+        return f"div-{values['division_id']}"
+    if values["section_id"]:
+        return f"sec-{values['section_id']}"
+    return f"div-{values['division_id']}" if values["division_id"] else None
+
+
+def change_node(obj: Any) -> Dict[str, Any]:
+    """Поля узла без дочерних элементов, показателей и сотрудников"""
+    node = {"id": node_id_of(obj), "name": obj.name, "code": obj.code}
+    if isinstance(obj, models.Organization):
+        node.update(type="department", org_type=obj.org_type)
+    elif isinstance(obj, models.Position):
+        node.update(type="position", level=obj.attribute)
+    else:
+        node["type"] = "division" if isinstance(obj, models.Division) else "section"
+    return node
+
+
+def _structure_model(obj: Any) -> Optional[Any]:
+    for model in STRUCTURE_PARENT_FIELDS:
+        if isinstance(obj, model):
+            return model
+    return None
+
+
+def _previous_values(obj: Any, fields: Iterable[str]) -> Dict[str, Any]:
+    """Значения полей до изменения (по истории атрибутов)"""
+    state = inspect(obj)
+    values = {}
+    for field in fields:
+        history = state.attrs[field].history
+        values[field] = history.deleted[0] if history.deleted else getattr(obj, field)
+    return values
+
+
+def _changed(obj: Any, fields: Iterable[str]) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+def _changes(session: Session) -> List[Dict[str, Any]]:
+    return session.info.setdefault(SESSION_CHANGES_KEY, [])
+
+
+def _staff_position_changes(position_ids: Iterable[int]) -> List[Dict[str, Any]]:
+    """Изменение назначения: узел должности нужно перезапросить"""
+    return [
+        {"op": "update", "node_id": f"pos-{position_id}", "node": None}
+        for position_id in sorted(set(position_ids) - {None})
+    ]
+
+
+def _positions_of_staff(session: Session, staff_ids: Set[int]) -> List[int]:
+    rows = session.connection().execute(
+        select(models.StaffPosition.position_id).where(models.StaffPosition.staff_id.in_(staff_ids))
+    )
+    return [position_id for position_id, in rows]
+
+
+def _structure_change(model: Any, obj: Any, op: str) -> Dict[str, Any]:
+    fields = STRUCTURE_PARENT_FIELDS[model]
+    if op == "delete":
+        return {"op": "delete", "node_id": node_id_of(obj)}
+
+    parent_id = parent_node_id(model, {field: getattr(obj, field) for field in fields})
+    if op == "insert":
+        return {"op": "insert", "node_id": node_id_of(obj), "parent_id": parent_id, "node": change_node(obj)}
+
+    old_parent_id = parent_node_id(model, _previous_values(obj, fields))
+    if old_parent_id != parent_id:
+        return {
+            "op": "move",
+            "node_id": node_id_of(obj),
+            "parent_id": parent_id,
+            "old_parent_id": old_parent_id,
+            "node": change_node(obj),
+        }
+    return {"op": "update", "node_id": node_id_of(obj), "node": change_node(obj)}
+
+
+def _affects_business_structure(model: Any, obj: Any, op: str) -> bool:
+    """Изменение меняет состав руководства или привязку департаментов"""
+    if op == "update":
+        return model in ROLE_FIELDS and _changed(obj, ROLE_FIELDS[model])
+    if model is models.Position:
+        return bool(_value(obj, "is_top_manager"))
+    if model is models.Division:
+        return _value(obj, "parent_id") is None and _value(obj, "type") == DivisionType.DEPARTMENT
+    return False
+
+
+def _compact(changes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Убрать изменения узлов, удаленных позже в той же транзакции"""
+    deleted = {change["node_id"] for change in changes if change["op"] == "delete"}
+    if not deleted:
+        return changes
+    return [
+        change for change in changes
+        if change["op"] in ("delete", "reload") or change["node_id"] not in deleted
+    ]
+
+
+def _before_flush(session: Session, flush_context: Any, instances: Any) -> None:
+    # Назначения сотрудников читаем до удаления, пока строки еще есть в БД
+    staff_ids = {
+        obj.id for obj in session.deleted if isinstance(obj, models.Staff)
+    } | {
+        obj.id for obj in session.dirty
+        if isinstance(obj, models.Staff) and _changed(obj, STAFF_NODE_FIELDS)
+    }
+    if staff_ids:
+        _changes(session).extend(_staff_position_changes(_positions_of_staff(session, staff_ids)))
+
+
+def _after_flush(session: Session, flush_context: Any) -> None:
+    changes = _changes(session)
+    staff_positions: List[int] = []
+
+    for op, objects in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            if isinstance(obj, models.StaffPosition):
+                staff_positions.append(_value(obj, "position_id"))
+                if op == "update":
+                    staff_positions.extend(
+                        value for value in _previous_values(obj, ("position_id",)).values() if value
+                    )
+                continue
+
+            model = _structure_model(obj)
+            if model is None or (op == "update" and not session.is_modified(obj)):
+                continue
+            if _affects_business_structure(model, obj, op):
+                changes.append(dict(RELOAD_CHANGE))
+            changes.append(_structure_change(model, obj, op))
+
+    changes.extend(_staff_position_changes(staff_positions))
+
+
+def _do_orm_execute(state: ORMExecuteState) -> None:
+    """Массовые UPDATE/DELETE/INSERT, минующие единицу работы сессии"""
+    if not (state.is_update or state.is_delete or state.is_insert):
+        return
+    mapper = state.bind_mapper
+    model = mapper.class_ if mapper is not None else None
+    changes = _changes(state.session)
+
+    if model is models.StaffPosition and not state.is_insert:
+        # Затронутые должности выбираем по тому же условию до выполнения запроса
+        query = select(models.StaffPosition.position_id)
+        if state.statement.whereclause is not None:
+            query = query.where(state.statement.whereclause)
+        position_ids = [position_id for position_id, in state.session.connection().execute(query)]
+        changes.extend(_staff_position_changes(position_ids))
+    elif model in STRUCTURE_PARENT_FIELDS or model in (models.StaffPosition, models.Staff):
+        changes.append(dict(RELOAD_CHANGE))
+
+
+def _after_transaction_create(session: Session, transaction: SessionTransaction) -> None:
+    if transaction.nested:
+        session.info.setdefault(SESSION_SAVEPOINTS_KEY, {})[transaction] = len(_changes(session))
+
+
+def _after_transaction_end(session: Session, transaction: SessionTransaction) -> None:
+    if transaction.nested:
+        session.info.get(SESSION_SAVEPOINTS_KEY, {}).pop(transaction, None)
+
+
+def track_changes(on_commit: Callable[[List[Dict[str, Any]]], Any]) -> None:
+    """
+    Подключить сбор изменений ко всем сессиям. on_commit вызывается
+    после каждого коммита, в котором были изменения оргструктуры
+    """
+
+    def _after_commit(session: Session) -> None:
+        # Освобождение точки сохранения - изменения ждут коммита внешней транзакции
+        if session.in_nested_transaction():
+            return
+        session.info.pop(SESSION_SAVEPOINTS_KEY, None)
+        changes = session.info.pop(SESSION_CHANGES_KEY, None)
+        if changes:
+            on_commit(_compact(changes))
+
+    def _after_rollback(session: Session) -> None:
+        if session.in_nested_transaction():
+            # Откат точки сохранения отбрасывает только ее изменения
+            start = session.info.get(SESSION_SAVEPOINTS_KEY, {}).pop(session.get_nested_transaction(), None)
+            if start is not None:
+                del _changes(session)[start:]
+            return
+        session.info.pop(SESSION_SAVEPOINTS_KEY, None)
+        session.info.pop(SESSION_CHANGES_KEY, None)
+
+    event.listen(Session, "before_flush", _before_flush)
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "do_orm_execute", _do_orm_execute)
+    event.listen(Session, "after_transaction_create", _after_transaction_create)
+    event.listen(Session, "after_transaction_end", _after_transaction_end)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
@@ -0,0 +1,216 @@
+"""
+Серверная раскладка дерева оргструктуры.
+
+Координаты узлов вычисляются за линейное время алгоритмом Buchheim-Walker
+(тот же "tidy tree", что и d3.tree()): поддеревья не пересекаются, родитель
+располагается по центру над детьми, одинаковые поддеревья рисуются одинаково.
+Расстояние между соседними узлами - node_w (между узлами разных родителей -
+2 * node_w, как в d3 по умолчанию), между уровнями - node_h.
+"""
+from typing import Any, Dict, List, Optional
+
+# Ориентации дерева
+LAYOUT_VERTICAL = "vertical"      # Корень сверху, уровни вниз по y
+LAYOUT_HORIZONTAL = "horizontal"  # Корень слева, уровни вправо по x
+
+# Размеры узла по умолчанию (совпадают с настройками фронтенда)
+DEFAULT_NODE_WIDTH = 220
+DEFAULT_NODE_HEIGHT = 90
+
+
+class _LayoutNode:
+    """Служебный узел раскладки с полями алгоритма Buchheim-Walker"""
+
+    __slots__ = (
+        "data", "parent", "children", "index", "prelim", "mod",
+        "shift", "change", "thread", "ancestor", "x", "depth", "midpoint",
+    )
+
+    def __init__(self, data: Dict[str, Any], parent: Optional["_LayoutNode"], index: int, depth: int):
+        self.data = data
+        self.parent = parent
+        self.index = index
+        self.depth = depth
+        self.children: List["_LayoutNode"] = []
+        self.prelim = 0.0
+        self.mod = 0.0
+        self.shift = 0.0
+        self.change = 0.0
+        self.thread: Optional["_LayoutNode"] = None
+        self.ancestor = self
+        self.x = 0.0
+        self.midpoint = 0.0
+
+    def next_left(self) -> Optional["_LayoutNode"]:
+        return self.children[0] if self.children else self.thread
+
+    def next_right(self) -> Optional["_LayoutNode"]:
+        return self.children[-1] if self.children else self.thread
+
+    def left_sibling(self) -> Optional["_LayoutNode"]:
+        return self.parent.children[self.index - 1] if self.parent is not None and self.index > 0 else None
+
+
+def _separation(a: _LayoutNode, b: _LayoutNode) -> float:
+    return 1.0 if a.parent is b.parent else 2.0
+
+
+def _wrap(root: Dict[str, Any]) -> List[_LayoutNode]:
+    """Построить служебное дерево; возвращает узлы так, что родитель идет раньше детей"""
+    layout_root = _LayoutNode(root, None, 0, 0)
+    nodes = [layout_root]
+    stack = [layout_root]
+    while stack:
+        node = stack.pop()
+        for index, child in enumerate(node.data.get("children") or []):
+            child_node = _LayoutNode(child, node, index, node.depth + 1)
+            node.children.append(child_node)
+            nodes.append(child_node)
+            stack.append(child_node)
+    return nodes
+
+
+def _move_subtree(wl: _LayoutNode, wr: _LayoutNode, shift: float) -> None:
+    subtrees = wr.index - wl.index
+    wr.change -= shift / subtrees
+    wr.shift += shift
+    wl.change += shift / subtrees
+    wr.prelim += shift
+    wr.mod += shift
+
+
+def _execute_shifts(v: _LayoutNode) -> None:
+    shift = 0.0
+    change = 0.0
+    for w in reversed(v.children):
+        w.prelim += shift
+        w.mod += shift
+        change += w.change
+        shift += w.shift + change
+
+
+def _apportion(v: _LayoutNode, default_ancestor: _LayoutNode) -> _LayoutNode:
+    """Сдвинуть поддерево v вправо от уже размещенных левых соседей"""
+    w = v.left_sibling()
+    if w is None:
+        return default_ancestor
+
+    vir = vor = v
+    vil = w
+    vol = v.parent.children[0]
+    sir = sor = v.mod
+    sil = vil.mod
+    sol = vol.mod
+    while vil.next_right() is not None and vir.next_left() is not None:
+        vil = vil.next_right()
+        vir = vir.next_left()
+        vol = vol.next_left()
+        vor = vor.next_right()
+        vor.ancestor = v
+        shift = (vil.prelim + sil) - (vir.prelim + sir) + _separation(vil, vir)
+        if shift > 0:
+            ancestor = vil.ancestor if vil.ancestor.parent is v.parent else default_ancestor
+            _move_subtree(ancestor, v, shift)
+            sir += shift
+            sor += shift
+        sil += vil.mod
+        sir += vir.mod
+        sol += vol.mod
+        sor += vor.mod
+
+    if vil.next_right() is not None and vor.next_right() is None:
+        vor.thread = vil.next_right()
+        vor.mod += sil - sor
+    if vir.next_left() is not None and vol.next_left() is None:
+        vol.thread = vir.next_left()
+        vol.mod += sir - sol
+        default_ancestor = v
+    return default_ancestor
+
+
+def _place(v: _LayoutNode) -> None:
+    """Предварительная координата узла относительно левого соседа"""
+    w = v.left_sibling()
+    if w is None:
+        v.prelim = v.midpoint
+        return
+    v.prelim = w.prelim + _separation(v, w)
+    if v.children:
+        v.mod = v.prelim - v.midpoint
+
+
+def _first_walk(nodes: List[_LayoutNode]) -> None:
+    """
+    Предварительные координаты снизу вверх: узлы обходятся в обратном порядке,
+    поэтому поддеревья детей обработаны раньше родителя, а сами дети
+    размещаются слева направо на шаге родителя
+    """
+    for v in reversed(nodes):
+        if not v.children:
+            continue
+        default_ancestor = v.children[0]
+        for child in v.children:
+            _place(child)
+            default_ancestor = _apportion(child, default_ancestor)
+        _execute_shifts(v)
+        v.midpoint = (v.children[0].prelim + v.children[-1].prelim) / 2
+    _place(nodes[0])
+
+
+def _second_walk(nodes: List[_LayoutNode]) -> None:
+    """Итоговые координаты сверху вниз с накоплением модификаторов"""
+    modsum = {id(nodes[0]): 0.0}
+    for v in nodes:
+        m = modsum.pop(id(v))
+        v.x = v.prelim + m
+        for child in v.children:
+            modsum[id(child)] = m + v.mod
+
+
+def layout_tree(
+    root: Dict[str, Any],
+    orientation: str = LAYOUT_VERTICAL,
+    node_w: int = DEFAULT_NODE_WIDTH,
+    node_h: int = DEFAULT_NODE_HEIGHT,
+) -> Dict[str, Any]:
+    """
+    Разложить дерево: возвращает копию дерева, где у каждого узла есть x и y.
+    Корневой узел дополнительно получает layout с размерами области рисования
+    """
+    nodes = _wrap(root)
+    _first_walk(nodes)
+    _second_walk(nodes)
+
+    min_x = min(node.x for node in nodes)
+    max_x = max(node.x for node in nodes)
+    max_depth = max(node.depth for node in nodes)
+
+    copies: Dict[int, Dict[str, Any]] = {}
+    for node in nodes:
+        if orientation == LAYOUT_HORIZONTAL:
+            x, y = node.depth * node_w, (node.x - min_x) * node_h
+        else:
+            x, y = (node.x - min_x) * node_w, node.depth * node_h
+
+        copy = {key: value for key, value in node.data.items() if key != "children"}
+        copy["x"] = round(x, 2)
+        copy["y"] = round(y, 2)
+        if node.children:
+            copy["children"] = []
+        if node.parent is not None:
+            copies[id(node.parent)]["children"].append(copy)
+        copies[id(node)] = copy
+
+    laid_out = copies[id(nodes[0])]
+    if orientation == LAYOUT_HORIZONTAL:
+        width, height = max_depth * node_w, (max_x - min_x) * node_h
+    else:
+        width, height = (max_x - min_x) * node_w, max_depth * node_h
+    laid_out["layout"] = {
+        "orientation": orientation,
+        "node_w": node_w,
+        "node_h": node_h,
+        "width": round(width, 2),
+        "height": round(height, 2),
+    }
+    return laid_out
@@ -0,0 +1,219 @@
+"""
+Классификация ролей должностей и подразделений для бизнес-структуры.
+
+Роль (топ-менеджер, генеральный директор, направление директора) вычисляется
+один раз при записи должности или подразделения по правилам из таблицы
+orgchart_role_rule и сохраняется в их колонках. Построение оргструктуры только
+читает сохраненные значения и не разбирает названия.
+
+Если таблица правил пуста, используются правила по умолчанию DEFAULT_ROLE_RULES.
+После изменения правил сохраненные роли пересчитываются через reclassify_all
+(replace_rules заменяет набор правил и сразу пересчитывает роли).
+"""
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+
+logger = logging.getLogger(__name__)
+
+# Цели правил
+TARGET_POSITION = "POSITION"
+TARGET_DIVISION = "DIVISION"
+
+# Роли должностей; прочие значения role считаются направлениями директоров
+ROLE_TOP_MANAGER = "TOP_MANAGER"
+ROLE_CEO = "CEO"
+
+
+def _keyword_rules(
+    target: str, field: str, role: str, keywords: Iterable[str], priority: int, required: str = ""
+) -> List[Dict[str, Any]]:
+    """Набор правил 'любое из ключевых слов' (плюс обязательное слово required)"""
+    return [
+        {
+            "target": target,
+            "field": field,
+            "keywords": f"{required},{keyword}" if required else keyword,
+            "role": role,
+            "priority": priority,
+        }
+        for keyword in keywords
+    ]
+
+
+# Правила по умолчанию, соответствуют прежней логике поиска по ключевым словам
+DEFAULT_ROLE_RULES: List[Dict[str, Any]] = (
+    # Руководящие должности
+    _keyword_rules(TARGET_POSITION, "attribute", ROLE_TOP_MANAGER, ["директор", "руководи", "менеджмент", "head", "chief"], 10)
+    + _keyword_rules(TARGET_POSITION, "attribute", ROLE_CEO, ["генеральный", "general", "ceo", "главный"], 10)
+    + _keyword_rules(TARGET_POSITION, "name", ROLE_TOP_MANAGER, ["директор", "руководитель", "начальник", "head", "chief"], 10)
+    + _keyword_rules(TARGET_POSITION, "name", ROLE_CEO, ["генеральный", "главный", "general", "ceo"], 10, required="директор")
+    # Направления директоров (проверяются по приоритету, берется первое совпадение)
+    + _keyword_rules(TARGET_POSITION, "name", "FINANCE", ["финанс", "finance", "cfo", "финдир"], 20)
+    + _keyword_rules(TARGET_POSITION, "name", "TECHNICAL", ["технич", "technical", "cto", "технол"], 30)
+    + _keyword_rules(TARGET_POSITION, "name", "COMMERCIAL", ["коммерч", "commercial", "sales", "продаж"], 40)
+    + _keyword_rules(TARGET_POSITION, "name", "HR", ["персонал", "hr", "кадр"], 50)
+    + _keyword_rules(TARGET_POSITION, "name", "OPERATIONS", ["операци", "operation"], 60)
+    # Направления департаментов (департамент может относиться к нескольким)
+    + _keyword_rules(TARGET_DIVISION, "name", "FINANCE", ["финанс", "finance", "бухгалт", "accounting"], 20)
+    + _keyword_rules(TARGET_DIVISION, "name", "TECHNICAL", ["разраб", "technical", "it", "ит", "технол", "произв"], 30)
+    + _keyword_rules(TARGET_DIVISION, "name", "COMMERCIAL", ["продаж", "sales", "коммерч", "commercial", "маркет", "market"], 40)
+    + _keyword_rules(TARGET_DIVISION, "name", "HR", ["персонал", "hr", "кадр"], 50)
+    + _keyword_rules(TARGET_DIVISION, "name", "OPERATIONS", ["операци", "operation", "логист", "logist"], 60)
+)
+
+
+class RoleRule:
+    """Подготовленное правило: ключевые слова в нижнем регистре"""
+
+    def __init__(self, target: str, field: str, keywords: str, role: str, priority: int):
+        self.target = target
+        self.field = field
+        self.keywords = [keyword.strip().lower() for keyword in keywords.split(",") if keyword.strip()]
+        self.role = role
+        self.priority = priority
+
+    def matches(self, obj: Any) -> bool:
+        value = getattr(obj, self.field, None)
+        if not value or not self.keywords:
+            return False
+        value = value.lower()
+        return all(keyword in value for keyword in self.keywords)
+
+
+class RoleRules:
+    """Набор правил, разделенный по целям и упорядоченный по приоритету"""
+
+    def __init__(self, rules: Iterable[RoleRule]):
+        ordered = sorted(rules, key=lambda rule: rule.priority)
+        self.position_rules = [rule for rule in ordered if rule.target == TARGET_POSITION]
+        self.division_rules = [rule for rule in ordered if rule.target == TARGET_DIVISION]
+
+    @classmethod
+    def from_dicts(cls, rules: Iterable[Dict[str, Any]]) -> "RoleRules":
+        return cls(
+            RoleRule(rule["target"], rule["field"], rule["keywords"], rule["role"], rule.get("priority", 100))
+            for rule in rules
+        )
+
+    def classify_position(self, position: Any) -> Tuple[bool, bool, Optional[str]]:
+        """Флаги топ-менеджера и генерального директора и направление директора"""
+        is_top = False
+        is_ceo = False
+        category = None
+        for rule in self.position_rules:
+            if not rule.matches(position):
+                continue
+            if rule.role == ROLE_CEO:
+                is_top = is_ceo = True
+            elif rule.role == ROLE_TOP_MANAGER:
+                is_top = True
+            elif category is None:
+                category = rule.role
+        return is_top, is_ceo, category
+
+    def classify_division(self, division: Any) -> List[str]:
+        """Направления, к которым относится подразделение"""
+        categories: List[str] = []
+        for rule in self.division_rules:
+            if rule.role not in categories and rule.matches(division):
+                categories.append(rule.role)
+        return categories
+
+
+def join_categories(categories: Sequence[str]) -> Optional[str]:
+    """Сохраняемое значение списка направлений"""
+    return ",".join(categories) if categories else None
+
+
+def split_categories(value: Optional[str]) -> List[str]:
+    """Список направлений из сохраненного значения"""
+    return value.split(",") if value else []
+
+
+async def load_rules(db: AsyncSession) -> RoleRules:
+    """Загрузить активные правила; при пустой таблице - правила по умолчанию"""
+    rows = (
+        await db.execute(select(models.OrgChartRoleRule).where(models.OrgChartRoleRule.is_active == True))
+    ).scalars().all()
+    if not rows:
+        return RoleRules.from_dicts(DEFAULT_ROLE_RULES)
+    return RoleRules(RoleRule(row.target, row.field, row.keywords, row.role, row.priority) for row in rows)
+
+
+async def apply_position_roles(db: AsyncSession, position: models.Position) -> None:
+    """Вычислить и записать роль должности (без коммита)"""
+    rules = await load_rules(db)
+    position.is_top_manager, position.is_ceo, position.director_category = rules.classify_position(position)
+
+
+async def apply_division_roles(db: AsyncSession, division: models.Division) -> None:
+    """Вычислить и записать направления подразделения (без коммита)"""
+    rules = await load_rules(db)
+    division.director_categories = join_categories(rules.classify_division(division))
+
+
+async def apply_position_roles_many(db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+    """Записать роли в строки пакетной записи должностей (нужны name и attribute)"""
+    rules = await load_rules(db)
+    for row in rows:
+        row["is_top_manager"], row["is_ceo"], row["director_category"] = rules.classify_position(
+            SimpleNamespace(**row)
+        )
+
+
+async def apply_division_roles_many(db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+    """Записать направления в строки пакетной записи подразделений (нужно name)"""
+    rules = await load_rules(db)
+    for row in rows:
+        row["director_categories"] = join_categories(rules.classify_division(SimpleNamespace(**row)))
+
+
+async def reclassify_all(db: AsyncSession) -> int:
+    """Пересчитать роли всех должностей и подразделений после изменения правил"""
+    rules = await load_rules(db)
+
+    positions = (
+        await db.execute(select(models.Position.id, models.Position.name, models.Position.attribute))
+    ).all()
+    position_values = []
+    for row in positions:
+        is_top, is_ceo, category = rules.classify_position(row)
+        position_values.append(
+            {"id": row.id, "is_top_manager": is_top, "is_ceo": is_ceo, "director_category": category}
+        )
+
+    divisions = (await db.execute(select(models.Division.id, models.Division.name))).all()
+    division_values = [
+        {"id": row.id, "director_categories": join_categories(rules.classify_division(row))}
+        for row in divisions
+    ]
+
+    # Пакетное обновление по первичному ключу: один UPDATE на таблицу с набором параметров.
+    # ORM-запрос, чтобы коммит увеличил версию оргструктуры (app.services.orgchart_changes)
+    if position_values:
+        await db.execute(update(models.Position), position_values)
+    if division_values:
+        await db.execute(update(models.Division), division_values)
+    await db.commit()
+
+    logger.info(f"Роли пересчитаны: должностей={len(position_values)}, подразделений={len(division_values)}")
+    return len(position_values) + len(division_values)
+
+
+async def replace_rules(db: AsyncSession, rules_in: Sequence[Dict[str, Any]]) -> List[models.OrgChartRoleRule]:
+    """
+    Заменить набор правил и пересчитать роли всех должностей и подразделений
+    (одна транзакция, коммит выполняется). Пустой набор - правила по умолчанию
+    """
+    await db.execute(delete(models.OrgChartRoleRule))
+    if rules_in:
+        await db.execute(insert(models.OrgChartRoleRule), [dict(rule) for rule in rules_in])
+    await reclassify_all(db)
+    rule = models.OrgChartRoleRule
+    return (await db.execute(select(rule).order_by(rule.priority, rule.id))).scalars().all()
@@ -0,0 +1,164 @@
+"""
+Потоковая выгрузка справочника сотрудников в CSV, XLSX и NDJSON.
+
+Сотрудники читаются через серверный курсор пачками по EXPORT_BATCH_SIZE строк
+(crud.staff.stream_with_positions: должности и организация присоединяются в том
+же запросе), строки одного сотрудника сворачиваются в одну запись. CSV и NDJSON
+отдаются клиенту по мере чтения; XLSX пишется openpyxl в режиме write_only
+во временный файл, который затем передается потоком. Потребление памяти не
+зависит от размера справочника.
+"""
+from typing import IO, Any, AsyncIterator, Dict, List, Optional
+import csv
+import io
+import logging
+import tempfile
+import time
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+
+logger = logging.getLogger(__name__)
+
+# Количество строк, читаемых из курсора за раз
+EXPORT_BATCH_SIZE = 1000
+
+# Размер фрагмента при передаче XLSX-файла
+FILE_CHUNK_SIZE = 64 * 1024
+
+# Колонки выгрузки. Файл можно загрузить обратно через импорт: он берет
+# organization_id и position_id (основная должность), а id, названия и список
+# должностей пропускает
+EXPORT_COLUMNS = (
+    "id", "last_name", "first_name", "middle_name", "email", "phone", "hire_date",
+    "is_active", "organization_id", "organization_name", "position_id", "position_name", "positions",
+)
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _new_record(row: Any) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "last_name": row.last_name,
+        "first_name": row.first_name,
+        "middle_name": row.middle_name,
+        "email": row.email,
+        "phone": row.phone,
+        "hire_date": row.hire_date,
+        "is_active": row.is_active,
+        "organization_id": row.organization_id,
+        "organization_name": row.organization_name,
+        "position_id": None,
+        "position_name": None,
+        "positions": [],
+    }
+
+
+def _add_position(record: Dict[str, Any], row: Any) -> None:
+    if row.position_name is None:
+        return
+    record["positions"].append(row.position_name)
+    if row.is_primary and record["position_id"] is None:
+        record["position_id"] = row.position_id
+        record["position_name"] = row.position_name
+        # Организация не указана у сотрудника - показываем организацию основной должности
+        # (organization_id остается пустым, как в карточке сотрудника)
+        if record["organization_name"] is None:
+            record["organization_name"] = row.position_organization_name
+
+
+async def iter_staff_batches(db: AsyncSession, **filters: Any) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Записи сотрудников пачками: поля EXPORT_COLUMNS, positions - список названий должностей.
+    filters - как в crud.staff.get_list
+    """
+    start_time = time.time()
+    total = 0
+    result = await crud.staff.stream_with_positions(db, yield_per=EXPORT_BATCH_SIZE, **filters)
+    # Строки сотрудника могут попасть в разные пачки курсора - последняя запись ждет следующую
+    current: Optional[Dict[str, Any]] = None
+    async for rows in result.partitions():
+        batch = []
+        for row in rows:
+            if current is None or current["id"] != row.id:
+                if current is not None:
+                    batch.append(current)
+                current = _new_record(row)
+            _add_position(current, row)
+        if batch:
+            total += len(batch)
+            yield batch
+    if current is not None:
+        total += 1
+        yield [current]
+    logger.info(f"Выгружено сотрудников: {total} за {time.time() - start_time:.4f}s")
+
+
+def _flat_values(record: Dict[str, Any]) -> List[Any]:
+    return [
+        "; ".join(record[column]) if column == "positions" else record[column]
+        for column in EXPORT_COLUMNS
+    ]
+
+
+async def csv_chunks(batches: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """CSV с BOM и разделителем ';' (открывается в Excel), один фрагмент на пачку"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+    writer.writerow(EXPORT_COLUMNS)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_flat_values(record) for record in batch)
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def ndjson_chunks(batches: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """NDJSON: по объекту на строку, один фрагмент на пачку"""
+    async for batch in batches:
+        yield b"\n".join(orjson.dumps(record, default=str) for record in batch) + b"\n"
+
+
+async def write_xlsx(batches: AsyncIterator[List[Dict[str, Any]]]) -> IO[bytes]:
+    """
+    Записать XLSX во временный файл (openpyxl write_only - строки не хранятся в памяти).
+    Возвращает файл, открытый на начале; закрывает его вызывающий код.
+    ValueError - openpyxl не установлен
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ValueError("Для выгрузки XLSX требуется пакет openpyxl")
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Сотрудники")
+    sheet.append(EXPORT_COLUMNS)
+    async for batch in batches:
+        for record in batch:
+            sheet.append(_flat_values(record))
+
+    file = tempfile.TemporaryFile()
+    try:
+        workbook.save(file)
+    except Exception:
+        file.close()
+        raise
+    file.seek(0)
+    return file
+
+
+async def file_chunks(file: IO[bytes]) -> AsyncIterator[bytes]:
+    """Передать файл фрагментами и закрыть его"""
+    try:
+        while chunk := file.read(FILE_CHUNK_SIZE):
+            yield chunk
+    finally:
+        file.close()
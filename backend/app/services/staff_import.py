@@ -0,0 +1,387 @@
+"""
+Массовый импорт сотрудников из CSV/XLSX.
+
+Файл читается построчно (CSV - csv.reader поверх потока, XLSX - openpyxl в режиме
+read_only), в памяти одновременно находится не больше IMPORT_CHUNK_SIZE
+подготовленных строк. Организации и должности разрешаются по справочникам,
+загруженным до разбора файла (по ID или коду), каждая строка проверяется схемой
+StaffCreate. Ошибочные строки пропускаются и попадают в отчет с номером строки.
+
+Корректные строки загружаются пачками. В PostgreSQL (asyncpg) пачка передается
+через COPY во временную таблицу staff_import_staging и переносится в staff и
+staff_position двумя INSERT ... SELECT; ID сотрудников заранее выделяются из
+последовательности. В остальных СУБД - многострочными INSERT. Все пачки пишутся
+в одной транзакции, коммит выполняет вызывающий код.
+"""
+from datetime import date, datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+import csv
+import io
+import itertools
+import logging
+import time
+
+from pydantic import ValidationError
+from sqlalchemy import (
+    Boolean, Column, Date, Integer, MetaData, String, Table, delete, func, insert, literal, select,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, models
+from app.schemas.staff import StaffCreate
+from app.schemas.staff_import import StaffImportResult, StaffImportRowError
+
+logger = logging.getLogger(__name__)
+
+# Количество строк, загружаемых одной пачкой
+IMPORT_CHUNK_SIZE = 5000
+
+# Поля импорта и допустимые заголовки колонок (в нижнем регистре, ё заменена на е)
+IMPORT_COLUMNS = {
+    "last_name": ("last_name", "фамилия"),
+    "first_name": ("first_name", "имя"),
+    "middle_name": ("middle_name", "отчество"),
+    "email": ("email", "e-mail", "почта"),
+    "phone": ("phone", "телефон"),
+    "hire_date": ("hire_date", "дата приема"),
+    "organization": ("organization", "organization_id", "организация"),
+    "position": ("position", "position_id", "должность"),
+    "is_active": ("is_active", "активен"),
+}
+REQUIRED_COLUMNS = ("last_name", "first_name")
+
+TRUE_VALUES = {"1", "true", "yes", "y", "да", "д", "+"}
+FALSE_VALUES = {"0", "false", "no", "n", "нет", "н", "-"}
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y")
+
+# Промежуточная таблица для COPY; создается в транзакции импорта и удаляется при коммите
+staff_import_staging = Table(
+    "staff_import_staging",
+    MetaData(),
+    Column("staff_id", Integer, primary_key=True, autoincrement=False),
+    Column("first_name", String(255)),
+    Column("last_name", String(255)),
+    Column("middle_name", String(255)),
+    Column("email", String(255)),
+    Column("phone", String(50)),
+    Column("hire_date", Date),
+    Column("organization_id", Integer),
+    Column("is_active", Boolean),
+    Column("position_id", Integer),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+STAGING_COLUMNS = [column.name for column in staff_import_staging.columns]
+STAFF_COLUMNS = [name for name in STAGING_COLUMNS if name not in ("staff_id", "position_id")]
+
+
+def _normalize(value: Any) -> str:
+    return " ".join(str(value).lower().replace("ё", "е").split())
+
+
+def _text(value: Any) -> Optional[str]:
+    """Значение ячейки как строка; пустые ячейки - None"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        # Числа из XLSX (телефоны, ID) приходят как float
+        value = int(value)
+    text = str(value).strip()
+    return text or None
+
+
+def _parse_date(value: Any) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = _text(value)
+    if text is None:
+        return None
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Некорректная дата '{text}'")
+
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = _text(value)
+    if text is None:
+        return True
+    if _normalize(text) in TRUE_VALUES:
+        return True
+    if _normalize(text) in FALSE_VALUES:
+        return False
+    raise ValueError(f"Некорректное значение активности '{text}'")
+
+
+def _column_map(headers: Sequence[Any]) -> Dict[int, str]:
+    """Номера колонок файла -> поля импорта"""
+    aliases = {alias: field for field, names in IMPORT_COLUMNS.items() for alias in names}
+    columns: Dict[int, str] = {}
+    for index, header in enumerate(headers):
+        field = aliases.get(_normalize(header)) if header is not None else None
+        if field is not None and field not in columns.values():
+            columns[index] = field
+    missing = [field for field in REQUIRED_COLUMNS if field not in columns.values()]
+    if missing:
+        raise ValueError(f"В файле нет обязательных колонок: {', '.join(missing)}")
+    return columns
+
+
+def _row_values(columns: Dict[int, str], values: Sequence[Any]) -> Dict[str, Any]:
+    return {field: values[index] if index < len(values) else None for index, field in columns.items()}
+
+
+def iter_csv_rows(file: BinaryIO) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Строки CSV (UTF-8, разделитель ';' или ',') в виде (номер строки, значения полей).
+    Первая строка - заголовок
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        header_line = text.readline()
+        if not header_line.strip():
+            raise ValueError("Файл пуст")
+        delimiter = ";" if header_line.count(";") > header_line.count(",") else ","
+        reader = csv.reader(itertools.chain([header_line], text), delimiter=delimiter)
+        columns = _column_map(next(reader))
+        for values in reader:
+            if any(value.strip() for value in values):
+                yield reader.line_num, _row_values(columns, values)
+    except UnicodeDecodeError:
+        raise ValueError("CSV-файл должен быть в кодировке UTF-8")
+    finally:
+        # Файл закрывает владелец (UploadFile)
+        text.detach()
+
+
+def iter_xlsx_rows(file: BinaryIO) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Строки первого листа XLSX в виде (номер строки, значения полей); первая строка - заголовок"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Для импорта XLSX требуется пакет openpyxl")
+
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except Exception as e:
+        raise ValueError(f"Не удалось прочитать XLSX: {str(e)}")
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = next(rows, None)
+        if headers is None:
+            raise ValueError("Файл пуст")
+        columns = _column_map(headers)
+        for row_number, values in enumerate(rows, start=2):
+            if any(_text(value) is not None for value in values):
+                yield row_number, _row_values(columns, values)
+    finally:
+        workbook.close()
+
+
+class StaffImportReferences:
+    """Справочники для разрешения ссылок строк импорта, загружаются один раз до разбора файла"""
+
+    def __init__(self):
+        self.organizations: Dict[str, int] = {}
+        self.organization_ids: Set[int] = set()
+        # Код должности -> [(ID должности, ID организации)]; код уникален только в подразделении
+        self.positions: Dict[str, List[Tuple[int, Optional[int]]]] = {}
+        self.position_organizations: Dict[int, Optional[int]] = {}
+        self.emails: Set[str] = set()
+
+    @classmethod
+    async def load(cls, db: AsyncSession) -> "StaffImportReferences":
+        references = cls()
+        for organization_id, code in await db.execute(
+            select(models.Organization.id, models.Organization.code)
+        ):
+            references.organization_ids.add(organization_id)
+            if code:
+                references.organizations[_normalize(code)] = organization_id
+
+        division_id = func.coalesce(models.Position.division_id, models.Section.division_id)
+        for position_id, code, organization_id in await db.execute(
+            select(models.Position.id, models.Position.code, models.Division.organization_id)
+            .outerjoin(models.Section, models.Section.id == models.Position.section_id)
+            .outerjoin(models.Division, models.Division.id == division_id)
+        ):
+            references.position_organizations[position_id] = organization_id
+            if code:
+                references.positions.setdefault(_normalize(code), []).append((position_id, organization_id))
+
+        references.emails = {
+            email.lower() for email in (await db.execute(
+                select(models.Staff.email).where(models.Staff.email.is_not(None))
+            )).scalars()
+        }
+        return references
+
+    def organization_id(self, value: Any) -> Optional[int]:
+        """ID организации по ID или коду"""
+        text = _text(value)
+        if text is None:
+            return None
+        if text.isdigit() and int(text) in self.organization_ids:
+            return int(text)
+        organization_id = self.organizations.get(_normalize(text))
+        if organization_id is None:
+            raise ValueError(f"Организация '{text}' не найдена")
+        return organization_id
+
+    def position_id(self, value: Any, organization_id: Optional[int]) -> Optional[int]:
+        """ID должности по ID или коду; код уточняется организацией строки"""
+        text = _text(value)
+        if text is None:
+            return None
+        if text.isdigit() and int(text) in self.position_organizations:
+            return int(text)
+        candidates = self.positions.get(_normalize(text), [])
+        if organization_id is not None:
+            candidates = [candidate for candidate in candidates if candidate[1] == organization_id]
+        if not candidates:
+            raise ValueError(f"Должность '{text}' не найдена")
+        if len(candidates) > 1:
+            raise ValueError(f"Код должности '{text}' неоднозначен, укажите организацию или ID должности")
+        return candidates[0][0]
+
+
+def _validation_detail(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+
+def prepare_row(values: Dict[str, Any], references: StaffImportReferences) -> Dict[str, Any]:
+    """
+    Проверить строку и подготовить ее к загрузке (колонки STAGING_COLUMNS без staff_id).
+    ValueError - строка содержит ошибку
+    """
+    organization_id = references.organization_id(values.get("organization"))
+    data = {
+        "first_name": _text(values.get("first_name")),
+        "last_name": _text(values.get("last_name")),
+        "middle_name": _text(values.get("middle_name")),
+        "email": _text(values.get("email")),
+        "phone": _text(values.get("phone")),
+        "hire_date": _parse_date(values.get("hire_date")),
+        "organization_id": organization_id,
+        "is_active": _parse_bool(values.get("is_active")),
+    }
+    missing = [field for field in REQUIRED_COLUMNS if data[field] is None]
+    if missing:
+        raise ValueError(f"Не заполнены обязательные поля: {', '.join(missing)}")
+    try:
+        staff_in = StaffCreate.model_validate(data)
+    except ValidationError as e:
+        raise ValueError(_validation_detail(e))
+
+    email = staff_in.email.lower() if staff_in.email else None
+    if email in references.emails:
+        raise ValueError(f"Сотрудник с email {staff_in.email} уже существует")
+
+    row = staff_in.model_dump(include=set(STAFF_COLUMNS))
+    row["position_id"] = references.position_id(values.get("position"), organization_id)
+    if email:
+        # Повторы внутри файла тоже считаются дубликатами
+        references.emails.add(email)
+    return row
+
+
+async def _copy_chunk(db: AsyncSession, rows: List[Dict[str, Any]], create_staging: bool) -> List[int]:
+    """Загрузка пачки через COPY во временную таблицу и перенос в staff и staff_position"""
+    connection = await db.connection()
+    if create_staging:
+        await connection.run_sync(lambda sync_connection: staff_import_staging.create(sync_connection))
+
+    # ID сотрудников выделяются заранее, чтобы связать строки с назначениями на должности
+    sequence = func.pg_get_serial_sequence(models.Staff.__tablename__, "id")
+    ids = list((await db.execute(
+        select(func.nextval(sequence)).select_from(func.generate_series(1, len(rows)))
+    )).scalars())
+
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        staff_import_staging.name,
+        records=[
+            tuple(staff_id if name == "staff_id" else row[name] for name in STAGING_COLUMNS)
+            for staff_id, row in zip(ids, rows)
+        ],
+        columns=STAGING_COLUMNS,
+    )
+
+    staging = staff_import_staging.c
+    await db.execute(
+        insert(models.Staff).from_select(
+            ["id", *STAFF_COLUMNS],
+            select(staging.staff_id, *(staging[name] for name in STAFF_COLUMNS)),
+        )
+    )
+    await db.execute(
+        insert(models.StaffPosition).from_select(
+            ["staff_id", "position_id", "is_primary", "start_date"],
+            select(staging.staff_id, staging.position_id, literal(True), staging.hire_date)
+            .where(staging.position_id.is_not(None)),
+        )
+    )
+    await db.execute(delete(staff_import_staging))
+    return ids
+
+
+async def _insert_chunk(db: AsyncSession, rows: List[Dict[str, Any]]) -> List[int]:
+    """Загрузка пачки многострочными INSERT (СУБД без COPY)"""
+    ids = await crud.staff.create_many(db, objs_in=rows)
+    assignments = [
+        {"staff_id": staff_id, "position_id": row["position_id"], "is_primary": True, "start_date": row["hire_date"]}
+        for staff_id, row in zip(ids, rows)
+        if row["position_id"] is not None
+    ]
+    if assignments:
+        await db.execute(insert(models.StaffPosition), assignments)
+    return ids
+
+
+async def import_staff(db: AsyncSession, rows: Iterator[Tuple[int, Dict[str, Any]]]) -> StaffImportResult:
+    """
+    Импортировать строки файла (см. iter_csv_rows, iter_xlsx_rows).
+    Корректные строки загружаются без коммита, ошибочные попадают в отчет.
+    ValueError из разбора файла (нет колонок, неверный формат) пробрасывается
+    """
+    start_time = time.time()
+    references = await StaffImportReferences.load(db)
+    dialect = db.get_bind().dialect
+    use_copy = dialect.name == "postgresql" and dialect.driver == "asyncpg"
+    result = StaffImportResult()
+    chunk: List[Dict[str, Any]] = []
+
+    async def flush() -> None:
+        if use_copy:
+            ids = await _copy_chunk(db, chunk, create_staging=not result.created_ids)
+        else:
+            ids = await _insert_chunk(db, chunk)
+        result.created_ids.extend(ids)
+        chunk.clear()
+
+    for row_number, values in rows:
+        result.total_rows += 1
+        try:
+            chunk.append(prepare_row(values, references))
+        except ValueError as e:
+            result.errors.append(StaffImportRowError(row=row_number, detail=str(e)))
+            continue
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await flush()
+    if chunk:
+        await flush()
+
+    result.imported = len(result.created_ids)
+    logger.info(
+        f"Импорт сотрудников: {result.imported} из {result.total_rows} строк "
+        f"за {time.time() - start_time:.4f}s ({len(result.errors)} ошибок)"
+    )
+    return result
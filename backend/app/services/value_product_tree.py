@@ -0,0 +1,166 @@
+"""
+Дерево ЦКП организации с агрегированным выполнением.
+
+Все ЦКП организации загружаются одним запросом, дерево собирается по parent_id,
+а выполнение поддеревьев считается за один проход снизу вверх: выполнение узла
+с детьми - среднее выполнение детей, взвешенное их весами (weight); выполнение
+листа берется из его completion_metrics.
+
+Готовое дерево (JSON) кэшируется по организации до следующей записи в ЦКП:
+любой коммит, изменивший value_product, сбрасывает кэш.
+"""
+from typing import Any, Dict, List, Optional
+import logging
+import time
+
+import orjson
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.crud import value_product as crud_value_product
+from app.models.value_product import ValueProduct
+from app.schemas.value_product import ValueProduct as ValueProductSchema
+
+logger = logging.getLogger(__name__)
+
+# Флаг изменения ЦКП в транзакции (в session.info)
+SESSION_WRITE_KEY = "value_product_written"
+
+
+def own_completion(metrics: Optional[Dict[str, Any]]) -> Optional[float]:
+    """
+    Собственное выполнение ЦКП (0..1) по completion_metrics:
+    поле completion (доля или проценты) либо отношение actual к target.
+    None - данных о выполнении нет
+    """
+    if not metrics:
+        return None
+    try:
+        if metrics.get("completion") is not None:
+            value = float(metrics["completion"])
+            if value > 1:
+                value /= 100
+        elif metrics.get("actual") is not None and metrics.get("target"):
+            value = float(metrics["actual"]) / float(metrics["target"])
+        else:
+            return None
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return min(max(value, 0.0), 1.0)
+
+
+def build_value_product_tree(products: List[ValueProduct]) -> List[Dict[str, Any]]:
+    """
+    Собрать дерево ЦКП и рассчитать выполнение поддеревьев.
+    Каждый узел получает own_completion, completion (агрегат поддерева) и children
+    """
+    nodes: Dict[int, Dict[str, Any]] = {}
+    for product in products:
+        node = ValueProductSchema.model_validate(product).model_dump(mode="json")
+        node["own_completion"] = own_completion(product.completion_metrics)
+        node["completion"] = None
+        node["children"] = []
+        nodes[product.id] = node
+
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node["parent_id"])
+        if parent is not None and parent is not node:
+            parent["children"].append(node)
+        else:
+            roots.append(node)
+
+    # Прямой порядок обхода; в обратном порядке дети обрабатываются раньше родителей
+    order = []
+    stack = list(reversed(roots))
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(reversed(node["children"]))
+
+    # Суммы весов и взвешенного выполнения детей, накапливаемые в родителях
+    weighted: Dict[int, float] = {}
+    weights: Dict[int, float] = {}
+    for node in reversed(order):
+        node_id = node["id"]
+        if weights.get(node_id):
+            node["completion"] = round(weighted[node_id] / weights[node_id], 4)
+        else:
+            node["completion"] = node["own_completion"]
+
+        parent_id = node["parent_id"]
+        weight = node["weight"] or 0.0
+        if parent_id in nodes and node["completion"] is not None and weight > 0:
+            weighted[parent_id] = weighted.get(parent_id, 0.0) + weight * node["completion"]
+            weights[parent_id] = weights.get(parent_id, 0.0) + weight
+    return roots
+
+
+class ValueProductTreeCache:
+    """Кэш готовых деревьев ЦКП по организациям, сбрасывается при записи в ЦКП"""
+
+    def __init__(self):
+        self._payloads: Dict[int, bytes] = {}
+        self._version = 0
+
+    def invalidate(self) -> None:
+        self._version += 1
+        self._payloads.clear()
+
+    async def get(self, db: AsyncSession, organization_id: int) -> bytes:
+        """JSON дерева ЦКП организации; строится при первом запросе после записи"""
+        payload = self._payloads.get(organization_id)
+        if payload is not None:
+            return payload
+
+        version = self._version
+        start_time = time.time()
+        products = await crud_value_product.value_product.get_all_by_organization(
+            db, organization_id=organization_id
+        )
+        payload = orjson.dumps(build_value_product_tree(products))
+        # Не сохраняем дерево, если за время построения ЦКП изменились
+        if version == self._version:
+            self._payloads[organization_id] = payload
+        logger.info(
+            f"Дерево ЦКП организации {organization_id} построено за {time.time() - start_time:.4f}s "
+            f"({len(products)} ЦКП)"
+        )
+        return payload
+
+
+value_product_tree_cache = ValueProductTreeCache()
+
+
+def _after_flush(session: Session, flush_context: Any) -> None:
+    if any(isinstance(obj, ValueProduct) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info[SESSION_WRITE_KEY] = True
+
+
+def _do_orm_execute(state: ORMExecuteState) -> None:
+    if (state.is_update or state.is_delete or state.is_insert) and state.bind_mapper is not None \
+            and state.bind_mapper.class_ is ValueProduct:
+        state.session.info[SESSION_WRITE_KEY] = True
+
+
+def _after_commit(session: Session) -> None:
+    # Освобождение точки сохранения (begin_nested) - еще не фиксация
+    if session.in_nested_transaction():
+        return
+    if session.info.pop(SESSION_WRITE_KEY, False):
+        value_product_tree_cache.invalidate()
+
+
+def _after_rollback(session: Session) -> None:
+    # Откат точки сохранения не отменяет записи, сделанные до нее: флаг сохраняется
+    # (в худшем случае дерево сбросится лишний раз)
+    if session.in_nested_transaction():
+        return
+    session.info.pop(SESSION_WRITE_KEY, None)
+
+
+event.listen(Session, "after_flush", _after_flush)
+event.listen(Session, "do_orm_execute", _do_orm_execute)
+event.listen(Session, "after_commit", _after_commit)
+event.listen(Session, "after_rollback", _after_rollback)
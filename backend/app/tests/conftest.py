@@ -0,0 +1,45 @@
+import pytest_asyncio
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+import app.models  # noqa: F401  # Регистрируем все модели в метаданных
+import app.models.value_product  # noqa: F401
+
+
+class QueryCounter:
+    """Счетчик SQL-запросов, выполненных через движок"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+@pytest_asyncio.fixture
+async def async_engine():
+    """Асинхронный движок на SQLite в памяти со всеми таблицами приложения"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def async_db(async_engine):
+    """Асинхронная сессия БД для тестов"""
+    session_maker = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        yield session
+
+
+@pytest_asyncio.fixture
+async def query_counter(async_engine):
+    """Счетчик запросов, подключенный к тестовому движку"""
+    counter = QueryCounter()
+    event.listen(async_engine.sync_engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(async_engine.sync_engine, "before_cursor_execute", counter)
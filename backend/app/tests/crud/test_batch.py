@@ -0,0 +1,102 @@
+import pytest
+from sqlalchemy import func, select
+
+from app import crud, models
+from app.models.division import DivisionType
+from app.schemas.batch import BatchRequest
+from app.schemas.position import PositionCreate, PositionUpdate
+from app.services.batch import run_batch
+from app.services.orgchart_cache import orgchart_cache
+
+
+async def _division(db) -> models.Division:
+    organization = models.Organization(name="Фотоматрица", code="PM", org_type="HOLDING")
+    db.add(organization)
+    await db.flush()
+    division = models.Division(name="Склад", code="WH", organization_id=organization.id, type=DivisionType.DIVISION)
+    db.add(division)
+    await db.commit()
+    return division
+
+
+async def _batch(db, **kwargs):
+    return await run_batch(
+        crud.position, db, BatchRequest(**kwargs), create_schema=PositionCreate, update_schema=PositionUpdate
+    )
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_item_errors_and_writes_the_rest(async_db, query_counter) -> None:
+    """Тест: пакет пишется групповыми запросами, ошибочные элементы попадают в отчет"""
+    division = await _division(async_db)
+    section = models.Section(name="Приемка", code="S1", division_id=division.id)
+    async_db.add(section)
+    await async_db.flush()
+    function = models.Function(name="Учет", code="F1", section_id=section.id)
+    async_db.add(function)
+    await async_db.commit()
+
+    since = orgchart_cache.version
+    query_counter.count = 0
+    result = await _batch(
+        async_db,
+        create=[
+            {"name": "Директор по персоналу", "code": "HR", "division_id": division.id, "function_ids": [function.id]},
+            {"name": "Кладовщик", "code": "K1", "division_id": division.id},
+        ],
+    )
+    assert result.committed and result.errors == []
+    # Одна версия оргструктуры на пакет, независимо от точек сохранения
+    assert orgchart_cache.version == since + 1
+    # Точка сохранения, правила ролей, INSERT ... RETURNING, чтение и запись назначений
+    assert query_counter.count <= 8
+    director_id, storekeeper_id = result.created_ids
+    director = await crud.position.get(async_db, director_id)
+    assert (director.is_top_manager, director.director_category) == (True, "HR")
+
+    result = await _batch(
+        async_db,
+        create=[
+            {"name": "Дубль", "code": "K1", "division_id": division.id},
+            {"name": "Грузчик", "code": "K2", "division_id": division.id},
+            {"code": "K3"},
+        ],
+        update=[{"id": storekeeper_id, "name": "Финансовый директор"}, {"id": 999999, "name": "Нет"}],
+        delete=[director_id, 999999],
+    )
+    assert result.committed
+    assert orgchart_cache.version == since + 2
+    assert len(result.created_ids) == 1
+    assert result.updated_ids == [storekeeper_id]
+    assert result.deleted_ids == [director_id]
+    assert [(error.op, error.index) for error in result.errors] == [
+        ("create", 0), ("create", 2), ("update", 1), ("delete", 1),
+    ]
+
+    async_db.expire_all()
+    storekeeper = await crud.position.get(async_db, storekeeper_id)
+    assert (storekeeper.name, storekeeper.director_category) == ("Финансовый директор", "FINANCE")
+    assignments = await async_db.scalar(select(func.count()).select_from(models.FunctionalAssignment))
+    assert assignments == 0
+
+
+@pytest.mark.asyncio
+async def test_atomic_batch_rolls_back_on_any_error(async_db) -> None:
+    """Тест: в режиме atomic ошибка одного элемента откатывает весь пакет"""
+    division = await _division(async_db)
+
+    since = orgchart_cache.version
+    result = await _batch(
+        async_db,
+        create=[
+            {"name": "Кладовщик", "code": "K1", "division_id": division.id},
+            {"name": "Дубль", "code": "K1", "division_id": division.id},
+        ],
+        atomic=True,
+    )
+    assert not result.committed
+    assert orgchart_cache.version == since
+    assert result.created_ids == []
+    assert [(error.op, error.index) for error in result.errors] == [("create", 1)]
+    assert await async_db.scalar(select(func.count()).select_from(models.Position)) == 0
+
@@ -0,0 +1,58 @@
+import pytest
+
+from app import crud, models
+from app.crud.base import CRUDBase, decode_cursor
+
+
+async def _read_all(crud_obj, db, limit: int, **filters) -> list:
+    cursor, pages = "", []
+    while cursor is not None:
+        page, cursor = await crud_obj.get_page(db, cursor=cursor, limit=limit, **filters)
+        pages.append([obj.code for obj in page])
+    return pages
+
+
+@pytest.mark.asyncio
+async def test_cursor_pages_cover_all_rows_once(async_db) -> None:
+    """Тест: курсорные страницы проходят все записи без пропусков и повторов"""
+    names = ["Б", "А", "В", "А", "Г"]
+    async_db.add_all([
+        models.Organization(name=name, code=f"ORG{i}", org_type="LEGAL_ENTITY" if i % 2 else "HOLDING")
+        for i, name in enumerate(names)
+    ])
+    await async_db.commit()
+
+    assert await _read_all(crud.organization, async_db, 2) == [["ORG0", "ORG1"], ["ORG2", "ORG3"], ["ORG4"]]
+    assert await _read_all(crud.organization, async_db, 2, org_type="HOLDING") == [["ORG0", "ORG2"], ["ORG4"]]
+
+    # Сортировка по имени с id для одинаковых значений
+    by_name = CRUDBase(models.Organization)
+    by_name.cursor_sort_key = "name"
+    assert await _read_all(by_name, async_db, 2) == [["ORG1", "ORG3"], ["ORG0", "ORG2"], ["ORG4"]]
+
+    with pytest.raises(ValueError):
+        decode_cursor("не курсор")
+
+
+@pytest.mark.asyncio
+async def test_sparse_fields_select_only_requested_columns(async_db) -> None:
+    """Тест: fields возвращает словари только с запрошенными колонками и id"""
+    async_db.add_all([
+        models.Organization(name=name, code=f"ORG{i}", org_type="HOLDING", description="Длинное описание")
+        for i, name in enumerate(["Б", "А", "В"])
+    ])
+    await async_db.commit()
+
+    rows = await crud.organization.get_multi_fields(async_db, fields=["name"], skip=1, limit=1)
+    assert [set(row) for row in rows] == [{"id", "name"}]
+    assert rows[0]["name"] == "А"
+
+    by_name = CRUDBase(models.Organization)
+    by_name.cursor_sort_key = "name"
+    page, cursor = await by_name.get_page(async_db, cursor="", limit=2, fields=["code"])
+    assert page == [{"id": page[0]["id"], "code": "ORG1"}, {"id": page[1]["id"], "code": "ORG0"}]
+    page, cursor = await by_name.get_page(async_db, cursor=cursor, limit=2, fields=["code"])
+    assert [row["code"] for row in page] == ["ORG2"] and cursor is None
+
+    with pytest.raises(ValueError):
+        await crud.organization.get_multi_fields(async_db, fields=["divisions"])
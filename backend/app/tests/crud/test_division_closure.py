@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import select
+
+from app import crud, models
+from app.models.division import DivisionType
+from app.schemas.division import DivisionCreate, DivisionUpdate
+
+
+async def _create(db, name: str, organization_id: int, parent_id=None) -> models.Division:
+    return await crud.division.create_division(
+        db,
+        DivisionCreate(
+            name=name, code=name, organization_id=organization_id, parent_id=parent_id, type=DivisionType.DIVISION
+        ),
+    )
+
+
+async def _closure(db) -> set:
+    rows = await db.execute(
+        select(models.DivisionClosure.ancestor_id, models.DivisionClosure.descendant_id, models.DivisionClosure.depth)
+    )
+    return set(rows.all())
+
+
+@pytest.mark.asyncio
+async def test_closure_follows_create_move_and_delete(async_db, query_counter) -> None:
+    """Тест: замыкание поддерживается при записи, поддерево и предки читаются одним запросом"""
+    organization = models.Organization(name="Фотоматрица", code="PM", org_type="HOLDING")
+    async_db.add(organization)
+    await async_db.commit()
+
+    root = await _create(async_db, "ROOT", organization.id)
+    child = await _create(async_db, "CHILD", organization.id, root.id)
+    grandchild = await _create(async_db, "GRANDCHILD", organization.id, child.id)
+    other = await _create(async_db, "OTHER", organization.id)
+
+    query_counter.count = 0
+    assert [d.id for d in await crud.division.get_subtree(async_db, root.id)] == [root.id, child.id, grandchild.id]
+    assert [d.id for d in await crud.division.get_descendants(async_db, root.id, max_depth=1)] == [child.id]
+    assert [d.id for d in await crud.division.get_ancestors(async_db, grandchild.id)] == [root.id, child.id]
+    assert query_counter.count == 3
+
+    assert await crud.division.is_descendant(async_db, root.id, grandchild.id)
+    assert not await crud.division.is_descendant(async_db, grandchild.id, root.id)
+
+    # Перенос поддерева CHILD под OTHER
+    await crud.division.update_division(async_db, child, DivisionUpdate(parent_id=other.id))
+    assert [d.id for d in await crud.division.get_ancestors(async_db, grandchild.id)] == [other.id, child.id]
+    assert [d.id for d in await crud.division.get_subtree(async_db, root.id)] == [root.id]
+
+    # Удаление CHILD делает его потомка корневым
+    await crud.division.delete_division(async_db, child.id)
+    assert await _closure(async_db) == {
+        (root.id, root.id, 0), (other.id, other.id, 0), (grandchild.id, grandchild.id, 0),
+    }
+
+
+@pytest.mark.asyncio
+async def test_delete_many_makes_children_roots(async_db) -> None:
+    """Тест: пакетное удаление родителя делает дочерние подразделения корневыми, как одиночное"""
+    organization = models.Organization(name="Фотоматрица", code="PM", org_type="HOLDING")
+    async_db.add(organization)
+    await async_db.commit()
+
+    root = await _create(async_db, "ROOT", organization.id)
+    child = await _create(async_db, "CHILD", organization.id, root.id)
+    grandchild = await _create(async_db, "GRANDCHILD", organization.id, child.id)
+
+    assert await crud.division.delete_many(async_db, ids=[root.id]) == [root.id]
+    await async_db.commit()
+
+    await async_db.refresh(child)
+    assert child.parent_id is None
+    assert await _closure(async_db) == {
+        (child.id, child.id, 0), (child.id, grandchild.id, 1), (grandchild.id, grandchild.id, 0),
+    }
@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import update
+
+from app import crud, models
+
+
+@pytest.mark.asyncio
+async def test_repeated_lookups_hit_session_cache(async_db, query_counter) -> None:
+    """Тест: повторные чтения по ID в сессии не идут в БД, промахи get_many - один IN-запрос"""
+    async_db.add_all([
+        models.Organization(name=f"Организация {i}", code=f"ORG{i}", org_type="HOLDING") for i in range(3)
+    ])
+    await async_db.commit()
+
+    query_counter.count = 0
+    first = await crud.organization.get(async_db, 1)
+    assert await crud.organization.get(async_db, 1) is first
+    assert await crud.organization.get(async_db, 999) is None
+    assert await crud.organization.get(async_db, 999) is None
+    assert query_counter.count == 2
+
+    query_counter.count = 0
+    objs = await crud.organization.get_many(async_db, [3, 1, 999, 2])
+    assert [obj.id for obj in objs] == [3, 1, 2]
+    assert query_counter.count == 1
+
+
+@pytest.mark.asyncio
+async def test_writes_invalidate_session_cache(async_db, query_counter) -> None:
+    """Тест: вставка, массовое обновление и удаление сбрасывают кэш сессии"""
+    assert await crud.organization.get(async_db, 1) is None
+    organization = models.Organization(id=1, name="Фотоматрица", code="PM", org_type="HOLDING")
+    async_db.add(organization)
+    await async_db.commit()
+    assert await crud.organization.get(async_db, 1) is organization
+
+    await async_db.execute(
+        update(models.Organization).where(models.Organization.id == 1).values(name="Переименована")
+    )
+    query_counter.count = 0
+    assert (await crud.organization.get(async_db, 1)).name == "Переименована"
+    assert query_counter.count == 1
+
+    await crud.organization.remove(async_db, id=1)
+    assert await crud.organization.get(async_db, 1) is None
@@ -0,0 +1,30 @@
+import pytest
+
+from app import crud, models
+
+
+@pytest.mark.asyncio
+async def test_tree_is_loaded_in_one_query_at_any_depth(async_db, query_counter) -> None:
+    """Тест: холдинг -> юрлицо -> филиал -> отделение читаются одним запросом с глубиной и путем"""
+    parent_id = None
+    chain = []
+    for level, org_type in enumerate(["HOLDING", "LEGAL_ENTITY", "BRANCH", "BRANCH"]):
+        organization = models.Organization(name=f"Org {level}", code=f"ORG{level}", org_type=org_type, parent_id=parent_id)
+        async_db.add(organization)
+        await async_db.flush()
+        chain.append(organization.id)
+        parent_id = organization.id
+    async_db.add(models.Organization(name="Другой холдинг", code="OTHER", org_type="HOLDING"))
+    await async_db.commit()
+
+    query_counter.count = 0
+    rows = await crud.organization.get_tree(async_db)
+    assert query_counter.count == 1
+    chain_rows = [(organization.id, depth, path) for organization, depth, path in rows if organization.id in chain]
+    assert chain_rows == [(chain[i], i, "/".join(map(str, chain[: i + 1]))) for i in range(4)]
+    assert len(rows) == 5
+
+    rows = await crud.organization.get_tree(async_db, root_id=chain[1], max_depth=1)
+    assert [(organization.id, depth, path) for organization, depth, path in rows] == [
+        (chain[1], 0, str(chain[1])), (chain[2], 1, f"{chain[1]}/{chain[2]}"),
+    ]
@@ -0,0 +1,41 @@
+import pytest
+
+from app import crud, models
+from app.models.division import DivisionType
+from app.services import functional_assignments
+
+
+@pytest.mark.asyncio
+async def test_attach_functions_loads_page_in_one_query(async_db, query_counter) -> None:
+    """Тест: функции всех должностей страницы загружаются одним запросом"""
+    organization = models.Organization(name="Фотоматрица", code="PM", org_type="HOLDING")
+    async_db.add(organization)
+    await async_db.flush()
+    division = models.Division(name="Склад", code="WH", organization_id=organization.id, type=DivisionType.DIVISION)
+    async_db.add(division)
+    await async_db.flush()
+    section = models.Section(name="Приемка", code="S1", division_id=division.id)
+    async_db.add(section)
+    await async_db.flush()
+    functions = [models.Function(name=f"Функция {i}", code=f"F{i}", section_id=section.id) for i in range(2)]
+    async_db.add_all(functions)
+    await async_db.commit()
+
+    storekeeper = await crud.position.create(
+        async_db, obj_in={"name": "Кладовщик", "code": "K1", "division_id": division.id}, commit=False
+    )
+    loader = await crud.position.create(
+        async_db, obj_in={"name": "Грузчик", "code": "K2", "division_id": division.id}, commit=False
+    )
+    await functional_assignments.sync_position_functions(
+        async_db, {storekeeper.id: [functions[1].id, functions[0].id]}
+    )
+    await async_db.commit()
+    positions = await crud.position.get_many(async_db, [storekeeper.id, loader.id])
+
+    query_counter.count = 0
+    await crud.position.attach_functions(async_db, positions, include_functions=True)
+    assert query_counter.count == 1
+    assert positions[0].function_ids == [functions[0].id, functions[1].id]
+    assert [function["code"] for function in positions[0].functions] == ["F0", "F1"]
+    assert (positions[1].function_ids, positions[1].functions) == ([], [])
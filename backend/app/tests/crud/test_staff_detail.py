@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import select
+
+from app import crud, models
+from app.tests.utils.orgchart import create_org_structure
+
+
+@pytest.mark.asyncio
+async def test_staff_detail_loads_in_constant_queries(async_db, query_counter) -> None:
+    """Тест: карточка сотрудника загружается одним запросом независимо от числа должностей"""
+    organization = await create_org_structure(async_db, departments=2, sections_per_department=2)
+    positions = (await async_db.execute(
+        select(models.Position).where(models.Position.section_id.is_not(None))
+    )).scalars().all()
+    staff = models.Staff(first_name="Иван", last_name="Петров")
+    async_db.add(staff)
+    await async_db.flush()
+    async_db.add_all([
+        models.StaffPosition(staff_id=staff.id, position_id=position.id, is_primary=index == 0)
+        for index, position in enumerate(positions)
+    ])
+    await async_db.commit()
+
+    query_counter.count = 0
+    detail = await crud.staff.get_detail(async_db, id=staff.id)
+    assert query_counter.count == 1
+    assert len(detail.staff_positions) == len(positions) > 2
+    primary = next(sp for sp in detail.staff_positions if sp.is_primary)
+    assert primary.position.section.division.organization.name == organization.name
+    assert detail.organization is None and detail.user is None
+    assert query_counter.count == 1
+
+    assert await crud.staff.get_detail(async_db, id=999) is None
+
+
+@pytest.mark.asyncio
+async def test_staff_list_filters_and_loads_positions_in_one_query(async_db, query_counter) -> None:
+    """Тест: страница списка с должностями и организацией - один запрос, фильтры по назначениям"""
+    await create_org_structure(async_db, departments=2, sections_per_department=2)
+    section_id = (await async_db.execute(select(models.Section.id).order_by(models.Section.id))).scalars().first()
+
+    query_counter.count = 0
+    staffs = await crud.staff.get_list(async_db, limit=100)
+    assert query_counter.count == 1
+    assert all(len(staff.staff_positions) == 1 and staff.staff_positions[0].position for staff in staffs)
+    assert query_counter.count == 1
+
+    in_section = await crud.staff.get_list(async_db, section_id=section_id)
+    assert in_section and all(
+        staff.staff_positions[0].position.section_id == section_id for staff in in_section
+    )
+    position_id = in_section[0].staff_positions[0].position_id
+    assert [staff.id for staff in await crud.staff.get_list(async_db, position_id=position_id)] == [in_section[0].id]
+    assert await crud.staff.get_list(async_db, is_active=False) == []
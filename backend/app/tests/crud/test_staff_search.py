@@ -0,0 +1,25 @@
+import pytest
+
+from app import crud, models
+from app.crud.staff import normalize_search_term
+
+
+def test_search_term_is_normalized_like_document() -> None:
+    """Тест: поисковая строка приводится к форме поискового документа"""
+    assert normalize_search_term("  ПЁТР   Иванов ") == "петр иванов"
+    assert normalize_search_term("   ") == ""
+
+
+@pytest.mark.asyncio
+async def test_search_matches_all_words_across_fields(async_db) -> None:
+    """Тест: каждое слово ищется в ФИО, email и телефоне"""
+    async_db.add_all([
+        models.Staff(first_name="Пётр", last_name="Иванов", email="petr@example.com", phone="+7 900 111"),
+        models.Staff(first_name="Анна", last_name="Иванова", middle_name="Петровна"),
+    ])
+    await async_db.commit()
+
+    assert [s.first_name for s in await crud.staff.search(async_db, search_term="Иванов")] == ["Пётр", "Анна"]
+    assert [s.first_name for s in await crud.staff.search(async_db, search_term="Иванов 900")] == ["Пётр"]
+    assert [s.first_name for s in await crud.staff.search(async_db, search_term="Петровна")] == ["Анна"]
+    assert await crud.staff.search(async_db, search_term=" ") == []
@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import select
+
+from app import crud, models
+from app.models.division import DivisionType
+from app.schemas.organization import OrganizationCreate
+
+
+@pytest.mark.asyncio
+async def test_upsert_many_syncs_by_natural_key(async_db, query_counter) -> None:
+    """Тест: набор синхронизируется одним INSERT ... ON CONFLICT, ID - в порядке входа"""
+    existing = await crud.organization.upsert(async_db, obj_in={"name": "Старое", "code": "A", "org_type": "HOLDING"})
+
+    query_counter.count = 0
+    ids = await crud.organization.upsert_many(
+        async_db,
+        objs_in=[
+            {"name": "Новое", "code": "B", "org_type": "HOLDING"},
+            {"name": "Черновик", "code": "A", "org_type": "HOLDING"},
+            {"name": "Переименовано", "code": "A", "org_type": "LEGAL_ENTITY"},
+        ],
+    )
+    await async_db.commit()
+    assert query_counter.count == 1
+    assert ids[1:] == [existing.id, existing.id]
+
+    rows = await async_db.execute(
+        select(models.Organization.code, models.Organization.name).order_by(models.Organization.code)
+    )
+    assert rows.all() == [("A", "Переименовано"), ("B", "Новое")]
+
+    with pytest.raises(ValueError):
+        await crud.section.upsert_many(async_db, objs_in=[{"name": "Без подразделения", "code": "S1"}])
+
+
+@pytest.mark.asyncio
+async def test_upsert_keeps_omitted_columns(async_db, query_counter) -> None:
+    """Тест: upsert обновляет только переданные поля, строки с разными полями пишутся разными запросами"""
+    await crud.organization.upsert(
+        async_db,
+        obj_in={"name": "Старое", "code": "A", "org_type": "HOLDING", "description": "keep me", "is_active": False},
+    )
+
+    query_counter.count = 0
+    await crud.organization.upsert_many(
+        async_db,
+        objs_in=[
+            OrganizationCreate(name="Переименовано", code="A", org_type="HOLDING"),
+            {"name": "Новое", "code": "B", "org_type": "HOLDING", "description": "new"},
+        ],
+    )
+    await async_db.commit()
+    assert query_counter.count == 2
+
+    rows = await async_db.execute(
+        select(
+            models.Organization.code, models.Organization.name,
+            models.Organization.description, models.Organization.is_active,
+        ).order_by(models.Organization.code)
+    )
+    assert rows.all() == [("A", "Переименовано", "keep me", False), ("B", "Новое", "new", True)]
+
+
+@pytest.mark.asyncio
+async def test_division_upsert_maintains_closure(async_db) -> None:
+    """Тест: upsert подразделений связывает новые и переносит перенесенные в замыкании"""
+    organization = await crud.organization.upsert(async_db, obj_in={"name": "Фотоматрица", "code": "PM", "org_type": "HOLDING"})
+    row = {"organization_id": organization.id, "type": DivisionType.DIVISION}
+    root_id, child_id = await crud.division.upsert_many(
+        async_db, objs_in=[{"name": "Финансы", "code": "ROOT", **row}, {"name": "Склад", "code": "CHILD", **row}]
+    )
+    (same_child_id,) = await crud.division.upsert_many(
+        async_db, objs_in=[{"name": "Склад", "code": "CHILD", "parent_id": root_id, **row}]
+    )
+    await async_db.commit()
+
+    assert same_child_id == child_id
+    assert [d.id for d in await crud.division.get_subtree(async_db, root_id)] == [root_id, child_id]
+    root = await crud.division.get(async_db, root_id)
+    assert root.director_categories == "FINANCE"
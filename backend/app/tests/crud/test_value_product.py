@@ -0,0 +1,30 @@
+import pytest
+
+from app import models
+from app.crud.value_product import value_product as crud_value_product
+from app.models.value_product import ValueProduct
+
+
+@pytest.mark.asyncio
+async def test_filters_are_applied_in_sql(async_db) -> None:
+    """Тест: фильтр по родителю не зависит от положения детей в общей выборке"""
+    organization = models.Organization(name="Фотоматрица", code="PM", org_type="HOLDING")
+    async_db.add(organization)
+    await async_db.flush()
+    parent = ValueProduct(name="Корень", code="ROOT", organization_id=organization.id)
+    async_db.add(parent)
+    await async_db.flush()
+    async_db.add_all([ValueProduct(name=f"Шум {i}", code=f"N{i}", organization_id=organization.id) for i in range(5)])
+    async_db.add_all([
+        ValueProduct(name=f"Дочерний {i}", code=f"C{i}", organization_id=organization.id, parent_id=parent.id,
+                     status="archived" if i else "active")
+        for i in range(3)
+    ])
+    await async_db.commit()
+
+    page = await crud_value_product.get_multi_filtered(async_db, parent_id=parent.id, skip=0, limit=2)
+    assert [vp.code for vp in page] == ["C0", "C1"]
+    assert await crud_value_product.count_filtered(async_db, parent_id=parent.id) == 3
+    assert await crud_value_product.count_filtered(
+        async_db, organization_id=organization.id, parent_id=parent.id, status="archived"
+    ) == 2
@@ -0,0 +1,42 @@
+import pytest
+from sqlalchemy import select
+
+from app import models
+from app.models.division import DivisionType
+from app.services.functional_assignments import MissingFunctionsError, sync_position_functions
+
+
+@pytest.mark.asyncio
+async def test_sync_applies_diff_and_reports_all_missing(async_db, query_counter) -> None:
+    """Тест: назначения приводятся к списку по разнице, отсутствующие функции сообщаются все сразу"""
+    organization = models.Organization(name="Фотоматрица", code="PM", org_type="HOLDING")
+    async_db.add(organization)
+    await async_db.flush()
+    division = models.Division(name="Склад", code="WH", organization_id=organization.id, type=DivisionType.DIVISION)
+    async_db.add(division)
+    await async_db.flush()
+    section = models.Section(name="Приемка", code="S1", division_id=division.id)
+    async_db.add(section)
+    await async_db.flush()
+    functions = [models.Function(name=f"Функция {i}", code=f"F{i}", section_id=section.id) for i in range(3)]
+    position = models.Position(name="Кладовщик", code="K1", division_id=division.id)
+    async_db.add_all([*functions, position])
+    await async_db.flush()
+    async_db.add_all([
+        models.FunctionalAssignment(position_id=position.id, function_id=functions[0].id),
+        models.FunctionalAssignment(position_id=position.id, function_id=functions[1].id),
+    ])
+    await async_db.commit()
+
+    query_counter.count = 0
+    await sync_position_functions(async_db, {position.id: [functions[1].id, functions[2].id]})
+    # Проверка функций, текущие назначения, DELETE, INSERT
+    assert query_counter.count == 4
+    rows = await async_db.execute(
+        select(models.FunctionalAssignment.function_id).where(models.FunctionalAssignment.position_id == position.id)
+    )
+    assert sorted(rows.scalars().all()) == [functions[1].id, functions[2].id]
+
+    with pytest.raises(MissingFunctionsError) as error:
+        await sync_position_functions(async_db, {position.id: [functions[0].id, 998, 999]})
+    assert error.value.function_ids == [998, 999]
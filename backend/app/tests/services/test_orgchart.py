@@ -0,0 +1,158 @@
+import pytest
+from sqlalchemy import select
+
+from app import models
+from app.services import orgchart as orgchart_service
+from app.tests.utils.orgchart import create_org_structure
+
+
+@pytest.mark.asyncio
+async def test_business_chart_structure(async_db) -> None:
+    """Тест построения бизнес-структуры: гендиректор -> директор -> департаменты -> отделы"""
+    await create_org_structure(async_db, departments=2, sections_per_department=1, positions_per_section=2)
+
+    snapshot = await orgchart_service.load_snapshot(async_db)
+    chart = orgchart_service.build_business_chart(snapshot)
+
+    board = chart["children"][0]
+    assert board["id"] == "board-1"
+    ceo_node = board["children"][0]
+    assert ceo_node["name"] == "Генеральный директор"
+    assert ceo_node["position_level"] == 1
+
+    cfo_node = ceo_node["children"][0]
+    assert cfo_node["name"] == "Финансовый директор"
+    departments = [node for node in cfo_node["children"] if node["type"] == "division"]
+    assert len(departments) == 2
+
+    section_node = departments[0]["children"][0]
+    assert section_node["type"] == "section"
+    filled, vacant = section_node["children"]
+    assert filled["is_vacant"] is False
+    assert filled["staffName"] == "Фамилия1 Имя1"
+    assert vacant["is_vacant"] is True
+
+
+@pytest.mark.asyncio
+async def test_query_count_does_not_depend_on_tree_size(async_db, query_counter) -> None:
+    """Тест: количество запросов при построении структуры не зависит от ее размера"""
+    await create_org_structure(async_db, code="SMALL", departments=1, sections_per_department=1)
+
+    query_counter.count = 0
+    snapshot = await orgchart_service.load_snapshot(async_db)
+    orgchart_service.build_business_chart(snapshot)
+    small_count = query_counter.count
+
+    await create_org_structure(async_db, code="LARGE", departments=10, sections_per_department=5)
+
+    query_counter.count = 0
+    snapshot = await orgchart_service.load_snapshot(async_db)
+    orgchart_service.build_business_chart(snapshot)
+    large_count = query_counter.count
+
+    assert len(snapshot.positions) > 100
+    assert small_count == large_count == 5
+
+
+@pytest.mark.asyncio
+async def test_subtree_depth_folds_branches_with_child_counts(async_db) -> None:
+    """Тест ленивого раскрытия: узлы ниже depth свернуты и содержат child_count"""
+    organization = await create_org_structure(
+        async_db, departments=2, sections_per_department=3, positions_per_section=2
+    )
+    snapshot = await orgchart_service.load_snapshot(async_db)
+
+    node = orgchart_service.build_subtree(snapshot, f"org-{organization.id}", depth=1)
+    assert node["id"] == f"org-{organization.id}"
+    # Дирекция и два департамента, свернутые
+    assert len(node["children"]) == 3
+    department = node["children"][1]
+    assert "children" not in department
+    # 6 должностей департамента и 3 его отдела
+    assert department["child_count"] == 9
+
+    expanded = orgchart_service.build_subtree(snapshot, department["id"], depth=2)
+    section = expanded["children"][-1]
+    assert section["type"] == "section"
+    assert [child["type"] for child in section["children"]] == ["position", "position"]
+
+    assert orgchart_service.build_subtree(snapshot, "div-999999") is None
+    with pytest.raises(ValueError):
+        orgchart_service.build_subtree(snapshot, "unknown-1")
+
+
+@pytest.mark.asyncio
+async def test_node_records_are_preorder_with_parent_ids(async_db) -> None:
+    """Тест потоковой выдачи: записи идут в прямом порядке и ссылаются на родителя"""
+    organization = await create_org_structure(async_db, departments=2, sections_per_department=1)
+    snapshot = await orgchart_service.load_snapshot(async_db)
+
+    records = list(orgchart_service.iter_node_records(snapshot, "organization", organization))
+    tree = orgchart_service.build_subtree(snapshot, f"org-{organization.id}")
+    assert records == list(orgchart_service.iter_tree_records(tree))
+
+    assert records[0]["parent_id"] is None
+    assert "children" not in records[0]
+    seen = set()
+    for record in records:
+        assert record["parent_id"] is None or record["parent_id"] in seen
+        seen.add(record["id"])
+
+
+@pytest.mark.asyncio
+async def test_legal_and_location_charts(async_db, query_counter) -> None:
+    """Тест юридической и территориальной структуры: строятся фиксированным числом запросов"""
+    await create_org_structure(async_db, code="HOLDING")
+    location = await create_org_structure(async_db, code="MSK", org_type="LOCATION", departments=1)
+
+    legal_entity = models.Organization(name="ООО Фотоматрица", code="LEGAL", org_type="LEGAL_ENTITY")
+    async_db.add(legal_entity)
+    await async_db.flush()
+    staff = (await async_db.execute(select(models.Staff).order_by(models.Staff.id))).scalars().all()
+    for member in staff[:3]:
+        async_db.add(models.StaffOrganization(staff_id=member.id, organization_id=legal_entity.id))
+    await async_db.commit()
+
+    query_counter.count = 0
+    legal_chart = await orgchart_service.load_legal_chart(async_db)
+    assert query_counter.count == 4
+
+    entity_node = legal_chart["children"][0]
+    assert entity_node["id"] == f"org-{legal_entity.id}"
+    assert entity_node["staff_count"] == 3
+    assert entity_node["children"][0]["staffName"] == staff[0].full_name()
+    assert entity_node["children"][0]["name"].startswith("Бухгалтер")
+
+    query_counter.count = 0
+    location_chart = await orgchart_service.load_location_chart(async_db)
+    assert query_counter.count == 6
+
+    assert [node["id"] for node in location_chart["children"]] == [f"org-{location.id}"]
+    location_node = location_chart["children"][0]
+    assert location_node["staff_count"] == 0
+    # Дирекция и один департамент только этой локации
+    assert [node["name"] for node in location_node["children"]] == ["Дирекция", "Финансовый департамент 0"]
+
+
+@pytest.mark.asyncio
+async def test_structural_nodes_carry_rollup_metrics(async_db) -> None:
+    """Тест сводных показателей: должности считаются один раз, свернутые узлы тоже содержат итоги"""
+    organization = await create_org_structure(
+        async_db, departments=2, sections_per_department=3, positions_per_section=2
+    )
+    snapshot = await orgchart_service.load_snapshot(async_db)
+
+    node = orgchart_service.build_subtree(snapshot, f"org-{organization.id}", depth=1)
+    # 2 директора + 2 департамента * 3 отдела * 2 должности, занята каждая вторая
+    assert node["metrics"] == {
+        "total_positions": 14, "filled_positions": 6, "vacancies": 8, "children_count": 3, "depth": 3,
+    }
+    department = node["children"][1]
+    assert "children" not in department
+    assert department["metrics"] == {
+        "total_positions": 6, "filled_positions": 3, "vacancies": 3, "children_count": 9, "depth": 2,
+    }
+
+    section = orgchart_service.build_subtree(snapshot, department["id"])["children"][-1]
+    assert section["metrics"]["total_positions"] == 2
+    assert section["metrics"]["depth"] == 1
@@ -0,0 +1,43 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.services.orgchart_cache import OrgChartCache
+
+
+@pytest.mark.asyncio
+async def test_write_burst_causes_single_background_rebuild(async_engine) -> None:
+    """Тест: серия изменений приводит к одной фоновой пересборке, читатели не ждут"""
+    builds = []
+
+    async def builder(db: AsyncSession):
+        builds.append(len(builds) + 1)
+        return {"build": len(builds)}
+
+    session_maker = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    cache = OrgChartCache(session_maker=session_maker, debounce_seconds=0.05)
+    cache.register("business", builder)
+
+    # Холодный старт: параллельные запросы строят снимок один раз
+    entries = await asyncio.gather(*(cache.get("business") for _ in range(5)))
+    assert len(builds) == 1
+    assert {entry.version for entry in entries} == {0}
+
+    for _ in range(10):
+        cache.bump_version()
+
+    # Сразу после изменений отдается прежний снимок
+    stale = await cache.get("business")
+    assert stale.version == 0
+    assert json.loads(stale.payload) == {"build": 1}
+
+    await asyncio.sleep(0.2)
+
+    fresh = await cache.get("business")
+    assert len(builds) == 2
+    assert fresh.version == 10
+    assert fresh.etag == f'"business-{cache.epoch}-10"'
+    assert json.loads(fresh.payload) == {"build": 2}
@@ -0,0 +1,120 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.models.division import DivisionType
+from app.schemas.batch import BatchRequest
+from app.schemas.division import DivisionCreate, DivisionUpdate
+from app.services.batch import run_batch
+from app.services.orgchart_cache import OrgChartCache, orgchart_cache
+
+
+@pytest.mark.asyncio
+async def test_writes_are_recorded_as_node_operations(async_db) -> None:
+    """Тест: коммиты записывают операции над узлами, одна версия на коммит"""
+    organization = models.Organization(name="Фотоматрица", code="PM", org_type="HOLDING")
+    async_db.add(organization)
+    await async_db.flush()
+    first = models.Division(name="Бухгалтерия", code="ACC", organization_id=organization.id, type=DivisionType.DIVISION)
+    second = models.Division(name="Склад", code="WH", organization_id=organization.id, type=DivisionType.DIVISION)
+    async_db.add_all([first, second])
+    await async_db.commit()
+
+    since = orgchart_cache.version
+    position = await crud.position.create(
+        async_db, obj_in={"name": "Бухгалтер", "code": "ACC1", "division_id": first.id}
+    )
+    await crud.position.update(async_db, db_obj=position, obj_in={"division_id": second.id})
+    staff = models.Staff(first_name="Иван", last_name="Петров", email="petrov@example.com")
+    async_db.add(staff)
+    await async_db.flush()
+    assignment = models.StaffPosition(staff_id=staff.id, position_id=position.id, is_primary=True)
+    async_db.add(assignment)
+    await async_db.commit()
+    await async_db.delete(assignment)
+    await crud.position.remove(async_db, id=position.id)
+
+    assert orgchart_cache.version == since + 4
+    changes = orgchart_cache.changes_since(since)
+    node_id = f"pos-{position.id}"
+    assert [(change["version"], change["op"]) for change in changes] == [
+        (since + 1, "insert"), (since + 2, "move"), (since + 3, "update"), (since + 4, "delete"),
+    ]
+    assert all(change["node_id"] == node_id for change in changes)
+    assert changes[0]["parent_id"] == f"div-{first.id}"
+    assert (changes[1]["old_parent_id"], changes[1]["parent_id"]) == (f"div-{first.id}", f"div-{second.id}")
+    assert changes[2]["node"] is None
+    assert orgchart_cache.changes_since(since + 4) == []
+
+    # Новый топ-менеджер меняет бизнес-структуру целиком
+    await crud.position.create(async_db, obj_in={"name": "Генеральный директор", "code": "CEO"})
+    assert orgchart_cache.changes_since(since) is None
+
+
+@pytest.mark.asyncio
+async def test_changes_outside_log_require_full_reload(async_engine) -> None:
+    """Тест: версии, вытесненные из журнала, требуют полной перезагрузки"""
+    session_maker = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    cache = OrgChartCache(session_maker=session_maker, debounce_seconds=0.05, change_log_size=2)
+    for _ in range(3):
+        cache.bump_version([{"op": "delete", "node_id": "pos-1"}])
+
+    assert cache.changes_since(0) is None
+    assert [change["version"] for change in cache.changes_since(1)] == [2, 3]
+    assert cache.changes_since(4) is None
+
+
+@pytest.mark.asyncio
+async def test_versions_from_another_epoch_require_full_reload(async_engine) -> None:
+    """Тест: после перезапуска (новая эпоха) прежние версии и ETag не принимаются"""
+    async def builder(db: AsyncSession):
+        return {}
+
+    session_maker = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    before = OrgChartCache(session_maker=session_maker, debounce_seconds=0.05)
+    before.register("business", builder)
+    before.bump_version([{"op": "delete", "node_id": "pos-1"}])
+    stale = await before.get("business")
+
+    # Новый процесс: номера версий начинаются заново и совпадают с прежними
+    after = OrgChartCache(session_maker=session_maker, debounce_seconds=0.05)
+    after.register("business", builder)
+    after.bump_version([{"op": "delete", "node_id": "pos-2"}])
+    fresh = await after.get("business")
+
+    assert fresh.version == stale.version
+    assert fresh.etag != stale.etag
+    assert after.changes_since(0, before.epoch) is None
+    assert [change["node_id"] for change in after.changes_since(0, after.epoch)] == ["pos-2"]
+
+
+@pytest.mark.asyncio
+async def test_savepoints_publish_nothing_until_outer_commit(async_db) -> None:
+    """Тест: точки сохранения пакета не публикуют изменения, откат пакета не меняет версию"""
+    organization = models.Organization(name="Фотоматрица", code="PM", org_type="HOLDING")
+    async_db.add(organization)
+    await async_db.flush()
+    async_db.add(models.Division(name="Склад", code="WH", organization_id=organization.id, type=DivisionType.DIVISION))
+    await async_db.commit()
+
+    items = [
+        {"name": "Бухгалтерия", "code": "ACC", "organization_id": organization.id, "type": "DIVISION"},
+        {"name": "Дубль", "code": "WH", "organization_id": organization.id, "type": "DIVISION"},
+    ]
+    since = orgchart_cache.version
+    result = await run_batch(
+        crud.division, async_db, BatchRequest(create=items, atomic=True),
+        create_schema=DivisionCreate, update_schema=DivisionUpdate,
+    )
+    assert not result.committed
+    assert orgchart_cache.version == since
+    assert orgchart_cache.changes_since(since) == []
+
+    # Без atomic - одна версия на коммит пакета, а не на каждую точку сохранения
+    result = await run_batch(
+        crud.division, async_db, BatchRequest(create=items),
+        create_schema=DivisionCreate, update_schema=DivisionUpdate,
+    )
+    assert result.committed and len(result.errors) == 1
+    assert orgchart_cache.version == since + 1
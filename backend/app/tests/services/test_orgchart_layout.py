@@ -0,0 +1,44 @@
+from app.services.orgchart_layout import LAYOUT_HORIZONTAL, layout_tree
+
+
+def _tree():
+    return {
+        "id": "root",
+        "children": [
+            {"id": "a", "children": [{"id": "a1"}, {"id": "a2"}]},
+            {"id": "b"},
+            {"id": "c", "children": [{"id": "c1"}, {"id": "c2"}]},
+        ],
+    }
+
+
+def _coordinates(node, result=None):
+    result = {} if result is None else result
+    result[node["id"]] = (node["x"], node["y"])
+    for child in node.get("children", []):
+        _coordinates(child, result)
+    return result
+
+
+def test_tidy_tree_layout() -> None:
+    """Тест раскладки: родитель по центру над детьми, поддеревья не пересекаются"""
+    laid_out = layout_tree(_tree(), node_w=100, node_h=50)
+    coordinates = _coordinates(laid_out)
+
+    assert coordinates["a1"] == (0, 100)
+    assert coordinates["a2"] == (100, 100)
+    # Узлы разных родителей разнесены на два слота
+    assert coordinates["c1"] == (300, 100)
+    assert coordinates["a"] == (50, 50)
+    assert coordinates["root"] == (200, 0)
+    # Промежуточное поддерево распределено равномерно
+    assert coordinates["b"] == (200, 50)
+    assert laid_out["layout"]["width"] == 400
+    assert laid_out["layout"]["height"] == 100
+
+
+def test_horizontal_layout_swaps_axes() -> None:
+    """Тест горизонтальной раскладки: уровни идут по x"""
+    vertical = _coordinates(layout_tree(_tree(), node_w=100, node_h=100))
+    horizontal = _coordinates(layout_tree(_tree(), LAYOUT_HORIZONTAL, node_w=100, node_h=100))
+    assert all(horizontal[key] == (y, x) for key, (x, y) in vertical.items())
@@ -0,0 +1,62 @@
+import pytest
+
+from app import crud, models
+from app.schemas.division import DivisionCreate, DivisionUpdate
+from app.services import position_roles
+from app.services.orgchart_cache import orgchart_cache
+
+
+@pytest.mark.asyncio
+async def test_roles_are_computed_on_write(async_db) -> None:
+    """Тест: роли должностей и направления подразделений вычисляются при записи"""
+    organization = models.Organization(name="Фотоматрица", code="PM", org_type="HOLDING")
+    async_db.add(organization)
+    await async_db.commit()
+
+    department = await crud.division.create_division(
+        async_db, DivisionCreate(name="Финансовый департамент", code="FIN", organization_id=organization.id)
+    )
+    assert department.director_categories == "FINANCE"
+
+    position = await crud.position.create(async_db, obj_in={"name": "Финансовый директор", "code": "CFO"})
+    assert (position.is_top_manager, position.is_ceo, position.director_category) == (True, False, "FINANCE")
+
+    position = await crud.position.update(async_db, db_obj=position, obj_in={"name": "Бухгалтер"})
+    assert (position.is_top_manager, position.is_ceo, position.director_category) == (False, False, None)
+
+    department = await crud.division.update_division(
+        async_db, department, DivisionUpdate(name="Департамент логистики")
+    )
+    assert department.director_categories == "OPERATIONS"
+
+
+@pytest.mark.asyncio
+async def test_rule_table_overrides_default_rules(async_db) -> None:
+    """Тест: правила из таблицы заменяют правила по умолчанию"""
+    async_db.add(models.OrgChartRoleRule(
+        target="POSITION", field="name", keywords="управляющий,партнер", role="CEO", priority=1
+    ))
+    await async_db.commit()
+
+    partner = await crud.position.create(async_db, obj_in={"name": "Управляющий партнер", "code": "MP"})
+    director = await crud.position.create(async_db, obj_in={"name": "Генеральный директор", "code": "CEO"})
+    assert (partner.is_top_manager, partner.is_ceo) == (True, True)
+    assert (director.is_top_manager, director.is_ceo) == (False, False)
+
+
+@pytest.mark.asyncio
+async def test_replacing_rules_reclassifies_stored_roles(async_db) -> None:
+    """Тест: замена правил пересчитывает сохраненные роли и увеличивает версию оргструктуры"""
+    partner = await crud.position.create(async_db, obj_in={"name": "Управляющий партнер", "code": "MP"})
+    assert (partner.is_top_manager, partner.is_ceo) == (False, False)
+
+    since = orgchart_cache.version
+    rules = await position_roles.replace_rules(
+        async_db,
+        [{"target": "POSITION", "field": "name", "keywords": "управляющий,партнер", "role": "CEO", "priority": 1}],
+    )
+    assert [rule.role for rule in rules] == ["CEO"]
+    assert orgchart_cache.version == since + 1
+
+    await async_db.refresh(partner)
+    assert (partner.is_top_manager, partner.is_ceo) == (True, True)
@@ -0,0 +1,60 @@
+import io
+
+import pytest
+from sqlalchemy import delete, select
+
+from app import models
+from app.services import staff_export
+from app.services.staff_import import import_staff, iter_csv_rows
+from app.tests.utils.orgchart import create_org_structure
+
+
+async def _collect(chunks) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+@pytest.mark.asyncio
+async def test_export_folds_assignments_across_cursor_batches(async_db, monkeypatch) -> None:
+    """Тест: назначения сотрудника сворачиваются в одну запись, даже если попали в разные пачки курсора"""
+    await create_org_structure(async_db, departments=1, sections_per_department=1)
+    staff = (await async_db.execute(select(models.Staff).order_by(models.Staff.id))).scalars().first()
+    async_db.add(models.StaffPosition(staff_id=staff.id, position_id=1, is_primary=False))
+    await async_db.commit()
+    monkeypatch.setattr(staff_export, "EXPORT_BATCH_SIZE", 1)
+
+    records = [record async for batch in staff_export.iter_staff_batches(async_db) for record in batch]
+    assert len(records) == len({record["id"] for record in records})
+    first = next(record for record in records if record["id"] == staff.id)
+    assert len(first["positions"]) == 2 and first["position_name"] == first["positions"][0]
+    assert first["organization_name"] == "Фотоматрица PHOTOMATRIX"
+
+    content = await _collect(staff_export.csv_chunks(staff_export.iter_staff_batches(async_db)))
+    lines = content.decode("utf-8-sig").splitlines()
+    assert lines[0] == ";".join(staff_export.EXPORT_COLUMNS)
+    assert len(lines) == len(records) + 1
+
+
+@pytest.mark.asyncio
+async def test_exported_csv_imports_back(async_db) -> None:
+    """Тест: выгрузка CSV загружается импортом обратно без потерь"""
+    await create_org_structure(async_db, departments=1, sections_per_department=1)
+    staff = (await async_db.execute(select(models.Staff).order_by(models.Staff.id))).scalars().first()
+    staff.is_active = False
+    staff.organization_id = 1
+    await async_db.commit()
+
+    def _without_id(records):
+        return sorted(({**record, "id": None} for record in records), key=lambda record: record["last_name"])
+
+    exported = [record async for batch in staff_export.iter_staff_batches(async_db) for record in batch]
+    assert all(record["position_id"] for record in exported)
+    content = await _collect(staff_export.csv_chunks(staff_export.iter_staff_batches(async_db)))
+
+    await async_db.execute(delete(models.StaffPosition))
+    await async_db.execute(delete(models.Staff))
+    result = await import_staff(async_db, iter_csv_rows(io.BytesIO(content)))
+    await async_db.commit()
+
+    assert result.errors == [] and result.imported == len(exported)
+    reimported = [record async for batch in staff_export.iter_staff_batches(async_db) for record in batch]
+    assert _without_id(reimported) == _without_id(exported)
@@ -0,0 +1,41 @@
+import io
+
+import pytest
+from sqlalchemy import select
+
+from app import models
+from app.services.staff_import import import_staff, iter_csv_rows
+from app.tests.utils.orgchart import create_org_structure
+
+
+@pytest.mark.asyncio
+async def test_import_loads_valid_rows_and_reports_errors(async_db) -> None:
+    """Тест: корректные строки загружаются с должностью, ошибочные - в отчете с номером строки"""
+    await create_org_structure(async_db, departments=1, sections_per_department=1)
+    position = (await async_db.execute(select(models.Position).where(models.Position.code == "ACC0_0_0"))).scalar_one()
+    content = (
+        "Фамилия;Имя;E-mail;Дата приёма;Организация;Должность\n"
+        "Петров;Пётр;petr@example.com;31.01.2024;PHOTOMATRIX;ACC0_0_0\n"
+        "Сидоров;;;;;\n"
+        "Волков;Олег;PETR@example.com;;;\n"
+        "Зайцев;Ян;;;;9999\n"
+        "Орлов;Олег;;;;\n"
+    )
+
+    result = await import_staff(async_db, iter_csv_rows(io.BytesIO(content.encode())))
+    await async_db.commit()
+
+    assert (result.total_rows, result.imported) == (5, 2)
+    assert [error.row for error in result.errors] == [3, 4, 5]
+    staff = await async_db.get(models.Staff, result.created_ids[0])
+    assert (staff.last_name, staff.hire_date.isoformat(), staff.organization_id) == ("Петров", "2024-01-31", 1)
+    assignment = (await async_db.execute(
+        select(models.StaffPosition).where(models.StaffPosition.staff_id == staff.id)
+    )).scalar_one()
+    assert (assignment.position_id, assignment.is_primary) == (position.id, True)
+
+
+def test_csv_without_required_columns_is_rejected() -> None:
+    """Тест: файл без обязательных колонок отклоняется целиком"""
+    with pytest.raises(ValueError, match="last_name"):
+        list(iter_csv_rows(io.BytesIO(b"name,email\nA,a@example.com\n")))
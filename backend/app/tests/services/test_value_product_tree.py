@@ -0,0 +1,66 @@
+import orjson
+import pytest
+
+from app import models
+from app.crud.value_product import value_product as crud_value_product
+from app.models.value_product import ValueProduct
+from app.services.value_product_tree import value_product_tree_cache
+
+
+@pytest.mark.asyncio
+async def test_tree_rolls_up_weighted_completion_and_is_cached(async_db, query_counter) -> None:
+    """Тест: выполнение агрегируется по весам, дерево кэшируется до записи в ЦКП"""
+    organization = models.Organization(name="Фотоматрица", code="PM", org_type="HOLDING")
+    async_db.add(organization)
+    await async_db.flush()
+    root = ValueProduct(name="Продажи", code="SALES", organization_id=organization.id)
+    async_db.add(root)
+    await async_db.flush()
+    async_db.add_all([
+        ValueProduct(name="Опт", code="B2B", organization_id=organization.id, parent_id=root.id,
+                     weight=3, completion_metrics={"completion": 80}),
+        ValueProduct(name="Розница", code="B2C", organization_id=organization.id, parent_id=root.id,
+                     weight=1, completion_metrics={"actual": 20, "target": 100}),
+        ValueProduct(name="Без метрик", code="NONE", organization_id=organization.id, parent_id=root.id, weight=5),
+    ])
+    await async_db.commit()
+
+    query_counter.count = 0
+    tree = orjson.loads(await value_product_tree_cache.get(async_db, organization.id))
+    assert query_counter.count == 1
+    assert len(tree) == 1
+    assert tree[0]["completion"] == pytest.approx((3 * 0.8 + 1 * 0.2) / 4)
+    assert [child["completion"] for child in tree[0]["children"]] == [0.8, 0.2, None]
+
+    # Повторный запрос - из кэша, без обращения к БД
+    await value_product_tree_cache.get(async_db, organization.id)
+    assert query_counter.count == 1
+
+    # Запись в ЦКП сбрасывает кэш
+    await crud_value_product.update(async_db, db_obj=root, obj_in={"name": "Сбыт"})
+    tree = orjson.loads(await value_product_tree_cache.get(async_db, organization.id))
+    assert tree[0]["name"] == "Сбыт"
+
+
+@pytest.mark.asyncio
+async def test_savepoints_invalidate_tree_only_on_outer_commit(async_db) -> None:
+    """Тест: точки сохранения не сбрасывают кэш и не теряют записи, сделанные до них"""
+    organization = models.Organization(name="Фотоматрица", code="PM", org_type="HOLDING")
+    async_db.add(organization)
+    await async_db.commit()
+
+    version = value_product_tree_cache._version
+    async_db.add(ValueProduct(name="Продажи", code="SALES", organization_id=organization.id))
+    await async_db.flush()
+    async with async_db.begin_nested():
+        async_db.add(ValueProduct(name="Опт", code="B2B", organization_id=organization.id))
+    # Освобождение точки сохранения - еще не фиксация
+    assert value_product_tree_cache._version == version
+
+    savepoint = await async_db.begin_nested()
+    async_db.add(ValueProduct(name="Розница", code="B2C", organization_id=organization.id))
+    await async_db.flush()
+    await savepoint.rollback()
+    await async_db.commit()
+    # Откат точки сохранения не отменил запись, сделанную до нее
+    assert value_product_tree_cache._version == version + 1
@@ -0,0 +1,86 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.models.division import DivisionType
+from app.services import position_roles
+
+
+async def create_org_structure(
+    db: AsyncSession,
+    *,
+    code: str = "PHOTOMATRIX",
+    org_type: str = "HOLDING",
+    departments: int = 2,
+    sections_per_department: int = 2,
+    positions_per_section: int = 2,
+) -> models.Organization:
+    """
+    Создает тестовую оргструктуру: организацию с генеральным и финансовым директором,
+    департаментами, отделами и должностями (каждая вторая должность занята)
+
+    Args:
+        db: Асинхронная сессия базы данных
+        code: Код организации
+        org_type: Тип организации
+        departments: Количество департаментов
+        sections_per_department: Количество отделов в каждом департаменте
+        positions_per_section: Количество должностей в каждом отделе
+
+    Returns:
+        Созданная организация
+    """
+    organization = models.Organization(name=f"Фотоматрица {code}", code=code, org_type=org_type)
+    db.add(organization)
+    await db.flush()
+
+    management = models.Division(
+        name="Дирекция", code="MGMT", organization_id=organization.id, type=DivisionType.DIVISION
+    )
+    db.add(management)
+    await db.flush()
+
+    ceo = models.Position(
+        name="Генеральный директор", code="CEO", division_id=management.id, attribute="Директор"
+    )
+    cfo = models.Position(
+        name="Финансовый директор", code="CFO", division_id=management.id, attribute="Директор"
+    )
+    db.add_all([ceo, cfo])
+
+    staff_counter = 0
+    for d in range(departments):
+        department = models.Division(
+            name=f"Финансовый департамент {d}",
+            code=f"FIN{d}",
+            organization_id=organization.id,
+            type=DivisionType.DEPARTMENT,
+        )
+        db.add(department)
+        await db.flush()
+
+        for s in range(sections_per_department):
+            section = models.Section(name=f"Отдел {d}-{s}", code=f"SEC{d}_{s}", division_id=department.id)
+            db.add(section)
+            await db.flush()
+
+            for p in range(positions_per_section):
+                position = models.Position(
+                    name=f"Бухгалтер {d}-{s}-{p}",
+                    code=f"ACC{d}_{s}_{p}",
+                    division_id=department.id,
+                    section_id=section.id,
+                )
+                db.add(position)
+                await db.flush()
+
+                if p % 2 == 0:
+                    staff_counter += 1
+                    staff = models.Staff(first_name=f"Имя{staff_counter}", last_name=f"Фамилия{staff_counter}")
+                    db.add(staff)
+                    await db.flush()
+                    db.add(models.StaffPosition(staff_id=staff.id, position_id=position.id, is_primary=True))
+
+    await db.commit()
+    # Должности и подразделения созданы напрямую, минуя CRUD, поэтому роли считаем отдельно
+    await position_roles.reclassify_all(db)
+    return organization
@@ -0,0 +1,163 @@
+"""add orgchart role classification
+
+Revision ID: 6b1f0c2d9e47
+Revises: 1cda3238f330
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b1f0c2d9e47'
+down_revision: Union[str, None] = '1cda3238f330'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Правила и классификация зафиксированы на момент миграции (копия
+# app.services.position_roles): последующие изменения кода приложения
+# не должны менять результат этой ревизии
+def _keyword_rules(
+    target: str, field: str, role: str, keywords: Iterable[str], priority: int, required: str = ""
+) -> List[Dict[str, Any]]:
+    return [
+        {
+            "target": target,
+            "field": field,
+            "keywords": f"{required},{keyword}" if required else keyword,
+            "role": role,
+            "priority": priority,
+        }
+        for keyword in keywords
+    ]
+
+
+ROLE_RULES: List[Dict[str, Any]] = (
+    _keyword_rules("POSITION", "attribute", "TOP_MANAGER", ["директор", "руководи", "менеджмент", "head", "chief"], 10)
+    + _keyword_rules("POSITION", "attribute", "CEO", ["генеральный", "general", "ceo", "главный"], 10)
+    + _keyword_rules("POSITION", "name", "TOP_MANAGER", ["директор", "руководитель", "начальник", "head", "chief"], 10)
+    + _keyword_rules("POSITION", "name", "CEO", ["генеральный", "главный", "general", "ceo"], 10, required="директор")
+    + _keyword_rules("POSITION", "name", "FINANCE", ["финанс", "finance", "cfo", "финдир"], 20)
+    + _keyword_rules("POSITION", "name", "TECHNICAL", ["технич", "technical", "cto", "технол"], 30)
+    + _keyword_rules("POSITION", "name", "COMMERCIAL", ["коммерч", "commercial", "sales", "продаж"], 40)
+    + _keyword_rules("POSITION", "name", "HR", ["персонал", "hr", "кадр"], 50)
+    + _keyword_rules("POSITION", "name", "OPERATIONS", ["операци", "operation"], 60)
+    + _keyword_rules("DIVISION", "name", "FINANCE", ["финанс", "finance", "бухгалт", "accounting"], 20)
+    + _keyword_rules("DIVISION", "name", "TECHNICAL", ["разраб", "technical", "it", "ит", "технол", "произв"], 30)
+    + _keyword_rules("DIVISION", "name", "COMMERCIAL", ["продаж", "sales", "коммерч", "commercial", "маркет", "market"], 40)
+    + _keyword_rules("DIVISION", "name", "HR", ["персонал", "hr", "кадр"], 50)
+    + _keyword_rules("DIVISION", "name", "OPERATIONS", ["операци", "operation", "логист", "logist"], 60)
+)
+
+
+def _target_rules(target: str) -> List[Dict[str, Any]]:
+    return sorted((rule for rule in ROLE_RULES if rule["target"] == target), key=lambda rule: rule["priority"])
+
+
+def _matches(rule: Dict[str, Any], row: Any) -> bool:
+    value = getattr(row, rule["field"], None)
+    if not value:
+        return False
+    value = value.lower()
+    return all(keyword in value for keyword in rule["keywords"].split(","))
+
+
+def _classify_position(row: Any) -> Tuple[bool, bool, Optional[str]]:
+    is_top = False
+    is_ceo = False
+    category = None
+    for rule in _target_rules("POSITION"):
+        if not _matches(rule, row):
+            continue
+        if rule["role"] == "CEO":
+            is_top = is_ceo = True
+        elif rule["role"] == "TOP_MANAGER":
+            is_top = True
+        elif category is None:
+            category = rule["role"]
+    return is_top, is_ceo, category
+
+
+def _classify_division(row: Any) -> Optional[str]:
+    categories: List[str] = []
+    for rule in _target_rules("DIVISION"):
+        if rule["role"] not in categories and _matches(rule, row):
+            categories.append(rule["role"])
+    return ",".join(categories) if categories else None
+
+
+def upgrade() -> None:
+    rule_table = op.create_table(
+        'orgchart_role_rule',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('target', sa.String(length=20), nullable=False),
+        sa.Column('field', sa.String(length=20), nullable=False),
+        sa.Column('keywords', sa.String(length=255), nullable=False),
+        sa.Column('role', sa.String(length=50), nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=False, server_default='100'),
+        sa.Column('is_active', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_orgchart_role_rule_id'), 'orgchart_role_rule', ['id'], unique=False)
+    op.bulk_insert(rule_table, ROLE_RULES)
+
+    op.add_column('position', sa.Column('is_top_manager', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.add_column('position', sa.Column('is_ceo', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.add_column('position', sa.Column('director_category', sa.String(length=50), nullable=True))
+    op.add_column('division', sa.Column('director_categories', sa.String(length=255), nullable=True))
+
+    # Заполняем роли существующих должностей и подразделений
+    bind = op.get_bind()
+    position_table = sa.table(
+        'position',
+        sa.column('id', sa.Integer), sa.column('name', sa.String), sa.column('attribute', sa.String),
+        sa.column('is_top_manager', sa.Boolean), sa.column('is_ceo', sa.Boolean),
+        sa.column('director_category', sa.String),
+    )
+    division_table = sa.table(
+        'division', sa.column('id', sa.Integer), sa.column('name', sa.String),
+        sa.column('director_categories', sa.String),
+    )
+
+    position_values = []
+    for row in bind.execute(sa.select(position_table.c.id, position_table.c.name, position_table.c.attribute)):
+        is_top, is_ceo, category = _classify_position(row)
+        position_values.append({"b_id": row.id, "b_top": is_top, "b_ceo": is_ceo, "b_category": category})
+    if position_values:
+        bind.execute(
+            position_table.update()
+            .where(position_table.c.id == sa.bindparam('b_id'))
+            .values(
+                is_top_manager=sa.bindparam('b_top'),
+                is_ceo=sa.bindparam('b_ceo'),
+                director_category=sa.bindparam('b_category'),
+            ),
+            position_values,
+        )
+
+    division_values = [
+        {"b_id": row.id, "b_categories": _classify_division(row)}
+        for row in bind.execute(sa.select(division_table.c.id, division_table.c.name))
+    ]
+    if division_values:
+        bind.execute(
+            division_table.update()
+            .where(division_table.c.id == sa.bindparam('b_id'))
+            .values(director_categories=sa.bindparam('b_categories')),
+            division_values,
+        )
+
+
+def downgrade() -> None:
+    op.drop_column('division', 'director_categories')
+    op.drop_column('position', 'director_category')
+    op.drop_column('position', 'is_ceo')
+    op.drop_column('position', 'is_top_manager')
+    op.drop_index(op.f('ix_orgchart_role_rule_id'), table_name='orgchart_role_rule')
+    op.drop_table('orgchart_role_rule')
@@ -0,0 +1,50 @@
+"""add division closure
+
+Revision ID: 8a3f5e7c2b14
+Revises: 6b1f0c2d9e47
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a3f5e7c2b14'
+down_revision: Union[str, None] = '6b1f0c2d9e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'division_closure',
+        sa.Column('ancestor_id', sa.Integer(), nullable=False),
+        sa.Column('descendant_id', sa.Integer(), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['ancestor_id'], ['division.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['descendant_id'], ['division.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_division_closure_descendant_id', 'division_closure', ['descendant_id', 'ancestor_id'], unique=False)
+
+    # Заполняем замыкание по существующим parent_id
+    op.execute(
+        """
+        INSERT INTO division_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM division
+            UNION ALL
+            SELECT tree.ancestor_id, division.id, tree.depth + 1
+            FROM tree JOIN division ON division.parent_id = tree.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM tree
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_division_closure_descendant_id', table_name='division_closure')
+    op.drop_table('division_closure')
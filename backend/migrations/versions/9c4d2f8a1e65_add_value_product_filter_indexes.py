@@ -0,0 +1,37 @@
+"""add value product filter indexes
+
+Revision ID: 9c4d2f8a1e65
+Revises: 8a3f5e7c2b14
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4d2f8a1e65'
+down_revision: Union[str, None] = '8a3f5e7c2b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_value_product_table() -> bool:
+    # Таблица value_product создается по моделям, а не миграциями
+    return sa.inspect(op.get_bind()).has_table('value_product')
+
+
+def upgrade() -> None:
+    if not _has_value_product_table():
+        return
+    op.create_index('ix_value_product_organization_id_parent_id', 'value_product', ['organization_id', 'parent_id'], unique=False)
+    op.create_index('ix_value_product_parent_id', 'value_product', ['parent_id'], unique=False)
+
+
+def downgrade() -> None:
+    if not _has_value_product_table():
+        return
+    op.drop_index('ix_value_product_parent_id', table_name='value_product')
+    op.drop_index('ix_value_product_organization_id_parent_id', table_name='value_product')
@@ -0,0 +1,48 @@
+"""add division natural key
+
+Revision ID: b7e2d4a9c318
+Revises: 9c4d2f8a1e65
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d4a9c318'
+down_revision: Union[str, None] = '9c4d2f8a1e65'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Код подразделения снова уникален в пределах организации: на него опирается upsert.
+    # После 11b243613af0 коды могли повториться - такие данные нужно исправить вручную
+    division = sa.table(
+        'division',
+        sa.column('code', sa.String),
+        sa.column('organization_id', sa.Integer),
+    )
+    duplicates = op.get_bind().execute(
+        sa.select(division.c.organization_id, division.c.code, sa.func.count().label('total'))
+        .where(division.c.code.is_not(None))
+        .group_by(division.c.organization_id, division.c.code)
+        .having(sa.func.count() > 1)
+        .order_by(division.c.organization_id, division.c.code)
+    ).all()
+    if duplicates:
+        listed = ", ".join(
+            f"организация {row.organization_id}: '{row.code}' ({row.total} шт.)" for row in duplicates
+        )
+        raise RuntimeError(
+            "Невозможно добавить уникальность кода подразделения в пределах организации: "
+            f"найдены повторяющиеся коды - {listed}. Переименуйте подразделения и повторите миграцию"
+        )
+    op.create_unique_constraint('uix_division_code_organization', 'division', ['code', 'organization_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uix_division_code_organization', 'division', type_='unique')
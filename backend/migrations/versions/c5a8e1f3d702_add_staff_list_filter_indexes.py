@@ -0,0 +1,32 @@
+"""add staff list filter indexes
+
+Revision ID: c5a8e1f3d702
+Revises: b7e2d4a9c318
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a8e1f3d702'
+down_revision: Union[str, None] = 'b7e2d4a9c318'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_staff_organization_id_is_active', 'staff', ['organization_id', 'is_active'], unique=False)
+    op.create_index('ix_staff_is_active_id', 'staff', ['is_active', 'id'], unique=False)
+    op.create_index('ix_staff_position_position_id_staff_id', 'staff_position', ['position_id', 'staff_id'], unique=False)
+    op.create_index('ix_position_section_id', 'position', ['section_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_position_section_id', table_name='position')
+    op.drop_index('ix_staff_position_position_id_staff_id', table_name='staff_position')
+    op.drop_index('ix_staff_is_active_id', table_name='staff')
+    op.drop_index('ix_staff_organization_id_is_active', table_name='staff')
@@ -0,0 +1,50 @@
+"""add staff search indexes
+
+Revision ID: d9b3f6a2c417
+Revises: c5a8e1f3d702
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9b3f6a2c417'
+down_revision: Union[str, None] = 'c5a8e1f3d702'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Должно совпадать с app.crud.staff.STAFF_SEARCH_DOCUMENT
+STAFF_SEARCH_DOCUMENT = (
+    "translate(lower(coalesce(staff.last_name, '') || ' ' || coalesce(staff.first_name, '') || ' ' "
+    "|| coalesce(staff.middle_name, '') || ' ' || coalesce(staff.email, '') || ' ' "
+    "|| coalesce(staff.phone, '')), 'ё', 'е')"
+)
+
+
+def _is_postgresql() -> bool:
+    # Триграммы и tsvector есть только в PostgreSQL
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def upgrade() -> None:
+    if not _is_postgresql():
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute(
+        f'CREATE INDEX ix_staff_search_trgm ON staff USING gin (({STAFF_SEARCH_DOCUMENT}) gin_trgm_ops)'
+    )
+    op.execute(
+        f"CREATE INDEX ix_staff_search_vector ON staff "
+        f"USING gin (to_tsvector('russian'::regconfig, {STAFF_SEARCH_DOCUMENT}))"
+    )
+
+
+def downgrade() -> None:
+    if not _is_postgresql():
+        return
+    op.drop_index('ix_staff_search_vector', table_name='staff')
+    op.drop_index('ix_staff_search_trgm', table_name='staff')